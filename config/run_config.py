@@ -0,0 +1,50 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Sequence
+from config.settings import (LOG_FILE_PATH, INVOICES_FILE, PRODUCTS_FILE, TEST_FILE, DB_PATH, JOIN_INDEX_PATH,
+                             Z_SCORE_MMAP_PATH, SHARD_DIR, REPORT_OUTPUT_FILE, REPORT_TABLES_DIR, REPORT_CACHE_PATH,
+                             PDF_OUTPUT_PATH, REPORT_MARKDOWN_PATH, STAGE_MANIFEST_PATH)
+
+
+@dataclass(frozen=True)
+class RunConfig:
+    """One pipeline run: the experiment directory it works in, the files it reads and writes and how its stages run.
+
+    The file paths are relative to the directory (absolute paths are used as they are), so each
+    run reads its own data and writes its own database, output files and log without changing
+    the working directory of the process.
+    """
+    directory: str = '.'
+    # Stages to run (empty: the default stages), whether to force them and the --only selection
+    stages: Sequence[str] = ()
+    force: bool = False
+    only: Optional[Sequence[str]] = None
+    # Plot render processes for this run (None: PLOT_WORKERS, 0: render in the run's process)
+    plot_workers: Optional[int] = None
+    # Input data
+    invoices_file: str = INVOICES_FILE
+    products_file: str = PRODUCTS_FILE
+    test_file: str = TEST_FILE
+    # Database and the ingest artifacts next to it
+    db_path: str = DB_PATH
+    join_index_path: str = JOIN_INDEX_PATH
+    z_score_path: str = Z_SCORE_MMAP_PATH
+    shard_dir: str = SHARD_DIR
+    # Plots, report, its section cache and the PDF
+    output_dir: str = 'output'
+    report_file: str = REPORT_OUTPUT_FILE
+    report_tables_dir: str = REPORT_TABLES_DIR
+    report_cache_path: str = REPORT_CACHE_PATH
+    pdf_path: str = PDF_OUTPUT_PATH
+    pdf_markdown_path: str = REPORT_MARKDOWN_PATH
+    # Stage manifest and log of the run
+    manifest_path: str = STAGE_MANIFEST_PATH
+    log_file: str = LOG_FILE_PATH
+
+    @property
+    def name(self):
+        return os.path.basename(os.path.abspath(self.directory))
+
+    def path(self, field):
+        """The path of a file of the run (a field name, e.g. 'db_path') inside its directory"""
+        return os.path.normpath(os.path.join(self.directory, getattr(self, field)))
@@ -38,5 +38,125 @@ PRODUCTS_CSV_PATH = 'data/tbl_products.csv'
 TEST_CSV_PATH = 'data/tbl_test.csv'
 
 # pdf generator settings
-PDF_OUTPUT_PATH = 'output\\summary_report.pdf'
-REPORT_MARKDOWN_PATH = "output\\summary_report_markdown.md"
+PDF_OUTPUT_PATH = 'output/summary_report.pdf'
+REPORT_MARKDOWN_PATH = "output/summary_report_markdown.md"
+# Width of every image placed in the PDF (mm) and the resolution its thumbnail is rendered at
+PDF_IMAGE_SIZE_MM = 120
+PDF_IMAGE_DPI = 150
+
+# Amount sketches (built during ingest, stored next to the tables)
+SKETCH_TABLE = 'amount_sketches'
+SKETCH_K = 256
+# Every sketch histogram uses the same signed log-scale bin edges, so sketches built apart
+# (per chunk, shard or ingest) always merge: BINS_PER_DECADE bins per power of ten for
+# magnitudes from MIN to MAX, one bin for (-MIN, MIN) and under/overflow counts beyond MAX
+SKETCH_HISTOGRAM_BINS_PER_DECADE = 10
+SKETCH_HISTOGRAM_MIN = 0.01
+SKETCH_HISTOGRAM_MAX = 1e9
+SKETCH_CHUNK_SIZE = 100000
+
+# Z-scores are kept out of core in a memory-mapped float32 file
+Z_SCORE_MMAP_PATH = 'output/z_scores.f32'
+Z_SCORE_CHUNK_SIZE = 100000
+
+# Report pipeline worker pool
+PIPELINE_MAX_WORKERS = 4
+
+# Answer the product/event/UI/description/group summaries from one cube scan
+USE_CUBE_ENGINE = True
+
+# Month-partitioned invoices; when enabled, analyses only read [ANALYSIS_START_DATE, ANALYSIS_END_DATE).
+# The amount sketches (and the product sketches the outlier thresholds reuse) are built from the
+# windowed invoices at ingest; the daily rollup and the shards keep every row and are windowed on read
+APPLY_ANALYSIS_WINDOW = False
+INVOICE_PARTITION_PREFIX = 'invoices_'
+PARTITION_CATALOG_TABLE = 'invoice_partitions'
+
+# Hash-sharded storage by userid (0 disables sharding); shard cubes are built on a process pool
+SHARD_COUNT = 0
+SHARD_DIR = 'shards'
+SHARD_WORKERS = None
+
+# userid -> experiment assignment join index, rebuilt at every ingest
+JOIN_INDEX_PATH = 'output/assignment_index.npz'
+
+# Answer every query with pandas on the cleaned frames instead of reading them back from SQLite
+IN_MEMORY_ANALYTICS = False
+# SQLite persistence with in-memory analytics: 'sync', 'async' (background thread) or 'off';
+# the SQL path always persists synchronously
+PERSIST_TO_SQLITE = 'sync'
+
+# Stratified invoice sample (experiment group x product) for the approximate query mode
+APPROXIMATE_MODE = False
+SAMPLE_TABLE = 'invoice_sample'
+SAMPLE_STRATA_TABLE = 'sample_strata'
+SAMPLE_FRACTION = 0.05
+SAMPLE_MIN_PER_STRATUM = 30
+SAMPLE_SEED = 42
+SAMPLE_CONFIDENCE = 0.95
+
+# Streaming outlier detection per experiment group and product
+OUTLIER_TABLE = 'invoice_outliers'
+OUTLIER_CHUNK_SIZE = 100000
+OUTLIER_Z_THRESHOLD = 3.0
+OUTLIER_IQR_FACTOR = 1.5
+OUTLIER_MAD_THRESHOLD = 3.5
+
+# Ingest validation; rejected rows are written to the quarantine table with their reason codes
+QUARANTINE_TABLE = 'quarantine'
+VALIDATION_DATE_FORMAT = '%m/%d/%Y'
+VALIDATION_MIN_AMOUNT = 0
+VALIDATION_CHANGE_VALUES = ('yes', 'no')
+
+# Daily rollup (date x group x product) maintained at ingest for the trend plots and time series
+ROLLUP_TABLE = 'daily_rollup'
+
+# First-purchase cohorts: period length ('M' months, 'W' weeks) and periods shown in the report
+COHORT_PERIOD = 'M'
+COHORT_REPORT_PERIODS = 6
+
+# Worker processes rendering the plots (None: one per CPU, 0: render in the calling process)
+PLOT_WORKERS = None
+
+# Reuse PNGs whose input data, parameters and plotting code are unchanged (manifest kept in the output directory)
+PLOT_CACHE_ENABLED = True
+PLOT_CACHE_MANIFEST = 'plot_cache.json'
+
+# Pre-aggregated plot inputs: histogram bins, density-grid bins per axis and confidence of group means
+PLOT_HISTOGRAM_BINS = 20
+PLOT_DENSITY_BINS = 200
+PLOT_CONFIDENCE = 0.95
+
+# Startup budget: cumulative import time (python -X importtime) allowed per entry point, in seconds,
+# and the heavy libraries that must only load when their feature is used
+STARTUP_IMPORT_BUDGET = 1.0
+STARTUP_LAZY_MODULES = ('matplotlib', 'seaborn', 'scipy', 'fpdf', 'PIL')
+
+# Report formats written next to the Markdown report (md, html, json, pdf), and the directory and
+# format (parquet, or csv without pyarrow) of the large tables exported as data files
+REPORT_FORMATS = ('md', 'html', 'json')
+REPORT_TABLES_DIR = 'output/tables'
+REPORT_TABLE_FORMAT = 'parquet'
+
+# Table fingerprints recorded at ingest, and the cache of report sections keyed by their inputs
+FINGERPRINT_TABLE = 'table_fingerprints'
+REPORT_CACHE_ENABLED = True
+REPORT_CACHE_PATH = 'output/report_cache.pkl'
+# Sources (relative to the repository root) of the code computing the analyses: a change to any of
+# them makes the analyze stage stale and rebuilds every cached report section
+ANALYSIS_SOURCE_PATTERNS = ("services/*.py", "models/*.py", "controllers/sql_queris.sql", "controllers/report_*.py")
+
+# Content hashes of the inputs and outputs of each CLI stage (ingest, analyze, plot, report, pdf)
+STAGE_MANIFEST_PATH = 'output/stage_manifest.json'
+
+# Batch runs: experiments run at once (None: one per CPU) and where the aggregate timing and status
+# summary is written; each experiment logs to LOG_FILE_PATH inside its directory
+BATCH_WORKERS = None
+BATCH_SUMMARY_PATH = 'batch_summary.json'
+
+# Local analysis server (main.py --serve): address, whether a fresh session computes every served
+# analysis in the background, and the server ingest notifies to drop its results (None: no notification)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_WARM_ANALYSES = True
+SERVER_NOTIFY_URL = None
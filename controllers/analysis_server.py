@@ -0,0 +1,204 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+from config.settings import DB_PATH, SERVER_HOST, SERVER_PORT, SERVER_WARM_ANALYSES
+from controllers.report_model import plain
+from controllers.report_pipeline import run_analyses
+from services.analysis_session import AnalysisSession
+from services.z_score_store import ZScoreHandle
+
+# Session analyses served per service, as GET /api/<service>/<analysis>
+SERVED_ANALYSES = {
+    "eda": ("product_sales_summary", "event_sales_summary", "group_sales_summary", "product_sales_statistics",
+            "z_scores", "percentage_changes", "eda_report"),
+    "test_analysis": ("ui_desc_changes", "product_ui_desc_changes", "test_analysis_report"),
+    "t_test": ("t_tests",),
+}
+
+
+def jsonable(value):
+    """An analysis result as JSON-compatible Python: frames as records, containers recursively"""
+    if isinstance(value, pd.DataFrame):
+        return [{str(column): jsonable(item) for column, item in row.items()} for row in value.to_dict(orient='records')]
+    if isinstance(value, pd.Series):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        return [jsonable(item) for item in value.tolist()]
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, ZScoreHandle):
+        # The per-invoice scores stay in their memory-mapped file
+        return {'count': len(value)}
+    return plain(value)
+
+
+def notify_ingest(url, timeout=2.0):
+    """Tell the analysis server at url that ingest stored new data; returns whether it answered"""
+    logger = logging.getLogger(__name__)
+    try:
+        request = urllib.request.Request(url.rstrip('/') + '/api/invalidate', data=b'', method='POST')
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+        logger.info(f"Analysis server at {url} invalidated after ingest.")
+        return True
+    except OSError as e:
+        logger.warning(f"Analysis server at {url} not notified of the ingest: {e}")
+        return False
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ABTestAnalysis/1.0"
+
+    def _send(self, method):
+        status, payload = self.server.app.respond(method, urlsplit(self.path).path)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send('GET')
+
+    def do_POST(self):
+        self._send('POST')
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(f"{self.address_string()} - {format % args}")
+
+
+class AnalysisServer:
+    """Serves the EDA, test-analysis and t-test results over local HTTP/JSON from a warm session.
+
+    The session keeps the parsed queries, the cube scan, the join index and every computed
+    result between requests, and requests are handled on concurrent threads (an analysis
+    asked for by several at once is still computed once). Any write to the database, that is
+    an ingest, swaps in a fresh session before the next request; POST /api/invalidate, which
+    ingest calls when SERVER_NOTIFY_URL is set, does so at once.
+
+    GET /api lists the analyses, GET /api/<service>/<analysis> returns one, GET /api/status
+    reports the session's instrumentation.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, db_path=DB_PATH, session_factory=None,
+                 warm=SERVER_WARM_ANALYSES):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        # Sessions read the served database unless a factory is given
+        self.session_factory = session_factory or functools.partial(AnalysisSession, db_path=db_path)
+        self.warm = warm
+        self.session = None
+        self.sessions_created = 0
+        self.requests = Counter()
+        self.started = time.time()
+        self._db_state = None
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.app = self
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _database_state(self):
+        try:
+            stat = os.stat(self.db_path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def current_session(self):
+        """The warm session, replaced first when the database was written since it was created"""
+        state = self._database_state()
+        with self._lock:
+            if self.session is None or state != self._db_state:
+                self._replace_session("the database changed" if self.session is not None else "startup")
+                self._db_state = state
+            return self.session
+
+    def invalidate(self):
+        """Drop every warm result: the next request is answered from a fresh session"""
+        with self._lock:
+            self._replace_session("invalidated")
+            self._db_state = self._database_state()
+
+    def _replace_session(self, reason):
+        self.session = self.session_factory()
+        self.sessions_created += 1
+        self.logger.info(f"Analysis session created ({reason}).")
+        if self.warm:
+            # Computed in the background; a request arriving first waits for the same computation
+            names = [name for names in SERVED_ANALYSES.values() for name in names]
+            threading.Thread(target=run_analyses, args=(self.session, names), name='session-warmup', daemon=True).start()
+
+    @staticmethod
+    def route(method, parts):
+        """The route a request matched, or 'unknown': requests are counted per route, not per raw path"""
+        if method == 'POST':
+            return 'POST /api/invalidate' if parts == ['api', 'invalidate'] else 'unknown'
+        if parts in (['api'], ['api', 'status']) or (
+                len(parts) == 3 and parts[0] == 'api' and parts[2] in SERVED_ANALYSES.get(parts[1], ())):
+            return 'GET /' + '/'.join(parts)
+        return 'unknown'
+
+    def respond(self, method, path):
+        """Status code and JSON payload of a request"""
+        parts = [part for part in path.split('/') if part]
+        with self._lock:
+            self.requests[self.route(method, parts)] += 1
+        if not parts or parts[0] != 'api':
+            return 404, {'error': f"Unknown path: {path}"}
+        if method == 'POST':
+            if parts[1:] == ['invalidate']:
+                self.invalidate()
+                return 200, {'invalidated': True, 'sessions_created': self.sessions_created}
+            return 404, {'error': f"Unknown path: {path}"}
+
+        session = self.current_session()
+        if len(parts) == 1:
+            return 200, {'services': {service: list(names) for service, names in SERVED_ANALYSES.items()},
+                         'cached': sorted(session.results)}
+        if parts[1:] == ['status']:
+            with self._lock:
+                requests = dict(self.requests)
+            return 200, {'uptime_seconds': time.time() - self.started, 'sessions_created': self.sessions_created,
+                         'requests': sum(requests.values()), 'routes': requests, 'tables': session.table_fingerprints(),
+                         'analyses': session.stats()}
+        if len(parts) != 3 or parts[2] not in SERVED_ANALYSES.get(parts[1], ()):
+            return 404, {'error': f"Unknown analysis: {'/'.join(parts[1:])}"}
+
+        name = parts[2]
+        cached = name in session.results
+        start = time.perf_counter()
+        try:
+            result = jsonable(session.get(name))
+        except Exception as e:
+            self.logger.error(f"Error serving analysis '{name}': {e}")
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+        return 200, {'service': parts[1], 'analysis': name, 'cached': cached,
+                     'seconds': time.perf_counter() - start, 'result': result}
+
+    def serve_forever(self):
+        self.current_session()
+        self.logger.info(f"Analysis server listening on {self.url}")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def shutdown(self):
+        self.httpd.shutdown()
@@ -0,0 +1,122 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from config.settings import ENV, BATCH_WORKERS, BATCH_SUMMARY_PATH
+
+
+def run_experiment(config):
+    """Run one experiment in this worker process on the files of its directory, logging to its own log file.
+
+    Returns its status with the status and run time of each stage. Failures are returned
+    rather than raised, so one broken experiment never stops the batch.
+    """
+    start = time.perf_counter()
+    result = {"experiment": config.name, "directory": config.directory, "status": "failed", "stages": {}, "error": None}
+    try:
+        if not os.path.isdir(config.directory):
+            raise FileNotFoundError(f"No experiment directory '{config.directory}'")
+        from logger import add_run_log, remove_run_log  # Imported on use: the batch process itself never loads the pipeline
+        from main import run_pipeline
+        logging.getLogger().setLevel(logging.DEBUG if ENV == 'DEBUG' else logging.INFO)
+        handler = add_run_log(config.path("log_file"))
+        try:
+            result["stages"] = run_pipeline(config, logging.getLogger("main"))
+        finally:
+            remove_run_log(handler)
+        failed = [stage for stage, status in result["stages"].items() if status["status"] == "failed"]
+        if failed:
+            result["error"] = f"Stages failed: {failed}"
+        else:
+            result["status"] = "ok"
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Experiment {config.name} failed: {e}")
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class BatchRunner:
+    """Runs many experiments at once on a process pool.
+
+    Each experiment runs in a fresh process on the paths of its RunConfig, so it reads its own
+    data/ and writes its own database, output/ and log; nothing is shared between runs.
+    """
+
+    def __init__(self, max_workers=BATCH_WORKERS, summary_path=BATCH_SUMMARY_PATH):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.summary_path = summary_path
+        self.results = []
+
+    def plot_workers(self, experiments):
+        """Plot render processes per experiment, sharing the CPUs between the experiments running at once"""
+        share = (os.cpu_count() or 1) // max(1, min(self.max_workers, experiments))
+        return share if share > 1 else 0
+
+    def run(self, configs):
+        """Run the experiments; returns the aggregate summary, which is also logged and saved as JSON"""
+        plot_workers = self.plot_workers(len(configs))
+        configs = [replace(config, directory=os.path.abspath(config.directory),
+                           plot_workers=plot_workers if config.plot_workers is None else config.plot_workers)
+                   for config in configs]
+        self.logger.info(f"Running {len(configs)} experiments on {min(self.max_workers, len(configs))} processes.")
+        start = time.perf_counter()
+        self.results = []
+        if configs:
+            # One fresh process per experiment: no logger or cache outlives its run
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(configs)), max_tasks_per_child=1,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(run_experiment, config) for config in configs]
+                for config, future in zip(configs, futures):
+                    try:
+                        self.results.append(future.result())
+                    except Exception as e:
+                        # The worker process itself died
+                        self.results.append({"experiment": config.name, "directory": config.directory, "status": "failed",
+                                             "stages": {}, "error": f"{type(e).__name__}: {e}", "seconds": None})
+        summary = self.summary(time.perf_counter() - start)
+        self.log_summary(summary)
+        self.save(summary)
+        return summary
+
+    def summary(self, wall_seconds):
+        """Counts, wall and per-experiment time, time per stage summed over experiments, and every result"""
+        experiment_seconds = sum(result["seconds"] or 0.0 for result in self.results)
+        stage_seconds = {}
+        for result in self.results:
+            for stage, status in result["stages"].items():
+                stage_seconds[stage] = stage_seconds.get(stage, 0.0) + status["seconds"]
+        succeeded = sum(result["status"] == "ok" for result in self.results)
+        return {
+            "experiments": len(self.results),
+            "succeeded": succeeded,
+            "failed": len(self.results) - succeeded,
+            "wall_seconds": wall_seconds,
+            "experiment_seconds": experiment_seconds,
+            "stage_seconds": stage_seconds,
+            "results": self.results,
+        }
+
+    def log_summary(self, summary):
+        for result in summary["results"]:
+            stages = ", ".join(f"{stage}={status['status']} {status['seconds']:.2f}s" for stage, status in result["stages"].items())
+            seconds = f"{result['seconds']:.2f}s" if result["seconds"] is not None else "-"
+            line = f"Experiment {result['experiment']}: {result['status']} in {seconds}" + (f" ({stages})" if stages else "")
+            if result["error"]:
+                self.logger.error(f"{line}: {result['error']}")
+            else:
+                self.logger.info(line)
+        self.logger.info(f"Batch finished: {summary['succeeded']}/{summary['experiments']} experiments succeeded "
+                         f"in {summary['wall_seconds']:.2f}s ({summary['experiment_seconds']:.2f}s of experiment time).")
+
+    def save(self, summary):
+        try:
+            with open(self.summary_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            self.logger.info(f"Batch summary saved to {self.summary_path}")
+        except OSError as e:
+            self.logger.error(f"Error saving the batch summary: {e}")
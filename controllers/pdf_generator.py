@@ -1,111 +1,175 @@
+import io
 import os
 import logging
-from PIL import Image
-from fpdf import FPDF
-from config.settings import PDF_OUTPUT_PATH, REPORT_MARKDOWN_PATH
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import PDF_OUTPUT_PATH, REPORT_MARKDOWN_PATH, PDF_IMAGE_SIZE_MM, PDF_IMAGE_DPI
+from controllers.report_model import (Report, Part, Section, Fields, Text, Figure, ReportRenderer, MarkdownRenderer,
+                                      render_report)
+
+
+def thumbnail_file(path, size):
+    """A PNG file shrunk to fit `size` pixels, as an in-memory PNG"""
+    from PIL import Image  # Imported on use: the PDF libraries are only needed when a PDF is written
+
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+    img.thumbnail(size)
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def buffer_pdf():
+    """An FPDF that also places images from in-memory PNG buffers.
+
+    fpdf 1.7 only reads images from files by name, but reuses whatever info is registered
+    under that name; the buffer's pixels are registered directly, so nothing is written to disk.
+    """
+    from fpdf import FPDF  # Imported on use: the PDF libraries are only needed when a PDF is written
+    from PIL import Image
+
+    class BufferPDF(FPDF):
+        def image_buffer(self, name, buffer, **kwargs):
+            if name not in self.images:
+                buffer.seek(0)
+                with Image.open(buffer) as img:
+                    img = img.convert('RGB')
+                self.images[name] = {'i': len(self.images) + 1, 'w': img.width, 'h': img.height, 'cs': 'DeviceRGB',
+                                     'bpc': 8, 'f': 'FlateDecode', 'data': zlib.compress(img.tobytes())}
+            self.image(name, **kwargs)
+
+    return BufferPDF()
+
+
+class PdfRenderer(ReportRenderer):
+    """Renders the report model to a PDF; figures come from in-memory thumbnails (path -> buffer)"""
+
+    def __init__(self, path, image_buffers=None, image_size=PDF_IMAGE_SIZE_MM):
+        self.path = path
+        self.image_buffers = image_buffers or {}
+        self.image_size = image_size
+        self.pdf = buffer_pdf()
+        self.pdf.set_auto_page_break(auto=True, margin=15)
+        self.pdf.add_page()
+
+    def _write(self, text, size=12, style=''):
+        # The core PDF fonts only cover Latin-1
+        self.pdf.set_font("Arial", style=style, size=size)
+        self.pdf.multi_cell(0, size * 0.5, text.encode('latin-1', 'replace').decode('latin-1'))
+
+    def _write_markdown(self, text):
+        """Lines of a row's Markdown text, with headings in bold"""
+        for line in text.splitlines():
+            heading = re.match(r'#+ (.*)', line)
+            if heading:
+                self._write(heading.group(1), style='B')
+            elif line:
+                self._write(line)
+
+    def begin(self, report):
+        self._write(report.title, size=18, style='B')
+
+    def begin_part(self, part, first):
+        self.pdf.ln(4)
+        self._write(part.title, size=15, style='B')
+
+    def begin_section(self, section, first):
+        if section.title:
+            self.pdf.ln(2)
+            self._write(section.title, style='B')
+
+    def table_row(self, table, row):
+        self._write_markdown(table.text(row))
+
+    def block(self, block):
+        if isinstance(block, Fields):
+            for label, value, unit in block.items:
+                self._write(f"- {label}: {value}{unit}")
+        elif isinstance(block, Text):
+            self._write(block.text)
+        elif isinstance(block, Figure) and block.path in self.image_buffers:
+            self.pdf.image_buffer(block.path, self.image_buffers[block.path], w=self.image_size)
+            self._write(block.caption, size=10)
+            self.pdf.ln(4)
+
+    def end(self, report):
+        self.pdf.output(self.path)
+
 
 class PDFGenerator:
-    def __init__(self):
-        """Initializes the report generator with image paths and descriptions"""
-        self.images = [
-            "output\\average_sales_by_ui_desc.png", "output\\monthly_trend.png",
-            "output\\sales_amount_boxplot.png", "output\\sales_amount_histogram.png",
-            "output\\sales_data_heatmap.png", "output\\ui_change_vs_sales_scatter.png",
-            "output\\z_score_boxplot.png", "output\\z_score_histogram.png"
-        ]
-        self.descriptions = [
-            "Description for the first image.",
-            "Description for the second image.",
-            "Description for the third image.",
-            "Description for the fourth image.",
-            "Description for the fifth image.",
-            "Description for the sixth image.",
-            "Description for the seventh image.",
-            "Description for the eighth image."
-        ]
-        self.pdf_output_path = PDF_OUTPUT_PATH
-        self.markdown_output_path = REPORT_MARKDOWN_PATH
+    def __init__(self, session=None, plot_generator=None, output_path=PDF_OUTPUT_PATH,
+                 markdown_path=REPORT_MARKDOWN_PATH, figure_dir='output'):
+        """Initializes the report generator with the plots to include and their captions"""
+        # Run-scoped analysis session shared with the report and plot generators
+        self.session = session
+        self.figures = [(os.path.join(figure_dir, name), caption) for name, caption in (
+            ("average_sales_by_ui_desc.png", "Average sales amount by UI and description change, with confidence intervals."),
+            ("monthly_trend.png", "Number of purchases per month."),
+            ("sales_amount_boxplot.png", "Distribution of invoice amounts."),
+            ("sales_amount_histogram.png", "Histogram of invoice amounts."),
+            ("ui_change_vs_sales_scatter.png", "Invoice amounts with and without the UI change."),
+            ("z_score_boxplot.png", "Distribution of the amount z-scores."),
+            ("z_score_histogram.png", "Histogram of the amount z-scores."),
+            ("cohort_retention_heatmap.png", "Share of each first-purchase cohort active in later periods."),
+        )]
+        self.pdf_output_path = output_path
+        self.markdown_output_path = markdown_path
         self.logger = logging.getLogger(__name__)
 
+        # Images are thumbnailed to their width in the PDF at PDF_IMAGE_DPI; a PlotGenerator
+        # created before the plots are rendered hands them over in memory at that size
+        self.image_size = PDF_IMAGE_SIZE_MM
+        pixels = round(PDF_IMAGE_SIZE_MM / 25.4 * PDF_IMAGE_DPI)
+        self.thumbnail_size = (pixels, pixels)
+        self.plot_generator = plot_generator
+        if plot_generator is not None:
+            plot_generator.thumbnail_size = self.thumbnail_size
+
         # Setup logger configuration
         logging.basicConfig(level=logging.INFO)
 
-    def _generate_pdf(self):
-        """Generates a PDF file with images and descriptions"""
+    def image_buffers(self):
+        """Thumbnail of every figure: handed over by the plot generator, or made from the file once.
+
+        Images not rendered in this run (cached by the plot generator, or never plotted) are
+        thumbnailed from their files in parallel; missing files are left out.
+        """
+        artifacts = self.plot_generator.artifacts if self.plot_generator is not None else {}
+        buffers = {}
+        missing = []
+        for path, _ in self.figures:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in artifacts:
+                buffers[path] = artifacts[name]
+            elif os.path.exists(path):
+                missing.append(path)
+            else:
+                self.logger.warning(f"Image {path} not found, leaving it out of the PDF.")
+        if missing:
+            with ThreadPoolExecutor() as pool:
+                buffers.update(zip(missing, pool.map(lambda path: thumbnail_file(path, self.thumbnail_size), missing)))
+        return buffers
+
+    def build_report(self, report=None):
+        """The given report model (figures only by default) with a part showing the plots"""
+        report = report or Report("Summary Report")
+        figures = [Figure(path, caption) for path, caption in self.figures if os.path.exists(path)]
+        report.parts.append(Part("figures", "Figures", [Section("figures", None, figures)]))
+        return report
+
+    def generate_reports(self, report=None):
+        """Renders the report model with its figures to PDF and Markdown in one pass"""
         try:
-            pdf = FPDF()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-
-            image_width = 60  # Width of image in PDF
-            image_height = 60  # Height of image in PDF
-
-            for i in range(len(self.images)):
-                # Load image
-                img = Image.open(self.images[i])
-                
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize image
-                img.thumbnail((image_width, image_height))
-
-                # Temporary save resized image as PNG to preserve transparency (if any)
-                temp_img_path = f"temp_img_{i}.png"
-                img.save(temp_img_path, "PNG")  # Save as PNG to preserve transparency
-
-                # Add image to PDF
-                x_position = 10 + (i % 4) * (image_width + 10)
-                y_position = 30 + (i // 4) * (image_height + 30)
-                pdf.image(temp_img_path, x=x_position, y=y_position, w=image_width, h=image_height)
-
-                # Add description below the image
-                pdf.ln(image_height + 5)
-                pdf.multi_cell(0, 10, self.descriptions[i])
-
-                # Remove temporary image file
-                os.remove(temp_img_path)
-
-            # Output the PDF to the specified path
-            pdf.output(self.pdf_output_path)
-            self.logger.info(f"PDF report generated successfully at {self.pdf_output_path}")
-
-        except Exception as e:
-            self.logger.error(f"Error generating PDF report: {e}")
-            raise
-
-
-    def _generate_markdown(self):
-        """Generates a markdown file with images and descriptions"""
-        try:
-            markdown_content = "# Summary Report\n\n"
-
-            for i in range(len(self.images)):
-                markdown_content += f"## Image {i+1}\n"
-                markdown_content += f"![Image {i+1}]({self.images[i]})\n"
-                markdown_content += f"{self.descriptions[i]}\n\n"
-
-            # Save the markdown content to a file
+            self.logger.info("Starting report generation...")
+            report = self.build_report(report)
             with open(self.markdown_output_path, "w", encoding="utf-8") as md_file:
-                md_file.write(markdown_content)
-
+                render_report(report, [PdfRenderer(self.pdf_output_path, self.image_buffers(), self.image_size),
+                                       MarkdownRenderer(md_file)])
+            self.logger.info(f"PDF report generated successfully at {self.pdf_output_path}")
             self.logger.info(f"Markdown report generated successfully at {self.markdown_output_path}")
-
-        except Exception as e:
-            self.logger.error(f"Error generating markdown report: {e}")
-            raise
-
-    def generate_reports(self):
-        """Generates both the PDF and markdown reports"""
-        try:
-            self.logger.info("Starting report generation...")
-
-            # Generate PDF and Markdown reports
-            self._generate_pdf()
-            self._generate_markdown()
-
             self.logger.info("Report generation completed successfully.")
 
         except Exception as e:
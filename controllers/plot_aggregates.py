@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from config.settings import PLOT_HISTOGRAM_BINS, PLOT_DENSITY_BINS, PLOT_CONFIDENCE
+from services.sketch_service import AmountSketch
+
+# Compact inputs for the plots drawn from raw rows: whatever the row count, a payload is a
+# fixed number of bins, quantiles or group statistics, so render time and memory stay flat.
+
+# Fine bins the binned KDE is smoothed on
+KDE_GRID_POINTS = 512
+
+
+def _finite(values):
+    values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    return values[np.isfinite(values)]
+
+
+def histogram_bins(values, bins=PLOT_HISTOGRAM_BINS):
+    """Histogram counts and edges, with a binned Gaussian KDE scaled to the counts"""
+    values = _finite(values)
+    if len(values) == 0:
+        return None
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    counts, edges = np.histogram(values, bins=bins, range=(low, high))
+
+    # KDE with Scott's bandwidth, computed by smoothing a fine histogram instead of summing per-row kernels
+    fine_counts, fine_edges = np.histogram(values, bins=KDE_GRID_POINTS, range=(low, high))
+    step = fine_edges[1] - fine_edges[0]
+    bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5) if len(values) > 1 else 0.0
+    if bandwidth > 0:
+        half = int(np.ceil(4 * bandwidth / step))
+        kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * step / bandwidth) ** 2)
+        smoothed = np.convolve(fine_counts, kernel / kernel.sum())[half:half + KDE_GRID_POINTS]
+    else:
+        smoothed = fine_counts.astype(float)
+    # Scale the density to the height of the coarse bins
+    kde_y = smoothed * (edges[1] - edges[0]) / step
+    return {'counts': counts, 'edges': edges, 'kde_x': (fine_edges[:-1] + fine_edges[1:]) / 2, 'kde_y': kde_y}
+
+
+def boxplot_stats(values, label=None, whisker=1.5):
+    """Quartiles and Tukey whiskers in the format expected by matplotlib's Axes.bxp"""
+    values = _finite(values)
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - whisker * iqr) & (values <= q3 + whisker * iqr)]
+    stats = {'med': median, 'q1': q1, 'q3': q3, 'whislo': inside.min(), 'whishi': inside.max(), 'fliers': []}
+    if label is not None:
+        stats['label'] = label
+    return stats
+
+
+def grouped_boxplot_stats(frame, by, column):
+    """Box-plot statistics of a column for every value of another, in order of appearance"""
+    stats = [boxplot_stats(values, label=str(key)) for key, values in frame.groupby(by, sort=False)[column]]
+    return [entry for entry in stats if entry is not None]
+
+
+def group_means(frame, x, hue, column, confidence=PLOT_CONFIDENCE):
+    """Mean of a column per (x, hue) with its analytic t confidence interval"""
+    amounts = pd.to_numeric(frame[column], errors='coerce')
+    grouped = amounts.groupby([frame[x], frame[hue]], sort=False)
+    result = pd.DataFrame({'count': grouped.count(), 'mean': grouped.mean(), 'std': grouped.std()}).reset_index()
+    result.columns = [x, hue, 'count', 'mean', 'std']
+    return _with_interval(result, confidence)
+
+
+def _with_interval(result, confidence):
+    """Group means (count, mean and std columns) with the bounds of their analytic t confidence interval"""
+    from scipy.stats import t  # Imported on use: SciPy is slow to load
+    degrees = (result['count'] - 1).where(result['count'] > 1)
+    half_width = t.ppf(0.5 + confidence / 2, degrees) * result['std'] / np.sqrt(result['count'])
+    return result.assign(ci_low=result['mean'] - half_width, ci_high=result['mean'] + half_width)
+
+
+def density_grid(frame, x, y, bins=PLOT_DENSITY_BINS):
+    """Counts of rows on a grid, rasterizing a scatter of any size.
+
+    A categorical x gets one column of y bins per category; a numeric x is binned too.
+    """
+    y_values = pd.to_numeric(frame[y], errors='coerce')
+    valid = y_values.notna() & frame[x].notna()
+    y_values = y_values[valid].to_numpy(dtype=float)
+    if len(y_values) == 0:
+        return None
+    y_low, y_high = y_values.min(), y_values.max()
+    if y_low == y_high:
+        y_low, y_high = y_low - 0.5, y_high + 0.5
+    y_edges = np.linspace(y_low, y_high, bins + 1)
+
+    if pd.api.types.is_numeric_dtype(frame[x]):
+        x_values = frame[x][valid].to_numpy(dtype=float)
+        counts, x_edges, _ = np.histogram2d(x_values, y_values, bins=[bins, y_edges])
+        return {'counts': counts, 'x_edges': x_edges, 'y_edges': y_edges, 'x_labels': None}
+
+    codes, labels = pd.factorize(frame[x][valid])
+    y_bins = np.clip(np.searchsorted(y_edges, y_values, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(codes * bins + y_bins, minlength=len(labels) * bins).reshape(len(labels), bins)
+    return {'counts': counts, 'x_edges': None, 'y_edges': y_edges, 'x_labels': [str(label) for label in labels]}
+
+
+def chunked_aggregates(scan, x, hue, by, column, bins=PLOT_DENSITY_BINS, confidence=PLOT_CONFIDENCE):
+    """The group means, per-`by` box-plot statistics and x by column density grid of the rows of scan().
+
+    scan is called twice and yields DataFrame chunks, so no more than a chunk is ever held: the
+    first pass sums the moments per (x, hue), sketches the column per `by` value and finds its
+    range, the second counts the rows on the grid. None when the column has no values.
+    """
+    moments = []
+    sketches = {}
+    x_labels = {}
+    low = high = None
+    for chunk in scan():
+        values = pd.to_numeric(chunk[column], errors='coerce')
+        squares = pd.DataFrame({'count': values.notna().astype(int), 'sum': values, 'sum_sq': values * values})
+        moments.append(squares.groupby([chunk[x], chunk[hue]], sort=False).sum(min_count=0))
+        for key, group in values.groupby(chunk[by], sort=False):
+            sketches.setdefault(str(key), AmountSketch()).update(group.to_numpy(dtype=float))
+        valid = values.notna() & chunk[x].notna()
+        if valid.any():
+            x_labels.update(dict.fromkeys(pd.unique(chunk[x][valid])))
+            low = values[valid].min() if low is None else min(low, values[valid].min())
+            high = values[valid].max() if high is None else max(high, values[valid].max())
+    if low is None:
+        return None
+
+    totals = pd.concat(moments).groupby(level=[0, 1], sort=False).sum()
+    variance = (totals['sum_sq'] - totals['sum'] ** 2 / totals['count']) / (totals['count'] - 1)
+    means = pd.DataFrame({'count': totals['count'], 'mean': totals['sum'] / totals['count'],
+                          'std': np.sqrt(variance.clip(lower=0)).where(totals['count'] > 1)}).reset_index()
+    means.columns = [x, hue, 'count', 'mean', 'std']
+    means = _with_interval(means[means['count'] > 0].reset_index(drop=True), confidence)
+
+    stats = [dict(sketch.boxplot_stats(), label=label) for label, sketch in sketches.items() if sketch.count]
+
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    y_edges = np.linspace(low, high, bins + 1)
+    labels = list(x_labels)
+    counts = np.zeros((len(labels), bins), dtype=np.int64)
+    for chunk in scan():
+        values = pd.to_numeric(chunk[column], errors='coerce')
+        codes = pd.Categorical(chunk[x], categories=labels).codes.astype(np.int64)
+        valid = (codes >= 0) & values.notna().to_numpy()
+        y_bins = np.clip(np.searchsorted(y_edges, values.to_numpy(dtype=float)[valid], side='right') - 1, 0, bins - 1)
+        counts += np.bincount(codes[valid] * bins + y_bins, minlength=len(labels) * bins).reshape(len(labels), bins)
+    grid = {'counts': counts, 'x_edges': None, 'y_edges': y_edges, 'x_labels': [str(label) for label in labels]}
+    return {'means': means, 'stats': stats, 'grid': grid}
@@ -0,0 +1,127 @@
+import ast
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from importlib.metadata import version
+import numpy as np
+import pandas as pd
+
+# Read as text, never imported here: checking a plot's key must not load the plotting libraries
+RENDERERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plot_renderers.py')
+
+
+def _update_digest(digest, value):
+    """Feed a payload value into a hash: arrays and frames by content, containers recursively"""
+    if isinstance(value, pd.Series):
+        digest.update(repr(('series', value.name, str(value.dtype), str(value.index.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.DataFrame):
+        digest.update(repr(('frame', list(map(str, value.columns)), list(map(str, value.dtypes)))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=str):
+            digest.update(repr(key).encode())
+            _update_digest(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update_digest(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode())
+
+
+@functools.lru_cache(maxsize=None)
+def renderer_sources():
+    """Plot kind -> source of its renderer, of render_job and of its figure size, parsed from plot_renderers.py"""
+    with open(RENDERERS_PATH, 'r', encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source)
+    functions = {node.name: ast.get_source_segment(source, node) for node in tree.body if isinstance(node, ast.FunctionDef)}
+    renderers = next(node.value for node in tree.body if isinstance(node, ast.Assign)
+                     and any(isinstance(target, ast.Name) and target.id == 'RENDERERS' for target in node.targets))
+    sources = {}
+    for kind, entry in zip(renderers.keys, renderers.values):
+        renderer, figsize = entry.elts
+        sources[kind.value] = functions[renderer.id] + functions['render_job'] + ast.get_source_segment(source, figsize)
+    return sources
+
+
+@functools.lru_cache(maxsize=None)
+def library_versions():
+    return f"{version('matplotlib')}{version('seaborn')}"
+
+
+class PlotCache:
+    """Fingerprints of the rendered plots, kept in a manifest next to the PNGs.
+
+    A plot's key hashes its kind, its payload (the data and parameters it is drawn from),
+    the source of its renderer and the plotting library versions. A PNG whose key, size
+    and modification time match the manifest is reused instead of rendered again.
+    """
+
+    def __init__(self, directory, manifest_name):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.directory = directory
+        self.path = os.path.join(directory, manifest_name)
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def code_version(kind):
+        """Hash of the code drawing a plot kind"""
+        return hashlib.sha256(f"{renderer_sources()[kind]}{library_versions()}".encode()).hexdigest()
+
+    def key(self, kind, payload):
+        digest = hashlib.sha256()
+        digest.update(kind.encode())
+        digest.update(self.code_version(kind).encode())
+        _update_digest(digest, payload)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _file_state(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_fresh(self, file_name, key):
+        """Whether the PNG was rendered from the same key and has not been touched since"""
+        entry = self.entries.get(file_name)
+        path = os.path.join(self.directory, file_name)
+        if entry is None or entry['key'] != key or not os.path.exists(path):
+            return False
+        return entry['file'] == self._file_state(path)
+
+    def store(self, file_name, key):
+        """Record the key of a freshly rendered PNG"""
+        with self._lock:
+            self.entries[file_name] = {'key': key, 'file': self._file_state(os.path.join(self.directory, file_name))}
+            self._dirty = True
+
+    def clear(self):
+        """Forget every rendered plot, so each one is rendered again"""
+        with self._lock:
+            self.entries = {}
+            self._dirty = True
+
+    def save(self):
+        """Write the manifest if any plot was rendered since it was loaded"""
+        with self._lock:
+            if not self._dirty:
+                return
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            self._dirty = False
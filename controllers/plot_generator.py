@@ -1,10 +1,16 @@
+import io
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
+import multiprocessing
 import os
-import numpy as np
-from services.eda_service import EDAService
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from config.settings import PLOT_WORKERS, PLOT_CACHE_ENABLED, PLOT_CACHE_MANIFEST
+from controllers import plot_aggregates
+from services.analysis_session import AnalysisSession
+from services.sketch_service import AmountSketch, SketchService
+from services.rollup_service import DailyRollupService
 
 # Turn off DEBUG messages in matplotlib and Pillow
 logging.getLogger('matplotlib').setLevel(logging.WARNING)  # Disable debug messages from matplotlib
@@ -12,7 +18,7 @@ logging.getLogger('PIL').setLevel(logging.WARNING)  # Disable debug messages fro
 logging.getLogger('matplotlib.font_manager').setLevel(logging.WARNING)  # Disable font-related debug messages
 
 class PlotGenerator:
-    def __init__(self):
+    def __init__(self, session=None, output_dir='output'):
         # Initialize the logger
         self.logger = logging.getLogger(__name__)  # Initialize logger
         self.logger.setLevel(logging.INFO)  # Set log level to INFO
@@ -24,98 +30,182 @@ class PlotGenerator:
         ch.setFormatter(formatter)
         self.logger.addHandler(ch)
 
-        # Initialize the EDAService to fetch data
-        self.eda_service = EDAService()
+        # Share the run-scoped analysis session so nothing is computed twice
+        self.session = session or AnalysisSession()
+        self.eda_service = self.session.eda_service
+        self.sketch_service = SketchService(self.session.db_path)
+        self.session.register('final_data_aggregates', self._final_data_aggregates)
+        self.session.register('amount_sketch', self._amount_sketch)
+        self.session.register('z_score_sketch', self._z_score_sketch)
+
+        # Every plot with the session analyses it reads; generate_plots renders them in this order.
+        # No plot reads the final data rows: they read its sketches and chunked aggregates.
+        self.plots = {
+            'sales_amount_histogram': (self.plot_amount_histogram, ['amount_sketch']),
+            'z_score_histogram': (self.plot_z_score_histogram, ['z_score_sketch']),
+            'z_score_boxplot': (self.plot_z_score_boxplot, ['z_score_sketch']),
+            'group_sale_summery': (self.plot_group_sales_summary, ['group_sales_summary']),
+            'sales_amount_boxplot': (self.plot_amount_boxplot, ['amount_sketch']),
+            'ui_change_vs_sales_scatter': (self.plot_ui_change_scatter, ['final_data_aggregates']),
+            'average_sales_by_ui_desc': (self.plot_average_sales_by_ui_desc, ['final_data_aggregates']),
+            'sales_distribution_by_event': (self.plot_sales_distribution_by_event, ['final_data_aggregates']),
+            'monthly_trend': (self.plot_monthly_trend, ['daily_rollup']),
+            'outliers_by_segment': (self.plot_outliers_by_segment, ['outlier_summary']),
+            'cohort_retention_heatmap': (self.plot_cohort_retention, ['cohort_analysis']),
+        }
+
+        # Plots are rendered by worker processes (0 renders in this process); per-plot timings and errors
+        self.max_workers = PLOT_WORKERS
+        self.timings = {}
+        self.errors = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        # Fingerprints of the PNGs already in the output directory
+        self.cache_enabled = PLOT_CACHE_ENABLED
+        self._cache = None
+        # In-memory thumbnails (name -> BytesIO) of the plots rendered this run, when a size is set
+        self.thumbnail_size = None
+        self.artifacts = {}
 
         # Create the output directory if it doesn't exist
-        self.output_dir = 'output'
+        self.output_dir = output_dir
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
 
-    def plot_histogram(self, data, column_name, title, file_name):
-        """Plot a histogram for a specific column and save it to a file"""
+    def render_pool(self):
+        """Worker processes rendering the plots, started on first use"""
+        with self._lock:
+            if self._pool is None:
+                # Spawned workers start without the parent's threads, locks or pyplot state
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def plot_cache(self):
+        """Plot cache of the current output directory, or None when caching is off"""
+        if not self.cache_enabled:
+            return None
+        with self._lock:
+            if self._cache is None or self._cache.directory != self.output_dir:
+                if self._cache is not None:
+                    self._cache.save()
+                from controllers.plot_cache import PlotCache
+                self._cache = PlotCache(self.output_dir, PLOT_CACHE_MANIFEST)
+            return self._cache
+
+    def render(self, kind, payload, file_name):
+        """Render a plot from its pre-aggregated payload to a PNG in the output directory.
+
+        A PNG rendered from the same payload by the same code is reused. Otherwise, with
+        worker processes the payload is shipped to the pool and this waits for the file,
+        so concurrent callers render in parallel; without workers it renders in this process.
+        """
+        name = os.path.splitext(file_name)[0]
+        path = os.path.join(self.output_dir, file_name)
+        start = time.perf_counter()
+        cache = self.plot_cache()
+        key = cache.key(kind, payload) if cache is not None else None
+        if key is not None and cache.is_fresh(file_name, key):
+            with self._lock:
+                self.timings[name] = {"render": 0.0, "total": time.perf_counter() - start, "cached": True}
+            return {"path": path, "seconds": 0.0, "error": None, "cached": True}
         try:
-            plt.figure(figsize=(10, 6))
-            sns.histplot(data[column_name], kde=True, bins=20, color='blue')
-            plt.title(title)
-            plt.xlabel(column_name)
-            plt.ylabel("Frequency")
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
+            # Imported on use, so the plotting stack only loads once a plot is rendered
+            from controllers.plot_renderers import render_job
+            if self.max_workers == 0:
+                result = render_job(kind, payload, path, self.thumbnail_size)
+            else:
+                result = self.render_pool().submit(render_job, kind, payload, path, self.thumbnail_size).result()
         except Exception as e:
-            self.logger.error(f"Error plotting histogram for {column_name}: {e}")
+            result = {"path": path, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+        with self._lock:
+            self.timings[name] = {"render": result["seconds"], "total": time.perf_counter() - start, "cached": False}
+            if result["error"] is not None:
+                self.errors[name] = result["error"]
+            elif result.get("thumbnail") is not None:
+                self.artifacts[name] = io.BytesIO(result["thumbnail"])
+        if result["error"] is not None:
+            self.logger.error(f"Error rendering plot '{name}': {result['error']}")
+        elif key is not None:
+            cache.store(file_name, key)
+        return result
+
+    def close(self):
+        """Shut the render pool down, save the plot cache and log the per-plot timings and errors"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        if self._cache is not None:
+            self._cache.save()
+        for name, timing in self.timings.items():
+            source = "cached" if timing.get("cached") else f"render={timing['render']:.3f}s"
+            self.logger.info(f"Plot '{name}': {source}, total={timing['total']:.3f}s")
+        if self.errors:
+            self.logger.warning(f"{len(self.errors)} plots failed: {list(self.errors)}")
+
+    def plot_histogram(self, data, column_name, title, file_name):
+        """Plot a histogram for a specific column and save it to a file"""
+        bins = plot_aggregates.histogram_bins(data[column_name])
+        if bins is None:
+            self.logger.warning(f"No values of {column_name} to plot a histogram of.")
+            return None
+        return self.render('histogram', dict(bins, column=column_name, title=title), file_name)
 
     def plot_boxplot(self, data, column_name, title, file_name):
         """Plot a boxplot to visualize the distribution and save it to a file"""
-        try:
-            plt.figure(figsize=(10, 6))
-            sns.boxplot(x=data[column_name], color='orange')
-            plt.title(title)
-            plt.xlabel(column_name)
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
-        except Exception as e:
-            self.logger.error(f"Error plotting boxplot for {column_name}: {e}")
+        stats = plot_aggregates.boxplot_stats(data[column_name])
+        if stats is None:
+            self.logger.warning(f"No values of {column_name} to plot a boxplot of.")
+            return None
+        return self.render('boxplot', {'stats': stats, 'column': column_name, 'title': title}, file_name)
+
+    def plot_histogram_from_sketch(self, sketch, column_name, title, file_name):
+        """Plot a histogram from the pre-binned counts of an amount sketch and save it to a file"""
+        counts, edges = sketch.histogram.populated()
+        if len(counts) == 0:
+            self.logger.warning(f"Sketch for {column_name} is empty, skipping histogram.")
+            return None
+        return self.render('sketch_histogram', {'counts': counts, 'edges': edges, 'column': column_name, 'title': title},
+                           file_name)
+
+    def plot_boxplot_from_sketch(self, sketch, column_name, title, file_name):
+        """Plot a boxplot from the quantiles of an amount sketch and save it to a file"""
+        stats = sketch.boxplot_stats()
+        if stats is None:
+            self.logger.warning(f"Sketch for {column_name} is empty, skipping boxplot.")
+            return None
+        return self.render('boxplot', {'stats': stats, 'column': column_name, 'title': title}, file_name)
 
     def plot_scatter(self, data, x_column, y_column, title, file_name):
         """Plot a scatter plot to explore the relationship between two columns and save it to a file"""
-        try:
-            plt.figure(figsize=(10, 6))
-            sns.scatterplot(x=data[x_column], y=data[y_column], color='green')
-            plt.title(title)
-            plt.xlabel(x_column)
-            plt.ylabel(y_column)
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
-        except Exception as e:
-            self.logger.error(f"Error plotting scatter plot for {x_column} vs {y_column}: {e}")
+        grid = plot_aggregates.density_grid(data, x_column, y_column)
+        if grid is None:
+            self.logger.warning(f"No values of {x_column} and {y_column} to plot.")
+            return None
+        return self.render('scatter', dict(grid, x_column=x_column, y_column=y_column, title=title), file_name)
 
     def plot_heatmap(self, data, title, file_name):
         """Plot a heatmap of correlations and save it to a file"""
-        try:
-            # Select only numeric columns for heatmap and drop rows with NaN values
-            numeric_data = data.select_dtypes(include=[float, int]).dropna()
-            
-            # If the numeric data is empty after dropping NaNs, log a warning
-            if numeric_data.empty:
-                self.logger.warning("No valid numeric data available for the heatmap.")
-                return
-
-            
-            # Calculate correlation matrix
-            correlation_matrix = numeric_data.corr()  # Correlation matrix of numeric columns
-            plt.figure(figsize=(12, 8))
-            sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', linewidths=0.5)
-            plt.title(title)
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
-        except Exception as e:
-            self.logger.error(f"Error plotting heatmap: {e}")
+        # Select only numeric columns for heatmap and drop rows with NaN values
+        numeric_data = data.select_dtypes(include=[float, int]).dropna()
+
+        # If the numeric data is empty after dropping NaNs, log a warning
+        if numeric_data.empty:
+            self.logger.warning("No valid numeric data available for the heatmap.")
+            return None
+
+        # Only the correlation matrix of the numeric columns is shipped to the renderer
+        return self.render('correlation_heatmap', {'correlation': numeric_data.corr(), 'title': title}, file_name)
 
     def plot_average_sales_by_group(self, data, file_name):
         """Plot the average sales amount for each group (UI and Description) and save it to a file"""
-        try:
-            plt.figure(figsize=(10, 6))
-            sns.barplot(x='ui_change', y='amount', hue='desc_change', data=data, estimator=np.mean)
-            plt.title('Average Sales Amount by UI and Description Changes')
-            plt.xlabel('UI Change')
-            plt.ylabel('Average Sales Amount')
-            plt.legend(title='Description Change')
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
-        except Exception as e:
-            self.logger.error(f"Error plotting average sales by group: {e}")
+        means = plot_aggregates.group_means(data, 'ui_change', 'desc_change', 'amount')
+        return self.render('average_sales_by_group', {'means': means}, file_name)
 
     def plot_sales_distribution(self, data, file_name):
         """Plot sales distribution across different groups and save it to a file"""
-        try:
-            plt.figure(figsize=(12, 6))
-            sns.boxplot(x='event_name', y='amount', data=data)
-            plt.title("Sales Distribution by Event Type")
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
-        except Exception as e:
-            self.logger.error(f"Error plotting sales distribution: {e}")
+        stats = plot_aggregates.grouped_boxplot_stats(data, 'event_name', 'amount')
+        return self.render('sales_distribution', {'stats': stats}, file_name)
 
     # def generate_group_sales_summary(self, data):
     #     """Group sales by UI and Description changes to find mean, sum, and count"""
@@ -129,113 +219,156 @@ class PlotGenerator:
     #         return None
 
 
-    def generate_monthly_sales_plot(self, file_name):
-        """Generate monthly sales plot"""
-        try:
-            # Get data
-            result = self.eda_service.execute_query('monthly_sales_query')
-            if result:
-                # query to df                
-                invoices_df = pd.DataFrame(result, columns=['amount', 'datepaid'])
-
-                # Change date format
-                invoices_df['datepaid'] = pd.to_datetime(invoices_df['datepaid'], format='%m/%d/%Y')
-
-                # Add month_year_column
-                invoices_df['month_year'] = invoices_df['datepaid'].dt.to_period('M')
-
-                # Number of sales
-                monthly_purchases = invoices_df.groupby('month_year').size()
-
-                # Save chart
-                plt.figure(figsize=(12, 6))
-                monthly_purchases.plot(kind='line', marker='o')
-                plt.title("Monthly Purchases Over Time")
-                plt.xlabel("Month-Year")
-                plt.ylabel("Number of Purchases")
-                plt.xticks(rotation=45)
-                plt.grid(True)
-                plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-                plt.close()  # Close the plot to avoid memory issues
+    def _monthly_purchases(self):
+        """Purchases per month, from the daily rollup when it was built, otherwise from every invoice"""
+        rollup = self.session.get('daily_rollup')
+        if rollup is not None and len(rollup) > 0:
+            return DailyRollupService.trend(rollup, 'M')['purchases']
 
-        except Exception as e:
-            self.logger.error(f"Error generating monthly sales plot: {e}")
+        result = self.session.get('monthly_sales')
+        if not result:
+            return None
+        # query to df
+        invoices_df = pd.DataFrame(result, columns=['amount', 'datepaid'])
 
-    def plot_sales_by_group(self, sales_data, file_name):
-        """Generate a bar plot for sales by group"""
-        try:
-            # Extract groups and total sales from the query result
-            groups = [entry['Group'] for entry in sales_data]
-            total_sales = [entry['Total Sales'] for entry in sales_data]
-
-            # Create the plot with a specific size
-            plt.figure(figsize=(10, 6))  # Set figure size
-            
-            # Use seaborn to create a bar plot with 'hue' set to 'Group'
-            sns.barplot(x=groups, y=total_sales, hue=groups, palette='viridis', legend=False)
+        # Change date format
+        invoices_df['datepaid'] = pd.to_datetime(invoices_df['datepaid'], format='%m/%d/%Y')
 
-            # Set plot title and labels for axes
-            plt.title("Total Sales by Group", fontsize=16)
-            plt.xlabel("Group", fontsize=14)
-            plt.ylabel("Total Sales", fontsize=14)
+        # Add month_year_column
+        invoices_df['month_year'] = invoices_df['datepaid'].dt.to_period('M')
 
-            plt.savefig(os.path.join(self.output_dir, file_name))  # Save the plot
-            plt.close()  # Close the plot to avoid memory issues
+        # Number of sales
+        return invoices_df.groupby('month_year').size()
 
-        except Exception as e:
-            # Handle any exception that may occur during the plot generation
-            print(f"Error generating plot: {e}")
+    def generate_monthly_sales_plot(self, file_name):
+        """Generate monthly sales plot"""
+        monthly_purchases = self._monthly_purchases()
+        if monthly_purchases is not None:
+            return self.render('monthly_purchases', {'purchases': monthly_purchases}, file_name)
+        return None
 
-    def generate_plots(self):
-        """Generate all required plots for EDA"""
+    def plot_sales_by_group(self, sales_data, file_name):
+        """Generate a bar plot for sales by group"""
+        # Extract groups and total sales from the query result
+        groups = [entry['Group'] for entry in sales_data]
+        total_sales = [entry['Total Sales'] for entry in sales_data]
+        return self.render('sales_by_group', {'groups': groups, 'total_sales': total_sales}, file_name)
+
+    def plot_outlier_counts(self, outlier_summary, file_name):
+        """Generate a grouped bar plot of the outliers flagged per segment by each method"""
+        counts = pd.DataFrame(outlier_summary).set_index('Segment')[['Z-Score', 'IQR', 'MAD']]
+        return self.render('outlier_counts', {'counts': counts}, file_name)
+
+    def plot_cohort_heatmap(self, retention, file_name):
+        """Generate a cohort x period heatmap of the share of each cohort still purchasing"""
+        return self.render('cohort_heatmap', {'retention': retention, 'figsize': (12, max(4, 0.5 * len(retention) + 2))},
+                           file_name)
+
+    def _final_data_aggregates(self):
+        """Group means, per-event box-plot statistics and the UI-change density grid of the final data, built chunk by chunk"""
         try:
-            report = self.eda_service.generate_report()  # Fetching the full EDA report
-
-            # Example data (replace with actual data)
-            final_data = self.eda_service.execute_query('final_data_query')  # Replace with actual query for the final data
-            # Convert your list of tuples to a pandas DataFrame
-            final_data_df = pd.DataFrame(final_data, columns=['product_name', 'amount', 'ui_change', 'desc_change'])
-
-            # Plot histograms for relevant columns (e.g., 'amount')
-            if final_data_df is not None and 'amount' in final_data_df.columns:
-                self.plot_histogram(final_data_df, 'amount', 'Distribution of Sales Amount', 'sales_amount_histogram.png')
-
-            # Plot histograms and box plot for z score
-            if report['z_scores'] is not None :
-                self.plot_histogram(report['z_scores'] , 'z_scores', 'Z-Score histogram', 'z_score_histogram.png')
-                self.plot_boxplot(report['z_scores'], 'z_scores', 'Boxplot of Z-Score', 'z_score_boxplot.png')
-
-            # Plot summery of groups
-            if report['group_sales_summary'] is not None :
-                self.plot_sales_by_group(report['group_sales_summary'], 'group_sale_summery.png')
-
-            # Plot boxplots for relevant columns (e.g., 'amount')
-            if final_data_df is not None and 'amount' in final_data_df.columns:
-                self.plot_boxplot(final_data_df, 'amount', 'Boxplot of Sales Amount', 'sales_amount_boxplot.png')
-
-            # Plot scatter plots for relevant columns (e.g., 'ui_change' vs 'amount')
-            if final_data_df is not None and 'ui_change' in final_data_df.columns and 'amount' in final_data_df.columns:
-                self.plot_scatter(final_data_df, 'ui_change', 'amount', 'Scatter Plot of UI Change vs Sales', 'ui_change_vs_sales_scatter.png')
-
-            # Plot heatmap for correlations in the data
-            # if final_data_df is not None:
-            #     self.plot_heatmap(final_data_df, 'Correlation Heatmap of Sales Data', 'sales_data_heatmap.png')
-
-            # Plot average sales amount for each group (UI and Description)
-            if final_data_df is not None and 'ui_change' in final_data_df.columns and 'desc_change' in final_data_df.columns:
-                self.plot_average_sales_by_group(final_data_df, 'average_sales_by_ui_desc.png')
-
-            # Plot sales distribution across different groups
-            if final_data_df is not None and 'event_name' in final_data_df.columns and 'amount' in final_data_df.columns:
-                self.plot_sales_distribution(final_data_df, 'sales_distribution_by_event.png')
-
-            # Generate group sales summary (mean, sum, count)
-            # if final_data_df is not None:
-            #     group_sales = self.generate_group_sales_summary(final_data_df)
-
-            # Plot monthly sales
-            self.generate_monthly_sales_plot('monthly_trend.png')  # اضافه کردن نمودار خریدهای ماهانه
-
-
+            return plot_aggregates.chunked_aggregates(self.eda_service.iter_final_data, 'ui_change', 'desc_change',
+                                                      'event_name', 'amount')
         except Exception as e:
-            self.logger.error(f"Error generating plots: {e}")
+            self.logger.error(f"Error aggregating the final data: {e}")
+            return None
+
+    def _amount_sketch(self):
+        """Amount sketch stored at ingest, or built from the in-memory invoices or, without either, from the streamed amounts"""
+        if self.session.frame_engine is not None:
+            return self.sketch_service.build_sketches(self.session.frame_engine.invoices).get('amount')
+        sketch = self.sketch_service.load_sketch('amount')
+        if sketch is None:
+            sketch = AmountSketch()
+            for rows in self.eda_service.iter_query('z_score'):
+                sketch.update([row[0] for row in rows])
+        return sketch if sketch.count else None
+
+    def _z_score_sketch(self):
+        """Sketch of the memory-mapped z-scores, read chunk by chunk"""
+        z_score_handle = (self.session.get('z_scores') or {}).get('z_scores')
+        if z_score_handle is not None and len(z_score_handle) > 0:
+            return z_score_handle.sketch()
+        return None
+
+    def plot_amount_histogram(self):
+        """Plot the amount histogram, from the sketch built at ingest when it is available"""
+        amount_sketch = self.session.get('amount_sketch')
+        if amount_sketch is not None:
+            self.plot_histogram_from_sketch(amount_sketch, 'amount', 'Distribution of Sales Amount', 'sales_amount_histogram.png')
+
+    def plot_z_score_histogram(self):
+        """Plot the z-score histogram"""
+        z_score_sketch = self.session.get('z_score_sketch')
+        if z_score_sketch is not None:
+            self.plot_histogram_from_sketch(z_score_sketch, 'z_scores', 'Z-Score histogram', 'z_score_histogram.png')
+
+    def plot_z_score_boxplot(self):
+        """Plot the z-score boxplot"""
+        z_score_sketch = self.session.get('z_score_sketch')
+        if z_score_sketch is not None:
+            self.plot_boxplot_from_sketch(z_score_sketch, 'z_scores', 'Boxplot of Z-Score', 'z_score_boxplot.png')
+
+    def plot_group_sales_summary(self):
+        """Plot summery of groups"""
+        group_sales = self.session.get('group_sales_summary')
+        if group_sales is not None:
+            self.plot_sales_by_group(group_sales, 'group_sale_summery.png')
+
+    def plot_amount_boxplot(self):
+        """Plot the amount boxplot, from the sketch built at ingest when it is available"""
+        amount_sketch = self.session.get('amount_sketch')
+        if amount_sketch is not None:
+            self.plot_boxplot_from_sketch(amount_sketch, 'amount', 'Boxplot of Sales Amount', 'sales_amount_boxplot.png')
+
+    def plot_ui_change_scatter(self):
+        """Plot scatter plots for relevant columns (e.g., 'ui_change' vs 'amount')"""
+        aggregates = self.session.get('final_data_aggregates')
+        if aggregates is not None:
+            self.render('scatter', dict(aggregates['grid'], x_column='ui_change', y_column='amount',
+                                        title='Scatter Plot of UI Change vs Sales'), 'ui_change_vs_sales_scatter.png')
+
+    def plot_average_sales_by_ui_desc(self):
+        """Plot average sales amount for each group (UI and Description)"""
+        aggregates = self.session.get('final_data_aggregates')
+        if aggregates is not None:
+            self.render('average_sales_by_group', {'means': aggregates['means']}, 'average_sales_by_ui_desc.png')
+
+    def plot_sales_distribution_by_event(self):
+        """Plot sales distribution across different groups"""
+        aggregates = self.session.get('final_data_aggregates')
+        if aggregates is not None and aggregates['stats']:
+            self.render('sales_distribution', {'stats': aggregates['stats']}, 'sales_distribution_by_event.png')
+
+    def plot_monthly_trend(self):
+        """Plot monthly sales"""
+        self.generate_monthly_sales_plot('monthly_trend.png')  # اضافه کردن نمودار خریدهای ماهانه
+
+    def plot_outliers_by_segment(self):
+        """Plot the outlier counts stored by the outlier engine"""
+        outlier_summary = self.session.get('outlier_summary')
+        if outlier_summary:
+            self.plot_outlier_counts(outlier_summary, 'outliers_by_segment.png')
+
+    def plot_cohort_retention(self):
+        """Plot the cohort retention matrix"""
+        cohorts = self.session.get('cohort_analysis')
+        if cohorts:
+            self.plot_cohort_heatmap(cohorts['retention'], 'cohort_retention_heatmap.png')
+
+    def generate_plots(self, names=None):
+        """Generate all required plots for EDA, or only the named ones, rendering them in parallel"""
+        unknown = [name for name in (names or []) if name not in self.plots]
+        if unknown:
+            self.logger.warning(f"Ignoring unknown plots: {unknown}")
+        selected = {name: plot for name, (plot, _) in self.plots.items() if names is None or name in names}
+
+        # Threads only gather each plot's inputs and wait on its worker process
+        with ThreadPoolExecutor(max_workers=max(1, len(selected))) as executor:
+            futures = {name: executor.submit(plot) for name, plot in selected.items()}
+        for name, future in futures.items():
+            if future.exception() is not None:
+                self.errors[name] = str(future.exception())
+                self.logger.error(f"Error generating plot '{name}': {future.exception()}")
+        self.close()
+        return {"timings": dict(self.timings), "errors": dict(self.errors)}
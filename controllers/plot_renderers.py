@@ -0,0 +1,178 @@
+import io
+import logging
+import time
+import traceback
+import numpy as np
+import seaborn as sns
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from config.settings import SKETCH_HISTOGRAM_MIN
+
+# Plot renderers run in worker processes: every figure is a standalone Figure on an Agg canvas,
+# so nothing touches pyplot's global state and renders can run side by side. Payloads are
+# pre-aggregated (see plot_aggregates), so no renderer ever receives raw rows.
+
+
+def _figure(figsize):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def render_histogram(ax, payload):
+    ax.stairs(payload['counts'], payload['edges'], fill=True, color='blue', alpha=0.4)
+    ax.plot(payload['kde_x'], payload['kde_y'], color='blue')
+    ax.set_title(payload['title'])
+    ax.set_xlabel(payload['column'])
+    ax.set_ylabel("Frequency")
+
+
+def render_boxplot(ax, payload):
+    ax.bxp([payload['stats']], vert=False, showfliers=False, patch_artist=True, boxprops={'facecolor': 'orange'})
+    ax.set_yticks([])
+    ax.set_title(payload['title'])
+    ax.set_xlabel(payload['column'])
+
+
+def render_sketch_histogram(ax, payload):
+    """Counts of the sketch's log-scale bins, on a log axis so every bin has the same width"""
+    ax.stairs(payload['counts'], payload['edges'], fill=True, color='blue', alpha=0.6)
+    ax.set_xscale('symlog', linthresh=SKETCH_HISTOGRAM_MIN)
+    ax.set_title(payload['title'])
+    ax.set_xlabel(payload['column'])
+    ax.set_ylabel("Frequency")
+
+
+def render_scatter(ax, payload):
+    """Scatter rasterized to a density grid: one cell per bin, colored by its row count"""
+    counts = np.ma.masked_equal(payload['counts'], 0)
+    norm = LogNorm(vmin=1, vmax=max(1, counts.max()))
+    if payload['x_labels'] is None:
+        mesh = ax.pcolormesh(payload['x_edges'], payload['y_edges'], counts.T, cmap='Greens', norm=norm)
+    else:
+        # One column of y bins per category, centered on its tick like a categorical scatter
+        for position, column in enumerate(counts):
+            mesh = ax.pcolormesh([position - 0.4, position + 0.4], payload['y_edges'], column[:, None], cmap='Greens', norm=norm)
+        ax.set_xticks(range(len(payload['x_labels'])), payload['x_labels'])
+    ax.figure.colorbar(mesh, ax=ax, label='Invoices')
+    ax.set_title(payload['title'])
+    ax.set_xlabel(payload['x_column'])
+    ax.set_ylabel(payload['y_column'])
+
+
+def render_correlation_heatmap(ax, payload):
+    sns.heatmap(payload['correlation'], annot=True, cmap='coolwarm', linewidths=0.5, ax=ax)
+    ax.set_title(payload['title'])
+
+
+def render_average_sales_by_group(ax, payload):
+    """Group means as grouped bars with their analytic confidence intervals"""
+    means = payload['means']
+    x_levels = list(dict.fromkeys(means['ui_change']))
+    hue_levels = list(dict.fromkeys(means['desc_change']))
+    width = 0.8 / len(hue_levels)
+    for index, (hue, color) in enumerate(zip(hue_levels, sns.color_palette(n_colors=len(hue_levels)))):
+        rows = means[means['desc_change'] == hue].set_index('ui_change').reindex(x_levels)
+        positions = np.arange(len(x_levels)) - 0.4 + width * (index + 0.5)
+        ax.bar(positions, rows['mean'], width=width, color=color, label=hue)
+        ax.errorbar(positions, rows['mean'], yerr=[rows['mean'] - rows['ci_low'], rows['ci_high'] - rows['mean']],
+                    fmt='none', ecolor='#424242', elinewidth=2.4)
+    ax.set_xticks(range(len(x_levels)), x_levels)
+    ax.set_title('Average Sales Amount by UI and Description Changes')
+    ax.set_xlabel('UI Change')
+    ax.set_ylabel('Average Sales Amount')
+    ax.legend(title='Description Change')
+
+
+def render_sales_distribution(ax, payload):
+    ax.bxp(payload['stats'], showfliers=False, patch_artist=True)
+    ax.set_title("Sales Distribution by Event Type")
+    ax.set_xlabel('event_name')
+    ax.set_ylabel('amount')
+
+
+def render_monthly_purchases(ax, payload):
+    payload['purchases'].plot(kind='line', marker='o', ax=ax)
+    ax.set_title("Monthly Purchases Over Time")
+    ax.set_xlabel("Month-Year")
+    ax.set_ylabel("Number of Purchases")
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+    ax.grid(True)
+
+
+def render_sales_by_group(ax, payload):
+    groups = payload['groups']
+    sns.barplot(x=groups, y=payload['total_sales'], hue=groups, palette='viridis', legend=False, ax=ax)
+    ax.set_title("Total Sales by Group", fontsize=16)
+    ax.set_xlabel("Group", fontsize=14)
+    ax.set_ylabel("Total Sales", fontsize=14)
+
+
+def render_outlier_counts(ax, payload):
+    payload['counts'].plot(kind='bar', ax=ax, color=sns.color_palette('viridis', 3))
+    ax.set_title("Outliers by Segment and Method", fontsize=16)
+    ax.set_xlabel("Segment", fontsize=14)
+    ax.set_ylabel("Flagged Invoices", fontsize=14)
+    ax.tick_params(axis='x', rotation=45)
+    ax.figure.tight_layout()
+
+
+def render_cohort_heatmap(ax, payload):
+    sns.heatmap(payload['retention'], annot=True, fmt='.0%', cmap='viridis', vmin=0, vmax=1, linewidths=0.5, ax=ax)
+    ax.set_title("Cohort Retention", fontsize=16)
+    ax.set_xlabel("Periods Since First Purchase", fontsize=14)
+    ax.set_ylabel("First-Purchase Cohort", fontsize=14)
+    ax.figure.tight_layout()
+
+
+# Renderer and figure size of every plot kind
+RENDERERS = {
+    'histogram': (render_histogram, (10, 6)),
+    'boxplot': (render_boxplot, (10, 6)),
+    'sketch_histogram': (render_sketch_histogram, (10, 6)),
+    'scatter': (render_scatter, (10, 6)),
+    'correlation_heatmap': (render_correlation_heatmap, (12, 8)),
+    'average_sales_by_group': (render_average_sales_by_group, (10, 6)),
+    'sales_distribution': (render_sales_distribution, (12, 6)),
+    'monthly_purchases': (render_monthly_purchases, (12, 6)),
+    'sales_by_group': (render_sales_by_group, (10, 6)),
+    'outlier_counts': (render_outlier_counts, (12, 6)),
+    'cohort_heatmap': (render_cohort_heatmap, None),  # Sized by the payload
+}
+
+
+def thumbnail_png(fig, size):
+    """The figure as drawn by the last savefig, shrunk to fit `size` pixels, as PNG bytes"""
+    from PIL import Image  # Imported on use: only needed when a thumbnail is requested
+
+    width, height = fig.canvas.get_width_height()
+    image = Image.frombuffer('RGBA', (width, height), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+    image.thumbnail(size)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def render_job(kind, payload, path, thumbnail=None):
+    """Render one plot to a PNG file; returns the render time and the error, if any.
+
+    With a `thumbnail` size (width, height in pixels) the result also carries the plot
+    shrunk to that size as PNG bytes, taken from the canvas without reading the file back.
+    Errors are returned rather than raised so one failing plot never breaks the pool.
+    """
+    start = time.perf_counter()
+    image = None
+    try:
+        renderer, figsize = RENDERERS[kind]
+        fig, ax = _figure(payload.get('figsize', figsize))
+        renderer(ax, payload)
+        fig.savefig(path)
+        if thumbnail is not None:
+            image = thumbnail_png(fig, thumbnail)
+        error = None
+    except Exception as e:
+        logging.getLogger(__name__).debug(traceback.format_exc())
+        error = f"{type(e).__name__}: {e}"
+    return {"path": path, "seconds": time.perf_counter() - start, "error": error, "thumbnail": image}
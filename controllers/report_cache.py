@@ -0,0 +1,77 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import threading
+import config.settings as settings
+from config.settings import ANALYSIS_SOURCE_PATTERNS
+from controllers.stage_manifest import source_digest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def settings_fingerprint():
+    """Hash of every setting, so a configuration change never reuses a section built under another"""
+    values = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+    return hashlib.sha256(repr(sorted(values.items())).encode()).hexdigest()
+
+
+class ReportCache:
+    """Blocks of the report sections, keyed by the fingerprint of what they were built from.
+
+    A section's key hashes its name, the source of its builder, the source of the code
+    computing the analyses (services, models and queries), the settings and the fingerprint
+    of the stored tables behind its analyses. A section whose key matches is replayed from
+    its cached blocks instead of being recomputed.
+    """
+
+    def __init__(self, path, source_root=ROOT):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._settings = settings_fingerprint()
+        self._sources = source_digest(ANALYSIS_SOURCE_PATTERNS, source_root)
+        try:
+            with open(path, 'rb') as f:
+                self.entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.entries = {}
+
+    def key(self, name, builder, input_fingerprint):
+        """Key of a section, or None when its inputs cannot be fingerprinted"""
+        if input_fingerprint is None:
+            return None
+        source = inspect.getsource(builder)
+        return hashlib.sha256(f"{name}|{source}|{self._sources}|{self._settings}|{input_fingerprint}".encode()).hexdigest()
+
+    def get(self, name, key):
+        """Cached blocks of a section built under the same key, or None"""
+        entry = self.entries.get(name)
+        if key is None or entry is None or entry['key'] != key:
+            return None
+        return entry['blocks']
+
+    def store(self, name, key, blocks):
+        if key is None:
+            return
+        with self._lock:
+            self.entries[name] = {'key': key, 'blocks': blocks}
+            self._dirty = True
+
+    def clear(self):
+        """Forget every cached section, so the next run rebuilds them all"""
+        with self._lock:
+            self.entries = {}
+            self._dirty = True
+
+    def save(self):
+        """Write the cache if any section was stored since it was loaded"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'wb') as f:
+                pickle.dump(self.entries, f)
+            self._dirty = False
@@ -1,16 +1,47 @@
 # report_generator.py
-from services.eda_service import EDAService
-from services.test_analysis_service import TestAnalysisService
-from services.t_test import TTestService
+from services.analysis_session import AnalysisSession
+from controllers.report_cache import ReportCache
+from controllers.report_model import (Report, Part, Section, Table, Fields, Text, render_report, MarkdownRenderer,
+                                      HtmlRenderer, JsonRenderer, ColumnarExporter, SectionRecorder)
+from config.settings import (COHORT_REPORT_PERIODS, REPORT_OUTPUT_FILE, REPORT_FORMATS, REPORT_TABLES_DIR,
+                             REPORT_TABLE_FORMAT, REPORT_CACHE_ENABLED, REPORT_CACHE_PATH)
+from contextlib import ExitStack
+import os
+import pandas as pd
 import logging
 
+REPORT_PARTS = {
+    "eda": "Exploratory Data Analysis (EDA) Results",
+    "test_analysis": "Test Analysis Results",
+    "t_test": "T-Test Results for All Group Comparisons",
+    "outliers": "Outlier Detection by Group and Product",
+    "cohorts": "Cohort and Repeat-Purchase Analysis",
+}
+
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, session=None, cache_path=REPORT_CACHE_PATH):
         self.logger = logging.getLogger(__name__)
         try:
-            self.eda_service = EDAService()
-            self.test_analysis_service = TestAnalysisService() 
-            self.t_test_service = TTestService().perform_t_tests_for_all_groups()
+            # Analyses are computed lazily through the run-scoped session
+            self.session = session or AnalysisSession()
+            self.eda_service = self.session.eda_service
+            self.test_analysis_service = self.session.test_analysis_service
+            # Blocks of the sections built by earlier runs, reused while their inputs are unchanged
+            self.cache = ReportCache(cache_path) if REPORT_CACHE_ENABLED else None
+
+            # Report sections in order: part, title, the builder of its blocks and the session analyses it reads
+            self.sections = {
+                "product_sales_summary": ("eda", "Product Sales Summary", self._product_sales_summary, ["product_sales_summary"]),
+                "event_sales_summary": ("eda", "Event Sales Summary", self._event_sales_summary, ["event_sales_summary"]),
+                "product_sales_statistics": ("eda", "Product Sales Statistics", self._product_sales_statistics, ["product_sales_statistics", "z_scores"]),
+                "percentage_changes": ("eda", "Percentage Changes in Sales", self._percentage_changes, ["percentage_changes"]),
+                "ui_desc_changes": ("test_analysis", "UI and Description Changes", self._ui_desc_changes, ["ui_desc_changes"]),
+                "product_ui_desc_changes": ("test_analysis", "Product, UI, and Description Changes", self._product_ui_desc_changes, ["product_ui_desc_changes"]),
+                "t_tests": ("t_test", None, self._t_tests, ["t_tests"]),
+                "outliers": ("outliers", None, self._outliers, ["outlier_summary"]),
+                "cohort_retention": ("cohorts", "Cohort Retention", self._cohort_retention, ["cohort_analysis"]),
+                "repeat_purchases": ("cohorts", "Repeat-Purchase Rate by Group", self._repeat_purchases, ["cohort_analysis"]),
+            }
 
             self.logger.info("ReportGenerator initialized successfully.")
         except Exception as e:
@@ -21,8 +52,8 @@ class ReportGenerator:
         """Run analyses and generate a summary report"""
         try:
             self.logger.info("Generating EDA and test analysis summaries for report...")
-            eda_results = self.eda_service.generate_report()
-            test_analysis_results = self.test_analysis_service.generate_report()
+            eda_results = self.session.get("eda_report")
+            test_analysis_results = self.session.get("test_analysis_report")
             self.logger.info("Summary report generation completed successfully.")
             return {"eda_results": eda_results, "test_analysis_results": test_analysis_results}
 
@@ -31,85 +62,239 @@ class ReportGenerator:
             self.logger.error(error_message)
             return None
 
-    def save_report(self, report_data, file_path='output/summary_report.md'):
-        """Save the final report in a Markdown file"""
+    def _product_sales_summary(self, report_data):
+        if 'product_sales_summary' in report_data['eda_results']:
+            return [Table("product_sales_summary", ["Product", "Total Sales"],
+                          report_data['eda_results']['product_sales_summary'],
+                          "- Product: {Product}, Total Sales: {Total Sales}", export=True,
+                          dtypes={"Product": "string", "Total Sales": "float"})]
+        return [Text("No product sales data available.")]
+
+    def _event_sales_summary(self, report_data):
+        if 'event_sales_summary' in report_data['eda_results']:
+            return [Table("event_sales_summary", ["Event ID", "Total Sales"],
+                          report_data['eda_results']['event_sales_summary'],
+                          "- Event ID: {Event ID}, Total Sales: {Total Sales}", export=True,
+                          dtypes={"Event ID": "int", "Total Sales": "float"})]
+        return [Text("No event sales data available.")]
+
+    def _product_sales_statistics(self, report_data):
+        if 'product_sales_statistics' in report_data['eda_results']:
+            stats = report_data['eda_results']['product_sales_statistics']
+            return [Fields("product_sales_statistics", [
+                ("Mean Sales", stats.get('mean', 'N/A'), ""),
+                ("Std Dev", stats.get('std', 'N/A'), ""),
+                ("Min Sales", stats.get('min', 'N/A'), ""),
+                ("Max Sales", stats.get('max', 'N/A'), ""),
+                ("Z Score mean", report_data['eda_results']['z_score_mean'], ""),
+                ("Z Score max", report_data['eda_results']['z_score_max'], ""),
+                ("Z Score min", report_data['eda_results']['z_score_min'], ""),
+                ("Z Score std dev", report_data['eda_results']['z_score_std_dev'], ""),
+            ])]
+        return [Text("No statistics data available.")]
+
+    def _percentage_changes(self, report_data):
+        if 'percentage_changes' in report_data['eda_results']:
+            changes = report_data['eda_results']['percentage_changes']
+            return [Fields("percentage_changes", [
+                ("Change from A to B", changes.get('B_A', 'N/A'), "%"),
+                ("Change from A to C", changes.get('C_A', 'N/A'), "%"),
+                ("Change from A to D", changes.get('D_A', 'N/A'), "%"),
+            ])]
+        return [Text("No percentage change data available.")]
+
+    def _ui_desc_changes(self, report_data):
+        if 'ui_desc_changes' in report_data['test_analysis_results']:
+            return [Table("ui_desc_changes", ["UI Change", "Description Change", "Average Purchase"],
+                          report_data['test_analysis_results']['ui_desc_changes'],
+                          "- UI Change: {UI Change}, Description Change: {Description Change}, "
+                          "Average Purchase: {Average Purchase}")]
+        return [Text("No UI and Description changes data available.")]
+
+    def _product_ui_desc_changes(self, report_data):
+        if 'product_ui_desc_changes' in report_data['test_analysis_results']:
+            return [Table("product_ui_desc_changes", ["Product", "UI Change", "Description Change", "Average Purchase"],
+                          report_data['test_analysis_results']['product_ui_desc_changes'],
+                          "- Product: {Product}, UI Change: {UI Change}, Description Change: {Description Change}, "
+                          "Average Purchase: {Average Purchase}", export=True,
+                          dtypes={"Product": "string", "UI Change": "string", "Description Change": "string",
+                                  "Average Purchase": "float"})]
+        return [Text("No product, UI, and description changes data available.")]
+
+    def _t_tests(self, report_data):
+        t_test_results = self.session.get("t_tests")
+        if t_test_results:
+            rows = ({"Groups": groups, "T-statistic": result['t_statistic'], "P-value": result['p_value']}
+                    for groups, result in t_test_results.items())
+            return [Table("t_tests", ["Groups", "T-statistic", "P-value"], rows,
+                          "### T-test between groups {Groups}:\n- T-statistic: {T-statistic}\n- P-value: {P-value}\n")]
+        return [Text("T-tests could not be performed.")]
+
+    def _outliers(self, report_data):
+        outlier_summary = self.session.get("outlier_summary")
+        if outlier_summary:
+            return [Table("outliers", ["Segment", "Outliers", "Z-Score", "IQR", "MAD"], outlier_summary,
+                          "- Segment: {Segment}, Outliers: {Outliers} (Z-Score: {Z-Score}, IQR: {IQR}, MAD: {MAD})")]
+        return [Text("No outlier data available.")]
+
+    @staticmethod
+    def _period_columns(frame):
+        return [f"P{age}" for age in list(frame.columns)[:COHORT_REPORT_PERIODS + 1]]
+
+    @staticmethod
+    def _format_periods(row, columns):
+        return ", ".join(f"{column} {row[column]:.1%}" if pd.notna(row[column]) else f"{column} n/a" for column in columns)
+
+    def _cohort_retention(self, report_data):
+        cohorts = self.session.get("cohort_analysis")
+        if cohorts:
+            periods = self._period_columns(cohorts['retention'])
+            rows = ({"Cohort": cohort, "Users": cohorts['cohort_sizes'][cohort], **dict(zip(periods, retention))}
+                    for cohort, retention in cohorts['retention'].iterrows())
+            return [Table("cohort_retention", ["Cohort", "Users"] + periods, rows,
+                          lambda row: f"- Cohort: {row['Cohort']}, Users: {row['Users']}, "
+                                      f"Retention: {self._format_periods(row, periods)}")]
+        return [Text("No cohort data available.")]
+
+    def _repeat_purchases(self, report_data):
+        cohorts = self.session.get("cohort_analysis")
+        if cohorts:
+            periods = self._period_columns(cohorts['repeat_curve'])
+            rows = ({"Group": group, "Users": cohorts['group_users'][group], **dict(zip(periods, curve)), "Overall": curve.iloc[-1]}
+                    for group, curve in cohorts['repeat_curve'].iterrows())
+            return [Table("repeat_purchases", ["Group", "Users"] + periods + ["Overall"], rows,
+                          lambda row: f"- Group: {row['Group']}, Users: {row['Users']}, "
+                                      f"Repeat Purchase Rate: {self._format_periods(row, periods)}, Overall {row['Overall']:.1%}")]
+        return [Text("No cohort data available.")]
+
+    def section_key(self, name):
+        """Cache key of a section from the fingerprint of its inputs, or None without a cache"""
+        if self.cache is None:
+            return None
+        _, _, builder, inputs = self.sections[name]
+        return self.cache.key(name, builder, self.session.input_fingerprint(inputs))
+
+    def cached_sections(self, sections=None):
+        """Selected sections whose cached blocks were built from the current inputs"""
+        if self.cache is None:
+            return []
+        return [name for name in self.select_sections(sections) if self.cache.get(name, self.section_key(name)) is not None]
+
+    def section_inputs(self, sections=None):
+        """Session analyses needed to write the given sections (all sections by default).
+
+        Sections reused from the cache need none.
+        """
+        inputs = []
+        cached = self.cached_sections(sections)
+        for name in self.select_sections(sections):
+            if name in cached:
+                continue
+            for analysis in self.sections[name][3]:
+                if analysis not in inputs:
+                    inputs.append(analysis)
+        return inputs
+
+    def select_sections(self, sections=None):
+        """Known section names in report order, restricted to the requested ones"""
+        if sections is None:
+            return list(self.sections)
+        unknown = [name for name in sections if name not in self.sections]
+        if unknown:
+            self.logger.warning(f"Ignoring unknown report sections: {unknown}")
+        return [name for name in self.sections if name in sections]
+
+    def build_report(self, report_data=None, sections=None):
+        """The report model of the selected sections.
+
+        Without report_data the sections read their results lazily from the session, so
+        only the analyses behind the selected sections are evaluated, and sections whose
+        inputs are unchanged since they were cached are replayed without any analysis.
+        """
+        use_cache = report_data is None and self.cache is not None
+        if report_data is None:
+            report_data = self.session.lazy_summary()
+        report = Report("Summary Report")
+        reused = []
+        for name in self.select_sections(sections):
+            part_key, title, builder, _ = self.sections[name]
+            if not report.parts or report.parts[-1].key != part_key:
+                report.parts.append(Part(part_key, REPORT_PARTS[part_key]))
+            key = self.section_key(name) if use_cache else None
+            blocks = self.cache.get(name, key) if key is not None else None
+            if blocks is not None:
+                reused.append(name)
+                report.parts[-1].sections.append(Section(name, title, blocks))
+            else:
+                blocks = builder(report_data)
+                if key is not None and self._unavailable(name):
+                    key = None  # Built without the data of a missing table: rebuilt next time rather than cached
+                report.parts[-1].sections.append(Section(name, title, blocks, cache_key=key))
+        if reused:
+            self.logger.info(f"Report sections reused from the cache: {reused}")
+        return report
+
+    def _unavailable(self, name):
+        """Whether an analysis the section read had no result (its table missing or its computation failed)"""
+        results = self.session.results
+        return any(analysis in results and results[analysis] is None for analysis in self.sections[name][3])
+
+    @staticmethod
+    def _fresh_sections(report):
+        """Cache key of every section of the report built from its analyses rather than replayed"""
+        return {section.key: section.cache_key for part in report.parts for section in part.sections
+                if section.cache_key is not None}
+
+    def _store_sections(self, report, recorder):
+        """Cache the sections recorded while the report was rendered"""
+        if self.cache is not None and recorder.sections:
+            built = self._fresh_sections(report)
+            for name, blocks in recorder.sections.items():
+                self.cache.store(name, built[name], blocks)
+            self.cache.save()
+
+    def cache_sections(self, sections=None):
+        """Build the selected sections whose inputs changed and cache them, without writing a report.
+
+        Returns the names of the sections built.
+        """
+        if self.cache is None:
+            return []
+        report = self.build_report(sections=sections)
+        recorder = SectionRecorder(self._fresh_sections(report))
+        render_report(report, [recorder])
+        self._store_sections(report, recorder)
+        return list(recorder.sections)
+
+    def save_report(self, report_data=None, file_path=REPORT_OUTPUT_FILE, sections=None, formats=REPORT_FORMATS,
+                    tables_dir=REPORT_TABLES_DIR):
+        """Save the final report as Markdown, and as the other formats next to it, in one pass.
+
+        Tables marked for export are also written as data files to tables_dir (None skips them).
+        Returns the report path, or None when the report could not be written.
+        """
         try:
             self.logger.info(f"Saving report to {file_path}...")
-            with open(file_path, 'w') as f:
-                f.write("# Summary Report\n\n")
-                f.write("## Exploratory Data Analysis (EDA) Results\n")
-                
-                # Product Sales Summary
-                f.write("### Product Sales Summary:\n")
-                if 'product_sales_summary' in report_data['eda_results']:
-                    for row in report_data['eda_results']['product_sales_summary']:
-                        f.write(f"- Product: {row['Product']}, Total Sales: {row['Total Sales']}\n")
-                else:
-                    f.write("No product sales data available.\n")
-                
-                # Event Sales Summary
-                f.write("\n### Event Sales Summary:\n")
-                if 'event_sales_summary' in report_data['eda_results']:
-                    for row in report_data['eda_results']['event_sales_summary']:
-                        f.write(f"- Event ID: {row['Event ID']}, Total Sales: {row['Total Sales']}\n")
-                else:
-                    f.write("No event sales data available.\n")
-
-                # Product Sales Statistics
-                f.write("\n### Product Sales Statistics:\n")
-                if 'product_sales_statistics' in report_data['eda_results']:
-                    stats = report_data['eda_results']['product_sales_statistics']
-                    f.write(f"- Mean Sales: {stats.get('mean', 'N/A')}\n")
-                    f.write(f"- Std Dev: {stats.get('std', 'N/A')}\n")
-                    f.write(f"- Min Sales: {stats.get('min', 'N/A')}\n")
-                    f.write(f"- Max Sales: {stats.get('max', 'N/A')}\n")
-                    f.write(f"- Z Score mean: {report_data['eda_results']['z_score_mean']}\n")
-                    f.write(f"- Z Score max: {report_data['eda_results']['z_score_max']}\n")
-                    f.write(f"- Z Score min: {report_data['eda_results']['z_score_min']}\n")
-                    f.write(f"- Z Score std dev: {report_data['eda_results']['z_score_std_dev']}\n")
-                else:
-                    f.write("No statistics data available.\n")
-
-                # Percentage Changes in Sales
-                f.write("\n### Percentage Changes in Sales:\n")
-                if 'percentage_changes' in report_data['eda_results']:
-                    changes = report_data['eda_results']['percentage_changes']
-                    f.write(f"- Change from A to B: {changes.get('B_A', 'N/A')}%\n")
-                    f.write(f"- Change from A to C: {changes.get('C_A', 'N/A')}%\n")
-                    f.write(f"- Change from A to D: {changes.get('D_A', 'N/A')}%\n")
-                else:
-                    f.write("No percentage change data available.\n")
-                
-                f.write("\n## Test Analysis Results\n")
-                
-                # UI and Description Changes
-                f.write("### UI and Description Changes:\n")
-                if 'ui_desc_changes' in report_data['test_analysis_results']:
-                    for row in report_data['test_analysis_results']['ui_desc_changes']:
-                        f.write(f"- UI Change: {row['UI Change']}, Description Change: {row['Description Change']}, Average Purchase: {row['Average Purchase']}\n")
-                else:
-                    f.write("No UI and Description changes data available.\n")
-                
-                # Product, UI, and Description Changes
-                f.write("\n### Product, UI, and Description Changes:\n")
-                if 'product_ui_desc_changes' in report_data['test_analysis_results']:
-                    for row in report_data['test_analysis_results']['product_ui_desc_changes']:
-                        f.write(f"- Product: {row['Product']}, UI Change: {row['UI Change']}, Description Change: {row['Description Change']}, Average Purchase: {row['Average Purchase']}\n")
-                else:
-                    f.write("No product, UI, and description changes data available.\n")
-
-                # T-Test Results
-                f.write("\n## T-Test Results for All Group Comparisons\n")
-                if self.t_test_service:
-                    for groups, result in self.t_test_service.items():
-                        f.write(f"### T-test between groups {groups}:\n")
-                        f.write(f"- T-statistic: {result['t_statistic']}\n")
-                        f.write(f"- P-value: {result['p_value']}\n\n")
-                else:
-                    f.write("T-tests could not be performed.\n")
-
-            self.logger.info(f"Report saved successfully to {file_path}")
+            report = self.build_report(report_data, sections)
+            base = os.path.splitext(file_path)[0]
+            renderers = {"md": MarkdownRenderer, "html": HtmlRenderer, "json": JsonRenderer}
+            with ExitStack() as stack:
+                outputs = [renderers[fmt](stack.enter_context(open(f"{base}.{fmt}", 'w', encoding='utf-8')))
+                           for fmt in formats if fmt != "pdf"]
+                if "pdf" in formats:
+                    from controllers.pdf_generator import PdfRenderer  # Imported on use: loads the PDF libraries
+                    outputs.append(PdfRenderer(f"{base}.pdf"))
+                if tables_dir is not None:
+                    outputs.append(ColumnarExporter(tables_dir, REPORT_TABLE_FORMAT))
+                # Freshly built sections are recorded in the same pass and cached for the next run
+                recorder = SectionRecorder(self._fresh_sections(report))
+                render_report(report, outputs + [recorder])
+            self._store_sections(report, recorder)
+
+            self.logger.info(f"Report saved successfully to {file_path} ({', '.join(formats)})")
+            return file_path
 
         except Exception as e:
             error_message = f"Unexpected error occurred while saving report: {e}"
             self.logger.error(error_message)
+            return None
@@ -0,0 +1,383 @@
+import csv
+import html
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+# The report as data: a Report holds parts, a part holds sections, and a section holds blocks
+# (tables, fields, text and figures). Renderers receive the model as a stream of events, so one
+# walk over it writes every format, and table rows, which may be generators, are read only once.
+
+
+@dataclass
+class Table:
+    """Rows of raw values; `line` gives the Markdown text of one row (a format string or a callable)"""
+    key: str
+    columns: List[str]
+    rows: Iterable[dict]
+    line: Union[str, Callable[[dict], str]]
+    # Large tables are also written as a columnar data file, with these column types
+    # ('string', 'float', 'int' or 'bool'; undeclared columns are written as strings)
+    export: bool = False
+    dtypes: Optional[dict] = None
+
+    def dtype(self, column):
+        return (self.dtypes or {}).get(column, 'string')
+
+    def text(self, row):
+        if isinstance(row, RenderedRow):
+            return row.text
+        return self.line(row) if callable(self.line) else self.line.format(**row)
+
+
+class RenderedRow(dict):
+    """A table row carrying its Markdown text, so a recorded table renders without its line"""
+
+    def __init__(self, values, text):
+        super().__init__(values)
+        self.text = text
+
+
+@dataclass
+class Fields:
+    """Labelled values: (label, value, unit)"""
+    key: str
+    items: List[Tuple[str, Any, str]]
+
+
+@dataclass
+class Text:
+    text: str
+
+
+@dataclass
+class Figure:
+    path: str
+    caption: str
+
+
+@dataclass
+class Section:
+    key: str
+    title: Optional[str]
+    blocks: list = field(default_factory=list)
+    # Fingerprint of the inputs of a freshly built section, to cache its blocks under once rendered
+    cache_key: Optional[str] = None
+
+
+@dataclass
+class Part:
+    key: str
+    title: str
+    sections: List[Section] = field(default_factory=list)
+
+
+@dataclass
+class Report:
+    title: str
+    parts: List[Part] = field(default_factory=list)
+
+
+def plain(value):
+    """A value as JSON-compatible Python: NumPy scalars unwrapped, NaN and infinities as None"""
+    if hasattr(value, 'item') and not isinstance(value, (list, dict, str)):
+        try:
+            value = value.item()
+        except (TypeError, ValueError):
+            pass
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def render_report(report, renderers):
+    """Walk the report once, feeding every block to every renderer"""
+    for renderer in renderers:
+        renderer.begin(report)
+    for part_index, part in enumerate(report.parts):
+        for renderer in renderers:
+            renderer.begin_part(part, part_index == 0)
+        for section_index, section in enumerate(part.sections):
+            for renderer in renderers:
+                renderer.begin_section(section, section_index == 0)
+            for block in section.blocks:
+                if isinstance(block, Table):
+                    for renderer in renderers:
+                        renderer.begin_table(block)
+                    for row in block.rows:
+                        for renderer in renderers:
+                            renderer.table_row(block, row)
+                    for renderer in renderers:
+                        renderer.end_table(block)
+                else:
+                    for renderer in renderers:
+                        renderer.block(block)
+            for renderer in renderers:
+                renderer.end_section(section)
+        for renderer in renderers:
+            renderer.end_part(part)
+    for renderer in renderers:
+        renderer.end(report)
+
+
+class ReportRenderer:
+    """Base renderer: every event is a no-op, so a renderer only handles what it writes"""
+
+    def begin(self, report): pass
+    def begin_part(self, part, first): pass
+    def begin_section(self, section, first): pass
+    def begin_table(self, table): pass
+    def table_row(self, table, row): pass
+    def end_table(self, table): pass
+    def block(self, block): pass
+    def end_section(self, section): pass
+    def end_part(self, part): pass
+    def end(self, report): pass
+
+
+class SectionRecorder(ReportRenderer):
+    """Records the blocks of the given sections as they are rendered, with table rows read into lists.
+
+    Recorded blocks hold no generators or callables, so they can be cached and rendered again.
+    """
+
+    def __init__(self, names):
+        self.names = set(names)
+        self.sections = {}
+        self._blocks = None
+
+    def begin_section(self, section, first):
+        self._blocks = [] if section.key in self.names else None
+
+    def begin_table(self, table):
+        if self._blocks is not None:
+            self._blocks.append(Table(table.key, table.columns, [], None, table.export, table.dtypes))
+
+    def table_row(self, table, row):
+        if self._blocks is not None:
+            self._blocks[-1].rows.append(RenderedRow(row, table.text(row)))
+
+    def block(self, block):
+        if self._blocks is not None:
+            self._blocks.append(block)
+
+    def end_section(self, section):
+        if self._blocks is not None:
+            self.sections[section.key] = self._blocks
+        self._blocks = None
+
+
+class MarkdownRenderer(ReportRenderer):
+    def __init__(self, f):
+        self.f = f
+
+    def begin(self, report):
+        self.f.write(f"# {report.title}\n\n")
+
+    def begin_part(self, part, first):
+        self.f.write(("" if first else "\n") + f"## {part.title}\n")
+
+    def begin_section(self, section, first):
+        if section.title:
+            self.f.write(("" if first else "\n") + f"### {section.title}:\n")
+
+    def table_row(self, table, row):
+        self.f.write(table.text(row) + "\n")
+
+    def block(self, block):
+        if isinstance(block, Fields):
+            for label, value, unit in block.items:
+                self.f.write(f"- {label}: {value}{unit}\n")
+        elif isinstance(block, Text):
+            self.f.write(block.text + "\n")
+        elif isinstance(block, Figure):
+            self.f.write(f"![{block.caption}]({block.path})\n{block.caption}\n\n")
+
+
+class HtmlRenderer(ReportRenderer):
+    def __init__(self, f):
+        self.f = f
+
+    def begin(self, report):
+        title = html.escape(report.title)
+        self.f.write(f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{title}</title>\n</head>\n"
+                     f"<body>\n<h1>{title}</h1>\n")
+
+    def begin_part(self, part, first):
+        self.f.write(f"<section id=\"{html.escape(part.key)}\">\n<h2>{html.escape(part.title)}</h2>\n")
+
+    def begin_section(self, section, first):
+        if section.title:
+            self.f.write(f"<h3>{html.escape(section.title)}</h3>\n")
+
+    def begin_table(self, table):
+        header = "".join(f"<th>{html.escape(str(column))}</th>" for column in table.columns)
+        self.f.write(f"<table id=\"{html.escape(table.key)}\">\n<tr>{header}</tr>\n")
+
+    def table_row(self, table, row):
+        cells = "".join(f"<td>{html.escape(str(row.get(column, '')))}</td>" for column in table.columns)
+        self.f.write(f"<tr>{cells}</tr>\n")
+
+    def end_table(self, table):
+        self.f.write("</table>\n")
+
+    def block(self, block):
+        if isinstance(block, Fields):
+            items = "".join(f"<dt>{html.escape(label)}</dt><dd>{html.escape(f'{value}{unit}')}</dd>\n"
+                            for label, value, unit in block.items)
+            self.f.write(f"<dl id=\"{html.escape(block.key)}\">\n{items}</dl>\n")
+        elif isinstance(block, Text):
+            self.f.write(f"<p>{html.escape(block.text)}</p>\n")
+        elif isinstance(block, Figure):
+            self.f.write(f"<figure><img src=\"{html.escape(block.path)}\" alt=\"{html.escape(block.caption)}\">"
+                         f"<figcaption>{html.escape(block.caption)}</figcaption></figure>\n")
+
+    def end_part(self, part):
+        self.f.write("</section>\n")
+
+    def end(self, report):
+        self.f.write("</body>\n</html>\n")
+
+
+class JsonRenderer(ReportRenderer):
+    """Writes the report as one JSON document, a row at a time"""
+
+    def __init__(self, f):
+        self.f = f
+        self._first = []  # Whether the innermost open list is still empty
+
+    def _item(self, text):
+        self.f.write(("" if self._first[-1] else ",") + "\n" + text)
+        self._first[-1] = False
+
+    def _open(self, fields, list_key):
+        # The object's fields, then the list its children are streamed into
+        self._item(f"{json.dumps(fields)[:-1]}, {json.dumps(list_key)}: [")
+        self._first.append(True)
+
+    def _close(self):
+        self._first.pop()
+        self.f.write("\n]}")
+
+    def begin(self, report):
+        self.f.write(f"{{\"title\": {json.dumps(report.title)}, \"parts\": [")
+        self._first.append(True)
+
+    def begin_part(self, part, first):
+        self._open({'key': part.key, 'title': part.title}, 'sections')
+
+    def begin_section(self, section, first):
+        self._open({'key': section.key, 'title': section.title}, 'blocks')
+
+    def begin_table(self, table):
+        self._open({'type': 'table', 'key': table.key, 'columns': table.columns}, 'rows')
+
+    def table_row(self, table, row):
+        self._item(json.dumps({column: plain(row.get(column)) for column in table.columns}))
+
+    def end_table(self, table):
+        self._close()
+
+    def block(self, block):
+        if isinstance(block, Fields):
+            self._item(json.dumps({'type': 'fields', 'key': block.key,
+                                   'items': {label: plain(value) for label, value, _ in block.items}}))
+        elif isinstance(block, Text):
+            self._item(json.dumps({'type': 'text', 'text': block.text}))
+        elif isinstance(block, Figure):
+            self._item(json.dumps({'type': 'figure', 'path': block.path, 'caption': block.caption}))
+
+    def end_section(self, section):
+        self._close()
+
+    def end_part(self, part):
+        self._close()
+
+    def end(self, report):
+        self._first.pop()
+        self.f.write("\n]}\n")
+
+
+# Conversion of an exported value to its declared column type
+COLUMN_CASTS = {'string': str, 'float': float, 'int': int, 'bool': bool}
+
+
+class ColumnarExporter(ReportRenderer):
+    """Writes the tables marked for export as data files, in batches of rows.
+
+    Parquet when pyarrow is installed, CSV otherwise. The Parquet schema comes from the
+    table's columns and declared dtypes, never from the values of one batch, so every
+    batch of a table is written with the same column types.
+    """
+
+    def __init__(self, directory, file_format='parquet', batch_size=10000):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.directory = directory
+        self.batch_size = batch_size
+        self.file_format = file_format
+        if file_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401  Optional dependency
+            except ImportError:
+                self.logger.info("pyarrow is not installed, exporting report tables as CSV.")
+                self.file_format = 'csv'
+        self.paths = {}
+        self._writer = None
+        self._file = None
+        self._batch = []
+
+    @staticmethod
+    def _schema(table):
+        import pyarrow as pa
+        types = {'string': pa.string(), 'float': pa.float64(), 'int': pa.int64(), 'bool': pa.bool_()}
+        return pa.schema([(column, types[table.dtype(column)]) for column in table.columns])
+
+    def begin_table(self, table):
+        if not table.export:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{table.key}.{self.file_format}")
+        self.paths[table.key] = path
+        if self.file_format == 'csv':
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=table.columns, extrasaction='ignore')
+            self._writer.writeheader()
+        else:
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, self._schema(table))
+        self._batch = []
+
+    def table_row(self, table, row):
+        if table.export:
+            self._batch.append({column: plain(row.get(column)) for column in table.columns})
+            if len(self._batch) >= self.batch_size:
+                self._flush(table)
+
+    def _flush(self, table):
+        if self.file_format == 'csv':
+            self._writer.writerows(self._batch)
+        elif self._batch:
+            import pyarrow as pa
+            columns = {}
+            for column in table.columns:
+                cast = COLUMN_CASTS[table.dtype(column)]
+                columns[column] = [None if row[column] is None else cast(row[column]) for row in self._batch]
+            self._writer.write_table(pa.table(columns, schema=self._writer.schema))
+        self._batch = []
+
+    def end_table(self, table):
+        if not table.export:
+            return
+        if self._batch:
+            self._flush(table)
+        if self.file_format == 'csv':
+            self._file.close()
+        else:
+            self._writer.close()
+        self._writer = None
+        self._file = None
@@ -0,0 +1,96 @@
+import logging
+from services.task_scheduler import TaskScheduler
+
+# Analyses run as independent pipeline tasks, with the session analyses each one reads
+ANALYSIS_TASKS = {
+    "product_sales_summary": [],
+    "event_sales_summary": [],
+    "group_sales_summary": [],
+    "product_sales_statistics": ["product_sales_summary"],
+    "z_scores": ["product_sales_summary"],
+    "percentage_changes": ["group_sales_summary"],
+    "eda_report": ["product_sales_summary", "event_sales_summary", "group_sales_summary",
+                   "product_sales_statistics", "z_scores"],
+    "ui_desc_changes": [],
+    "product_ui_desc_changes": [],
+    "test_analysis_report": ["ui_desc_changes", "product_ui_desc_changes"],
+    "t_tests": [],
+    "final_data": [],
+    # Streams the final data in chunks itself instead of reading final_data
+    "final_data_aggregates": [],
+    # The monthly trend reads the daily rollup; monthly_sales only backs it when no rollup was built
+    "daily_rollup": [],
+    "amount_sketch": [],
+    "z_score_sketch": ["z_scores"],
+    "outlier_summary": [],
+    "cohort_analysis": [],
+}
+
+
+def build_analysis_pipeline(session, max_workers=None):
+    """Declare every analysis as a task of a DAG"""
+    scheduler = TaskScheduler(max_workers) if max_workers else TaskScheduler()
+
+    # Analysis tasks go through the session, so a result is still computed only once
+    for name, inputs in ANALYSIS_TASKS.items():
+        scheduler.add(name, lambda *_, name=name: session.get(name), inputs=inputs)
+    return scheduler
+
+
+def build_report_pipeline(session, report_generator, plot_generator, sections=None, max_workers=None):
+    """Declare every analysis, the markdown report and each plot as tasks of one DAG.
+
+    The report task only depends on the analyses behind the selected sections.
+    """
+    scheduler = build_analysis_pipeline(session, max_workers)
+
+    def save_report(*_):
+        report_generator.save_report(sections=sections)
+
+    scheduler.add("summary_report", save_report, inputs=report_generator.section_inputs(sections))
+
+    # Plot tasks render in the plot generator's worker processes, so they run side by side
+    for name, (plot, inputs) in plot_generator.plots.items():
+        scheduler.add(f"plot:{name}", lambda *_, plot=plot: plot(), inputs=inputs)
+
+    return scheduler
+
+
+def pipeline_targets(sections=None, plots=None):
+    """Pipeline targets for a selective run; None means the full report and every plot"""
+    if sections is None and plots is None:
+        return None
+    targets = ["summary_report"] if sections else []
+    targets += [f"plot:{name}" for name in plots or []]
+    return targets
+
+
+def run_report_pipeline(session, report_generator, plot_generator, sections=None, plots=None):
+    """Run the report pipeline and log its critical-path timing report.
+
+    With sections and/or plots only those outputs are produced, and only the analyses
+    they depend on are evaluated.
+    """
+    logger = logging.getLogger(__name__)
+    scheduler = build_report_pipeline(session, report_generator, plot_generator, sections)
+    # A full run targets the outputs, so analyses only run for the stale report sections and the plots
+    targets = pipeline_targets(sections, plots) or [name for name in scheduler.tasks
+                                                    if name == "summary_report" or name.startswith("plot:")]
+    try:
+        scheduler.run(targets)
+    finally:
+        plot_generator.close()
+    if scheduler.errors:
+        logger.warning(f"{len(scheduler.errors)} pipeline tasks failed: {list(scheduler.errors)}")
+    return scheduler
+
+
+def run_analyses(session, names):
+    """Evaluate the named analyses, and those they read, side by side in the analysis DAG"""
+    logger = logging.getLogger(__name__)
+    scheduler = build_analysis_pipeline(session)
+    if names:
+        scheduler.run(names)
+    if scheduler.errors:
+        logger.warning(f"{len(scheduler.errors)} analyses failed: {list(scheduler.errors)}")
+    return scheduler
@@ -1,6 +1,6 @@
 import os
 
-def load_sql_queries(filename=r"controllers\sql_queris.sql"):
+def load_sql_queries(filename=os.path.join("controllers", "sql_queris.sql")):
     # Find the project base path and create the absolute file path
     project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     file_path = os.path.join(project_dir, filename)
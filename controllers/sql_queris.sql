@@ -79,6 +79,11 @@ FROM invoices;
 -- Query name: z_score
 SELECT amount FROM invoices WHERE amount IS NOT NULL
 
+-- Query name: amount_moments
+SELECT COUNT(amount), SUM(amount), SUM(amount * amount), MIN(amount), MAX(amount)
+FROM invoices
+WHERE amount IS NOT NULL;
+
 
 -- Query name: group_a_sales
 SELECT amount
@@ -107,3 +112,70 @@ FROM invoices
 JOIN test_analysis ON invoices.userid = test_analysis.userid
 WHERE COALESCE(test_analysis.ui_change, 'yes') = 'yes'
   AND COALESCE(test_analysis.desc_change, 'yes') = 'yes';
+
+-- Query name: cube_base_query
+SELECT
+    i.product_name,
+    i.event_id,
+    t.ui_change,
+    t.desc_change,
+    i.datepaid,
+    i.amount,
+    t.userid IS NOT NULL AS assigned,
+    p.event_id IS NOT NULL AS known_event
+FROM invoices i
+LEFT JOIN test_analysis t ON i.userid = t.userid
+LEFT JOIN products p ON i.event_id = p.event_id;
+
+-- Query name: cube_invoices_query
+SELECT
+    i.userid,
+    i.product_name,
+    i.event_id,
+    i.datepaid,
+    i.amount,
+    p.event_id IS NOT NULL AS known_event
+FROM invoices i
+LEFT JOIN products p ON i.event_id = p.event_id;
+
+-- Query name: final_invoices_query
+SELECT
+    i.userid,
+    p.event_name,
+    i.amount
+FROM invoices i
+JOIN products p ON i.event_id = p.event_id;
+
+-- Query name: invoice_amounts_query
+SELECT userid, amount
+FROM invoices;
+
+-- Query name: outlier_scan_query
+SELECT
+    i.userid,
+    i.product_name,
+    i.datepaid,
+    i.amount,
+    t.ui_change,
+    t.desc_change,
+    t.userid IS NOT NULL AS assigned
+FROM invoices i
+LEFT JOIN test_analysis t ON i.userid = t.userid;
+
+-- Query name: outlier_invoices_query
+SELECT userid, product_name, datepaid, amount
+FROM invoices;
+
+-- Query name: cohort_scan_query
+SELECT
+    i.userid,
+    i.datepaid,
+    t.ui_change,
+    t.desc_change,
+    t.userid IS NOT NULL AS assigned
+FROM invoices i
+LEFT JOIN test_analysis t ON i.userid = t.userid;
+
+-- Query name: cohort_invoices_query
+SELECT userid, datepaid
+FROM invoices;
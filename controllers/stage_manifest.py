@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, or None when it does not exist"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def source_digest(patterns, root='.'):
+    """SHA-256 of the files matching the glob patterns (relative to root), names and contents"""
+    digest = hashlib.sha256()
+    paths = sorted({path for pattern in patterns for path in glob.glob(os.path.join(root, pattern))})
+    for path in paths:
+        digest.update(os.path.relpath(path, root).replace(os.sep, '/').encode())
+        digest.update((file_digest(path) or '').encode())
+    return digest.hexdigest()
+
+
+class StageManifest:
+    """Content hashes of the inputs and outputs of every pipeline stage, kept in a JSON file.
+
+    A stage is fresh when its inputs hash as they did when it last completed and each of its
+    outputs still holds the content it wrote. File hashes are remembered with the file's size
+    and modification time, so only files touched since they were hashed are read again.
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.stages = manifest['stages']
+            self.files = manifest['files']
+        except (OSError, ValueError, KeyError, TypeError):
+            self.stages = {}
+            self.files = {}
+
+    def digest(self, path):
+        """Content hash of a file, re-read only when its size or modification time changed"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        state = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self.files.get(path)
+            if entry is not None and entry['file'] == state:
+                return entry['sha256']
+        sha256 = file_digest(path)
+        with self._lock:
+            self.files[path] = {'file': state, 'sha256': sha256}
+        return sha256
+
+    def digests(self, paths):
+        """Path -> content hash of the given files (None for missing ones)"""
+        return {path: self.digest(path) for path in paths}
+
+    def is_fresh(self, stage, inputs):
+        """Whether the stage last completed from the same inputs and its outputs are unchanged"""
+        entry = self.stages.get(stage)
+        if entry is None or entry['inputs'] != inputs:
+            return False
+        return all(sha256 is not None and self.digest(path) == sha256 for path, sha256 in entry['outputs'].items())
+
+    def outputs(self, stage):
+        """Output paths recorded for a stage when it last completed"""
+        entry = self.stages.get(stage)
+        return list(entry['outputs']) if entry is not None else []
+
+    def record(self, stage, inputs, outputs):
+        """Record a completed stage with the hashes of its inputs and of the files it wrote"""
+        hashes = self.digests(outputs)
+        with self._lock:
+            self.stages[stage] = {'inputs': inputs, 'outputs': hashes}
+
+    def invalidate(self, stage):
+        with self._lock:
+            self.stages.pop(stage, None)
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'stages': self.stages, 'files': self.files}, f, indent=2, sort_keys=True)
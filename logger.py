@@ -33,4 +33,20 @@ def setup_logger():
     except Exception as e:
         logger = logging.getLogger(__name__)
         logger.error(f"Error setting up logger: {e}")
-        raise  # Re-raise the exception after logging it
\ No newline at end of file
+        raise  # Re-raise the exception after logging it
+
+def add_run_log(path, logger=None):
+    """Log one run to its own file (replaced if it exists); returns the handler to remove when the run ends"""
+    logger = logger or logging.getLogger()
+    if os.path.exists(path):
+        os.remove(path)
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    return handler
+
+
+def remove_run_log(handler, logger=None):
+    """Stop logging to a run's file and close it"""
+    (logger or logging.getLogger()).removeHandler(handler)
+    handler.close()
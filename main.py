@@ -1,69 +1,397 @@
+import argparse
+from dataclasses import replace
+import glob
 import logging
+import os
+import time
 from services.data_loader import DataLoader
 from services.data_cleaner import DataCleaner
+from services.data_validator import DataValidator
 from controllers.report_generator import ReportGenerator  
 from models.database import Database
-from config.settings import DB_PATH, INVOICES_CSV_PATH, PRODUCTS_CSV_PATH, TEST_CSV_PATH
+from models.partitions import MonthPartitionedStore, window_frame
+from models.shards import ShardedStore
+from models.join_index import AssignmentIndex
+from models.fingerprints import store_table_fingerprints, load_table_fingerprints
+from config.settings import (SHARD_COUNT, IN_MEMORY_ANALYTICS, PERSIST_TO_SQLITE, QUARANTINE_TABLE, REPORT_FORMATS,
+                             SERVER_NOTIFY_URL, SERVER_PORT, ANALYSIS_SOURCE_PATTERNS)
+from config.run_config import RunConfig
 from logger import setup_logger
 import sqlite3
+import threading
 from controllers.plot_generator import PlotGenerator
-# from controllers.pdf_generator import PDFGenerator
+from services.sketch_service import SketchService
+from services.rollup_service import DailyRollupService
+from services.sample_service import SampleService
+from services.outlier_service import OutlierService
+from services.analysis_session import AnalysisSession
+from services.frame_query_engine import FrameQueryEngine
+from controllers.report_pipeline import run_report_pipeline, run_analyses
+from controllers.report_cache import settings_fingerprint
+from controllers.stage_manifest import StageManifest, source_digest
 
+# Pipeline stages in run order, with the stages whose outputs each one reads
+STAGES = {
+    "ingest": (),
+    "analyze": ("ingest",),
+    "plot": ("ingest",),
+    "report": ("analyze",),
+    "pdf": ("report", "plot"),
+}
+DEFAULT_STAGES = ("ingest", "analyze", "plot", "report")
+
+# Sources (relative to this file) whose content a stage's freshness depends on
+STAGE_SOURCES = {
+    "ingest": ("main.py", "models/*.py", "services/data_*.py", "services/sketch_service.py",
+               "services/rollup_service.py", "services/sample_service.py", "services/outlier_service.py"),
+    "analyze": ANALYSIS_SOURCE_PATTERNS,
+    "plot": ("services/*.py", "models/*.py", "controllers/sql_queris.sql", "controllers/plot_*.py"),
+    "report": ("controllers/report_*.py",),
+    "pdf": ("controllers/pdf_generator.py", "controllers/report_model.py"),
+}
+ROOT = os.path.dirname(os.path.abspath(__file__))
 
-def main():
-    logger = setup_logger() 
-    logger = logging.getLogger(__name__)
 
+def persist_to_sqlite(cleaned_data, logger, quarantine=None, config=RunConfig()):
+    """Write the cleaned data and the ingest artifacts (quarantine, sketches, rollup, partitions, shards, join index, sample, outliers)
+
+    Every file goes to the paths of the run's config.
+    """
+    db_path, join_index_path = config.path("db_path"), config.path("join_index_path")
     try:
-        logger.info("Program started. Loading database...")
+        db = Database(db_path)
 
-        # Load data
-        data_loader = DataLoader()
-        raw_data = data_loader.load_data()
+        # Load cleaned data into the database, and the rows rejected by validation next to it
+        with sqlite3.connect(db.db_path) as conn:
+            cleaned_data["invoices"].to_sql("invoices", conn, if_exists="replace", index=False)
+            cleaned_data["products"].to_sql("products", conn, if_exists="replace", index=False)
+            cleaned_data["test"].to_sql("test_analysis", conn, if_exists="replace", index=False)
+            if quarantine is not None:
+                quarantine.to_sql(QUARANTINE_TABLE, conn, if_exists="replace", index=False)
+            # Content fingerprints, committed with the tables, let later runs reuse unchanged report sections
+            store_table_fingerprints(conn, {"invoices": cleaned_data["invoices"], "products": cleaned_data["products"],
+                                            "test_analysis": cleaned_data["test"]})
 
-        # Clean data
-        data_cleaner = DataCleaner(raw_data)
-        cleaned_data = data_cleaner.clean_all()
+        # The sketches serve the analyses, so they only hold the invoices in the analysis window;
+        # a change of window changes the settings fingerprint, which reruns the ingest
+        windowed = window_frame(cleaned_data["invoices"])
 
-        # Load the database
-        try:
-            db = Database(DB_PATH)
+        # Build the amount sketches while the cleaned invoices are still in memory
+        SketchService(db.db_path).build_and_store(windowed)
+
+        # Daily rollup behind the trend plots, so they never scan the invoices
+        DailyRollupService(db.db_path).build_and_store(cleaned_data["invoices"], cleaned_data["test"])
+
+        # Month partitions let analyses limited to the analysis window skip other months
+        MonthPartitionedStore(db.db_path).write_invoices(cleaned_data["invoices"])
+
+        # Optional userid shards so the analyses can map-reduce across processes; each is month-partitioned like the database
+        if SHARD_COUNT > 0:
+            ShardedStore(SHARD_COUNT, config.path("shard_dir")).write(cleaned_data["invoices"], cleaned_data["test"], cleaned_data["products"])
+    except Exception as e:
+        logger.error(f"Error persisting the cleaned data: {str(e)}")
+
+    # Join index from userid to the experiment assignment, built from the loaded test_analysis table
+    try:
+        AssignmentIndex.build_from_db(db_path).save(join_index_path)
+    except Exception as e:
+        logger.warning(f"Assignment join index not built, analyses join in SQL: {str(e)}")
+        if os.path.exists(join_index_path):
+            os.remove(join_index_path)  # A stale index must not outlive the data it was built from
+
+    # Stratified sample behind the approximate query mode, redrawn from the loaded tables
+    SampleService(db_path).build_and_store()
+
+    # Outliers per group and product, streamed once per ingest so reports and plots only read the table
+    OutlierService(db_path, join_index=AssignmentIndex.load(join_index_path)).build_and_store()
+
+
+class PipelineRun:
+    """One invocation of the staged pipeline.
+
+    Every stage records the content hashes of its inputs (data files, stored tables, sources,
+    settings and the --only selection) and of the files it wrote; a stage whose hashes all
+    match is skipped. The stages of a run share one analysis session and set of generators, which
+    read and write the files at the paths of the run's config.
+    """
+
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self.force = config.force
+        self.only = config.only
+        self.manifest = StageManifest(config.path("manifest_path"))
+        self.plan = []
+        self.forced = set()
+        # Stage -> its status (ran, fresh, skipped or failed) and run time
+        self.status = {}
+        self.cleaned_data = None
+        self.persist_thread = None
+        self._ingest_inputs = None
+        self._cleared = set()
+        self._checked_only = False
+        self._session = None
+        self._report_generator = None
+        self._plot_generator = None
+        self._pdf_generator = None
+
+    def session(self):
+        """Analysis session, created after ingest so it sees the freshly loaded data"""
+        if self._session is None:
+            frame_engine = FrameQueryEngine.from_cleaned(self.cleaned_data) if IN_MEMORY_ANALYTICS and self.cleaned_data is not None else None
+            self._session = AnalysisSession(frame_engine=frame_engine, db_path=self.config.path("db_path"),
+                                            join_index_path=self.config.path("join_index_path"),
+                                            z_score_path=self.config.path("z_score_path"),
+                                            shard_dir=self.config.path("shard_dir"))
+        return self._session
+
+    def report_generator(self):
+        if self._report_generator is None:
+            self._report_generator = ReportGenerator(self.session(), self.config.path("report_cache_path"))
+        return self._report_generator
 
-            # Load cleaned data into the database
-            with sqlite3.connect(db.db_path) as conn:
-                cleaned_data["invoices"].to_sql("invoices", conn, if_exists="replace", index=False)
-                cleaned_data["products"].to_sql("products", conn, if_exists="replace", index=False)
-                cleaned_data["test"].to_sql("test_analysis", conn, if_exists="replace", index=False)
+    def plot_generator(self):
+        if self._plot_generator is None:
+            self._plot_generator = PlotGenerator(self.session(), self.config.path("output_dir"))
+            if self.config.plot_workers is not None:
+                self._plot_generator.max_workers = self.config.plot_workers
+            if "pdf" in self.plan:
+                self.pdf_generator()  # Before the plots: receives their thumbnails in memory
+        return self._plot_generator
 
-            # Log CSV loading
-            logger.debug(f"Loading CSV file: {INVOICES_CSV_PATH}")
-            db.load_csv_to_db(INVOICES_CSV_PATH, 'invoices')
+    def pdf_generator(self):
+        if self._pdf_generator is None:
+            from controllers.pdf_generator import PDFGenerator  # Imported on use: loads the PDF libraries
+            self._pdf_generator = PDFGenerator(self.session(), self.plot_generator(), self.config.path("pdf_path"),
+                                               self.config.path("pdf_markdown_path"), self.config.path("output_dir"))
+        return self._pdf_generator
 
-            logger.debug(f"Loading CSV file: {PRODUCTS_CSV_PATH}")
-            db.load_csv_to_db(PRODUCTS_CSV_PATH, 'products')
+    def selection(self, stage):
+        """Plots (plot) or report sections (other stages) --only restricts a stage to; None for all"""
+        if self.only is None or stage == "ingest":
+            return None
+        sections, plots = self.report_generator().sections, self.plot_generator().plots
+        if not self._checked_only:
+            unknown = [name for name in self.only if name not in sections and name not in plots]
+            if unknown:
+                self.logger.warning(f"Ignoring unknown report sections and plots: {unknown}")
+            self._checked_only = True
+        return [name for name in (plots if stage == "plot" else sections) if name in self.only]
 
-            logger.debug(f"Loading CSV file: {TEST_CSV_PATH}")
-            db.load_csv_to_db(TEST_CSV_PATH, 'test_analysis')
-        except Exception as e:
-            logger.error(f"Error loading CSV files: {str(e)}")
+    def stage_inputs(self, stage):
+        """Content hashes a stage was built from"""
+        inputs = {"sources": source_digest(STAGE_SOURCES[stage], ROOT), "settings": settings_fingerprint(),
+                  "only": self.selection(stage)}
+        if stage == "ingest":
+            inputs["data"] = self.manifest.digests([self.config.path(name) for name in ("invoices_file", "products_file", "test_file")])
+        else:
+            inputs["tables"] = self.session().table_fingerprints()
+        if stage in ("report", "pdf"):
+            inputs["sections"] = self.manifest.digest(self.config.path("report_cache_path"))
+        if stage == "pdf":
+            inputs["plots"] = self.manifest.digests([path for path, _ in self.pdf_generator().figures])
+        return inputs
 
-        # Generate report using ReportGenerator
+    def stage_outputs(self, stage):
+        """Files a stage wrote"""
+        if stage == "ingest":
+            paths = [self.config.path("db_path"), self.config.path("join_index_path")]
+        elif stage == "analyze":
+            paths = [self.config.path("report_cache_path")] if self.report_generator().cache is not None else []
+        elif stage == "plot":
+            plot_generator = self.plot_generator()
+            paths = [os.path.join(plot_generator.output_dir, f"{name}.png")
+                     for name in self.selection(stage) or plot_generator.plots]
+        elif stage == "report":
+            base = os.path.splitext(self.config.path("report_file"))[0]
+            paths = [f"{base}.{fmt}" for fmt in REPORT_FORMATS] + sorted(glob.glob(os.path.join(self.config.path("report_tables_dir"), "*")))
+        else:
+            paths = [self.config.path("pdf_path"), self.config.path("pdf_markdown_path")]
+        return [path for path in paths if os.path.exists(path)]
+
+    def clear_cache(self, cache):
+        """Empty a section or plot cache for a forced stage, once per run"""
+        if cache is not None and id(cache) not in self._cleared:
+            cache.clear()
+            self._cleared.add(id(cache))
+
+    def run(self, stages=None):
+        """Run the given stages (the configured ones by default), after any stale stage they read from"""
+        stages = stages or self.config.stages or DEFAULT_STAGES
+        def visit(stage):
+            for dependency in STAGES[stage]:
+                visit(dependency)
+            if stage not in self.plan:
+                self.plan.append(stage)
+        for stage in sorted(stages, key=list(STAGES).index):
+            visit(stage)
+        self.plan.sort(key=list(STAGES).index)
+        if self.force:
+            self.forced = set(stages)
+        self.logger.info(f"Pipeline stages: {', '.join(self.plan)}" + (f" (forced: {', '.join(sorted(self.forced))})" if self.forced else ""))
         try:
-            logger.info("Generating full report using ReportGenerator...")
-            report_generator = ReportGenerator()
-            report_data = report_generator.generate_summary()  # Run analyses and get report data
-            report_generator.save_report(report_data)  # Save the report to file
-                        
-            plot_generator = PlotGenerator()
-            plot_generator.generate_plots()
+            for stage in self.plan:
+                self.run_stage(stage)
+        finally:
+            self.finish()
+
+    def run_stage(self, stage):
+        start = time.perf_counter()
+        self.status[stage] = {"status": "failed", "seconds": 0.0}
+        if stage in ("analyze", "plot", "report") and self.selection(stage) == []:
+            self.logger.info(f"Stage '{stage}': nothing selected by --only, skipping.")
+            self.status[stage]["status"] = "skipped"
+            return
+        inputs = self.stage_inputs(stage)
+        unknown = stage != "ingest" and not inputs["tables"]
+        if stage not in self.forced and not unknown and self.manifest.is_fresh(stage, inputs):
+            self.logger.info(f"Stage '{stage}' is fresh, skipping.")
+            self.status[stage]["status"] = "fresh"
+            return
+        completed = getattr(self, f"run_{stage}")(stage in self.forced)
+        self.status[stage] = {"status": "ran" if completed else "failed", "seconds": time.perf_counter() - start}
+        self.logger.info(f"Stage '{stage}' finished in {self.status[stage]['seconds']:.2f}s.")
+        if stage == "ingest":
+            # Recorded once the data is persisted, which may still be running in the background
+            self._ingest_inputs = inputs
+        elif completed:
+            self.manifest.record(stage, inputs, self.stage_outputs(stage))
+        else:
+            self.manifest.invalidate(stage)
+
+    def run_ingest(self, forced):
+        """Load, validate and clean the CSV files and persist them to SQLite"""
+        self.logger.info("Loading database...")
+        raw_data = DataLoader(self.config.path("invoices_file"), self.config.path("products_file"),
+                              self.config.path("test_file")).load_data()
+
+        # Validate data; rejected rows are quarantined with their reasons instead of being dropped
+        validated_data, quarantine = DataValidator(raw_data).validate_all()
+        for entry in DataValidator.summary(quarantine):
+            self.logger.warning(f"Quarantined {entry['Rows']} rows of '{entry['Table']}': {entry['Reasons']}")
+
+        # Clean data
+        self.cleaned_data = DataCleaner(validated_data).clean_all()
+
+        # Persist to SQLite; with in-memory analytics the analyses do not wait for it
+        persist_mode = PERSIST_TO_SQLITE if IN_MEMORY_ANALYTICS else 'sync'
+        if persist_mode == 'sync':
+            persist_to_sqlite(self.cleaned_data, self.logger, quarantine, self.config)
+        elif persist_mode == 'async':
+            self.persist_thread = threading.Thread(target=persist_to_sqlite, args=(self.cleaned_data, self.logger, quarantine, self.config),
+                                                   name='sqlite-persist')
+            self.persist_thread.start()
+        else:
+            self.logger.info("SQLite persistence is off; analyses run on the in-memory frames only.")
+        return True
+
+    def run_analyze(self, forced):
+        """Evaluate the analyses behind the stale report sections and cache those sections"""
+        report_generator = self.report_generator()
+        if forced:
+            self.clear_cache(report_generator.cache)
+        sections = self.selection("analyze")
+        scheduler = run_analyses(self.session(), report_generator.section_inputs(sections))
+        built = report_generator.cache_sections(sections)
+        self.logger.info(f"Report sections built: {built}")
+        return not scheduler.errors
+
+    def run_plot(self, forced):
+        """Render the plots whose payload or drawing code changed"""
+        plot_generator = self.plot_generator()
+        if forced:
+            self.clear_cache(plot_generator.plot_cache())
+        plots = self.selection("plot") or list(plot_generator.plots)
+        if len(plots) == 1:
+            plot_generator.max_workers = 0  # A single plot renders sooner here than in a spawned worker
+        scheduler = run_report_pipeline(self.session(), self.report_generator(), plot_generator, sections=[], plots=plots)
+        return not scheduler.errors and not plot_generator.errors
+
+    def run_report(self, forced):
+        """Write the report in every format from the cached sections, building the stale ones"""
+        report_generator = self.report_generator()
+        if forced:
+            self.clear_cache(report_generator.cache)
+        return report_generator.save_report(file_path=self.config.path("report_file"), sections=self.selection("report"),
+                                            tables_dir=self.config.path("report_tables_dir")) is not None
 
+    def run_pdf(self, forced):
+        """Render the report with its figures to PDF"""
+        self.pdf_generator().generate_reports(self.report_generator().build_report(sections=self.selection("pdf")))
+        return True
 
-            # pdff_generator = PDFGenerator()
-            # pdff_generator.generate_reports()
+    def finish(self):
+        """Wait for the background persistence, record ingest and save the manifest"""
+        if self.persist_thread is not None:
+            self.persist_thread.join()
+            self.logger.info("Background SQLite persistence finished.")
+        if self._ingest_inputs is not None:
+            # Only data that reached SQLite, with its fingerprints, can be reused by a later run
+            if load_table_fingerprints(self.config.path("db_path")):
+                self.manifest.record("ingest", self._ingest_inputs, self.stage_outputs("ingest"))
+                if SERVER_NOTIFY_URL:
+                    from controllers.analysis_server import notify_ingest  # Imported on use: only with a server to notify
+                    notify_ingest(SERVER_NOTIFY_URL)
+            else:
+                self.manifest.invalidate("ingest")
+                self.status["ingest"]["status"] = "failed"
+        self.manifest.save()
+        if self._session is not None:
+            self._session.log_summary()
 
-        except Exception as e:
-            logger.error(f"Error generating report: {str(e)}")
 
+def run_pipeline(config, logger):
+    """Run the stages of one experiment as its configuration describes; returns their status"""
+    run = PipelineRun(config, logger)
+    run.run()
+    return run.status
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the A/B test analysis pipeline. Stages whose inputs and outputs "
+                                                 "are unchanged since they last ran are skipped.")
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"stages to run: {', '.join(STAGES)} (default: {' '.join(DEFAULT_STAGES)}); "
+                             "stale stages they read from run first")
+    parser.add_argument("--force", action="store_true",
+                        help="run the named stages even when fresh, rebuilding every report section and plot")
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="restrict the run to these report sections and plots")
+    parser.add_argument("--batch", nargs="+", metavar="DIR",
+                        help="run these experiment directories (each with its own data/) in parallel processes")
+    parser.add_argument("--jobs", type=int, metavar="N", help="experiments run at once with --batch (default: one per CPU)")
+    parser.add_argument("--serve", action="store_true",
+                        help="after the named stages (if any), serve the analyses over local HTTP/JSON from a warm session")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help=f"port of --serve (default: {SERVER_PORT})")
+    args = parser.parse_args(argv)
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return args
+
+
+def main(argv=None):
+    """Run the pipeline stages named on the command line, skipping the fresh ones"""
+    args = parse_args(argv)
+    logger = setup_logger() 
+    logger = logging.getLogger(__name__)
+    config = RunConfig(stages=tuple(args.stages), force=args.force, only=args.only)
+
+    if args.batch:
+        from controllers.batch_runner import BatchRunner  # Imported on use: only batch runs need it
+        BatchRunner(args.jobs).run([replace(config, directory=directory) for directory in args.batch])
+        return
+
+    try:
+        logger.info("Program started.")
+        if not args.serve or args.stages:
+            run_pipeline(config, logger)
+        if args.serve:
+            from controllers.analysis_server import AnalysisServer  # Imported on use: only the server needs it
+            AnalysisServer(port=args.port).serve_forever()
+
+    except KeyboardInterrupt:
+        logger.info("Analysis server stopped.")
     except Exception as e:
         logger.error(f"An error occurred during the main execution: {str(e)}")
 
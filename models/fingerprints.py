@@ -0,0 +1,33 @@
+import hashlib
+import sqlite3
+import pandas as pd
+from config.settings import FINGERPRINT_TABLE
+
+# Content fingerprints of the stored tables, written with the tables at ingest so a later run
+# can tell whether an analysis' inputs changed without reading them
+
+
+def frame_fingerprint(frame):
+    """SHA-256 of a frame's columns, dtypes and row contents (in row order, ignoring the index)"""
+    digest = hashlib.sha256()
+    digest.update(repr((list(map(str, frame.columns)), list(map(str, frame.dtypes)))).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def store_table_fingerprints(connection, tables):
+    """Record the fingerprint of each frame (table name -> frame) written on this connection"""
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE} (table_name TEXT PRIMARY KEY, fingerprint TEXT)")
+    connection.executemany(f"INSERT OR REPLACE INTO {FINGERPRINT_TABLE} VALUES (?, ?)",
+                           [(name, frame_fingerprint(frame)) for name, frame in tables.items()])
+
+
+def load_table_fingerprints(db_path):
+    """Table name -> fingerprint recorded at ingest, or None when no fingerprints were stored"""
+    connection = sqlite3.connect(db_path)
+    try:
+        return dict(connection.execute(f"SELECT table_name, fingerprint FROM {FINGERPRINT_TABLE}").fetchall())
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
@@ -0,0 +1,137 @@
+import logging
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from config.settings import COLUMN_USER_ID, COLUMN_UI_CHANGE, COLUMN_DESC_CHANGE
+
+# Group labels indexed by the compact group codes of AssignmentIndex
+GROUP_LABELS = np.array(['A', 'B', 'C', 'D', 'Unknown'], dtype=object)
+
+
+def assign_group(ui_change, desc_change):
+    """Vectorized A/B/C/D group labels with the same NULL handling as product_sales_by_group"""
+    ui_change = pd.Series(ui_change).fillna('no').to_numpy()
+    desc_change = pd.Series(desc_change).fillna('no').to_numpy()
+    return np.select(
+        [(ui_change == 'no') & (desc_change == 'no'),
+         (ui_change == 'yes') & (desc_change == 'no'),
+         (ui_change == 'no') & (desc_change == 'yes'),
+         (ui_change == 'yes') & (desc_change == 'yes')],
+        ['A', 'B', 'C', 'D'],
+        default='Unknown'
+    )
+
+
+def _integral_keys(user_ids):
+    """userids as int64 when every id is integral (1000 and 1000.0 must join), otherwise None"""
+    numeric = pd.to_numeric(pd.Series(user_ids), errors='coerce')
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        return numeric.to_numpy().astype(np.int64)
+    return None
+
+
+class AssignmentIndex:
+    """In-memory join index from userid to the experiment assignment in test_analysis.
+
+    The userids are factorized into a sorted key array with aligned int8 codes for
+    ui_change and desc_change and a uint8 group code. Attaching the assignment to any
+    number of invoices is then one searchsorted and one gather instead of a SQL join.
+    The index is built once per ingest and saved next to the other run artifacts.
+    """
+
+    def __init__(self, keys, ui_codes, desc_codes, ui_levels, desc_levels):
+        self.keys = keys
+        self.ui_codes = ui_codes
+        self.desc_codes = desc_codes
+        self.ui_levels = ui_levels
+        self.desc_levels = desc_levels
+        # Code -1 (NULL in test_analysis, or no assignment) decodes to None through the last slot
+        self._ui_values = np.append(ui_levels.astype(object), None)
+        self._desc_values = np.append(desc_levels.astype(object), None)
+        self.group_codes = np.searchsorted(GROUP_LABELS[:-1], assign_group(
+            self._ui_values[ui_codes], self._desc_values[desc_codes])).astype(np.uint8)
+        # Position -1 (no assignment) gathers the last slot: NULL changes, and the group of NULL changes
+        # as in the LEFT JOIN scan
+        self._ui_gather = np.append(ui_codes, -1).astype(np.int8)
+        self._desc_gather = np.append(desc_codes, -1).astype(np.int8)
+        self._group_gather = np.append(self.group_codes, 0).astype(np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, user_ids, ui_change, desc_change):
+        """Build the index from the userid, ui_change and desc_change columns of test_analysis"""
+        assignments = pd.DataFrame({'userid': user_ids, 'ui_change': ui_change, 'desc_change': desc_change})
+        assignments = assignments[assignments['userid'].notna()]  # NULL userids never join
+        keys = _integral_keys(assignments['userid'])
+        if keys is None:
+            keys = assignments['userid'].astype(str).to_numpy().astype(str)
+
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        if len(keys) > 1 and (keys[1:] == keys[:-1]).any():
+            # A repeated userid multiplies the joined invoices, which a one-to-one gather cannot express
+            raise ValueError("test_analysis has repeated userids; the assignment is not a one-to-one join.")
+
+        ui_codes, ui_levels = pd.factorize(assignments['ui_change'].to_numpy()[order])
+        desc_codes, desc_levels = pd.factorize(assignments['desc_change'].to_numpy()[order])
+        return cls(keys, ui_codes.astype(np.int8), desc_codes.astype(np.int8),
+                   np.asarray(ui_levels).astype(str), np.asarray(desc_levels).astype(str))
+
+    @classmethod
+    def build_from_db(cls, db_path):
+        """Build the index from the test_analysis table of a database"""
+        connection = sqlite3.connect(db_path)
+        try:
+            assignments = pd.read_sql_query(
+                f"SELECT {COLUMN_USER_ID}, {COLUMN_UI_CHANGE}, {COLUMN_DESC_CHANGE} FROM test_analysis", connection)
+        finally:
+            connection.close()
+        return cls.build(assignments[COLUMN_USER_ID], assignments[COLUMN_UI_CHANGE], assignments[COLUMN_DESC_CHANGE])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        np.savez(path, keys=self.keys, ui_codes=self.ui_codes, desc_codes=self.desc_codes,
+                 ui_levels=self.ui_levels, desc_levels=self.desc_levels)
+        logging.getLogger(__name__).info(f"Saved assignment join index of {len(self)} users to '{path}'.")
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or None when no index was built"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as stored:
+            return cls(stored['keys'], stored['ui_codes'], stored['desc_codes'],
+                       stored['ui_levels'], stored['desc_levels'])
+
+    def lookup(self, user_ids):
+        """Position of each userid in the index, -1 for users without an assignment"""
+        if self.keys.dtype.kind == 'i':
+            numeric = pd.to_numeric(pd.Series(user_ids), errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(numeric) & (numeric % 1 == 0)
+            queries = np.where(valid, numeric, 0).astype(np.int64)
+        else:
+            series = pd.Series(user_ids)
+            valid = series.notna().to_numpy()
+            queries = series.astype(str).to_numpy().astype(str)
+        if len(self.keys) == 0:
+            return np.full(len(queries), -1, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self.keys, queries), len(self.keys) - 1)
+        matched = valid & (self.keys[positions] == queries)
+        return np.where(matched, positions, -1)
+
+    def attach(self, frame, column=COLUMN_USER_ID):
+        """Copy of an invoice frame with ui_change, desc_change, group_name and assigned added"""
+        positions = self.lookup(frame[column])
+        return frame.assign(**{
+            COLUMN_UI_CHANGE: self._ui_values[self._ui_gather[positions]],
+            COLUMN_DESC_CHANGE: self._desc_values[self._desc_gather[positions]],
+            'group_name': GROUP_LABELS[self._group_gather[positions]],
+            'assigned': positions >= 0,
+        })
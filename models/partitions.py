@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import pandas as pd
+from config.settings import (COLUMN_DATE_PAID, PARTITION_CATALOG_TABLE, INVOICE_PARTITION_PREFIX,
+                             APPLY_ANALYSIS_WINDOW, ANALYSIS_START_DATE, ANALYSIS_END_DATE)
+
+# ISO date column added to every partition so range filters compare strings in date order
+PARTITION_DATE_COLUMN = 'date_iso'
+
+
+class MonthPartitionedStore:
+    """Invoices stored as one table per month, with a catalog of the date range in each.
+
+    A query limited to a window [start, end) only reads the partitions overlapping it, and
+    only the partitions cut by a window boundary need a row-level date filter.
+    """
+
+    def __init__(self, db_path):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+
+    def write_invoices(self, invoices):
+        """Split the invoices by month of datepaid and write one table per month"""
+        dates = pd.to_datetime(invoices[COLUMN_DATE_PAID], format='%m/%d/%Y', errors='coerce')
+        partitioned = invoices.assign(**{PARTITION_DATE_COLUMN: dates.dt.strftime('%Y-%m-%d')})
+        months = dates.dt.strftime('%Y_%m').fillna('undated')
+
+        connection = sqlite3.connect(self.db_path)
+        try:
+            self._drop_partitions(connection)
+            catalog = []
+            for month, rows in partitioned.groupby(months, sort=True):
+                table_name = f"{INVOICE_PARTITION_PREFIX}{month}"
+                rows.to_sql(table_name, connection, if_exists='replace', index=False)
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_date" ON "{table_name}" ({PARTITION_DATE_COLUMN})')
+                catalog.append((table_name, month, rows[PARTITION_DATE_COLUMN].min(), rows[PARTITION_DATE_COLUMN].max(), len(rows)))
+            connection.execute(f"CREATE TABLE {PARTITION_CATALOG_TABLE} "
+                               "(table_name TEXT PRIMARY KEY, month TEXT, min_date TEXT, max_date TEXT, row_count INTEGER)")
+            connection.executemany(f"INSERT INTO {PARTITION_CATALOG_TABLE} VALUES (?, ?, ?, ?, ?)", catalog)
+            connection.commit()
+            self.logger.info(f"Wrote {len(invoices)} invoices into {len(catalog)} monthly partitions.")
+            return catalog
+        finally:
+            connection.close()
+
+    def _drop_partitions(self, connection):
+        """Drop the partitions of a previous ingest together with their catalog"""
+        try:
+            tables = [row[0] for row in connection.execute(f"SELECT table_name FROM {PARTITION_CATALOG_TABLE}")]
+        except sqlite3.OperationalError:
+            tables = []
+        for table_name in tables:
+            connection.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        connection.execute(f"DROP TABLE IF EXISTS {PARTITION_CATALOG_TABLE}")
+
+    @staticmethod
+    def partitions_for(connection, start=None, end=None):
+        """Catalog rows (table_name, min_date, max_date) of the partitions overlapping [start, end)"""
+        query = f"SELECT table_name, min_date, max_date FROM {PARTITION_CATALOG_TABLE} WHERE min_date IS NOT NULL"
+        params = []
+        if start is not None:
+            query += " AND max_date >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND min_date < ?"
+            params.append(end)
+        return connection.execute(query + " ORDER BY month", params).fetchall()
+
+    @staticmethod
+    def window_sql(connection, start=None, end=None):
+        """SELECT over the overlapping partitions, filtering rows only in the boundary partitions"""
+        partitions = MonthPartitionedStore.partitions_for(connection, start, end)
+        if not partitions:
+            return None
+        columns = [row[1] for row in connection.execute(f'PRAGMA table_info("{partitions[0][0]}")')
+                   if row[1] != PARTITION_DATE_COLUMN]
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        selects = []
+        for table_name, min_date, max_date in partitions:
+            conditions = []
+            if start is not None and min_date < start:
+                conditions.append(f"{PARTITION_DATE_COLUMN} >= '{start}'")
+            if end is not None and max_date >= end:
+                conditions.append(f"{PARTITION_DATE_COLUMN} < '{end}'")
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            selects.append(f'SELECT {column_list} FROM "{table_name}"{where}')
+        return "\nUNION ALL\n".join(selects)
+
+
+def window_frame(invoices, start=ANALYSIS_START_DATE, end=ANALYSIS_END_DATE, enabled=APPLY_ANALYSIS_WINDOW):
+    """The invoices inside the analysis window: the rows the window view reads from the partitions"""
+    if not enabled:
+        return invoices
+    dates = pd.to_datetime(invoices[COLUMN_DATE_PAID], format='%m/%d/%Y', errors='coerce')
+    return invoices[(dates >= start) & (dates < end)]
+
+
+def apply_analysis_window(connection, start=ANALYSIS_START_DATE, end=ANALYSIS_END_DATE, enabled=APPLY_ANALYSIS_WINDOW):
+    """Limit `invoices` on this connection to the analysis window.
+
+    A TEMP view named invoices shadows the main table for this connection only, so every
+    registered query reads the pruned partitions without being rewritten. Nothing changes
+    when the window is disabled or the invoices have not been partitioned.
+    """
+    if not enabled:
+        return False
+    try:
+        window_sql = MonthPartitionedStore.window_sql(connection, start, end)
+    except sqlite3.OperationalError:
+        logging.getLogger(__name__).warning("Invoice partitions not found; the analysis window is not applied.")
+        return False
+    if window_sql is None:
+        window_sql = "SELECT * FROM main.invoices WHERE 0"
+    connection.execute("DROP VIEW IF EXISTS temp.invoices")
+    connection.execute(f"CREATE TEMP VIEW invoices AS {window_sql}")
+    return True
@@ -0,0 +1,58 @@
+import logging
+import os
+import sqlite3
+import pandas as pd
+from config.settings import COLUMN_USER_ID, SHARD_DIR
+from models.partitions import MonthPartitionedStore
+
+
+def shard_of(user_ids, shard_count):
+    """Stable, vectorized shard number for each userid"""
+    user_ids = pd.Series(user_ids)
+    numeric = pd.to_numeric(user_ids, errors='coerce')
+    # Hash integral ids as int64 so 1000 and 1000.0 (a float column after dropna) agree across tables
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        user_ids = numeric.astype('int64')
+    else:
+        user_ids = user_ids.astype(str)
+    hashes = pd.util.hash_pandas_object(user_ids, index=False).to_numpy()
+    return (hashes % shard_count).astype(int)
+
+
+class ShardedStore:
+    """SQLite shards partitioned by a hash of userid.
+
+    invoices and test_analysis rows of one user always land in the same shard, so the
+    invoice/assignment join never crosses shards; the small products table is copied
+    into every shard. Each shard's invoices are also month-partitioned, so the analysis
+    window is applied in the shard scans as it is on the single database.
+    """
+
+    def __init__(self, shard_count, shard_dir=SHARD_DIR):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.shard_count = shard_count
+        self.shard_dir = shard_dir
+
+    def shard_paths(self):
+        return [os.path.join(self.shard_dir, f"shard_{index}.db") for index in range(self.shard_count)]
+
+    def write(self, invoices, test, products):
+        """Hash-partition invoices and test_analysis by userid into the shard databases"""
+        if not os.path.exists(self.shard_dir):
+            os.makedirs(self.shard_dir)
+
+        invoice_shards = shard_of(invoices[COLUMN_USER_ID], self.shard_count)
+        test_shards = shard_of(test[COLUMN_USER_ID], self.shard_count)
+        for index, path in enumerate(self.shard_paths()):
+            connection = sqlite3.connect(path)
+            try:
+                invoices[invoice_shards == index].to_sql("invoices", connection, if_exists="replace", index=False)
+                test[test_shards == index].to_sql("test_analysis", connection, if_exists="replace", index=False)
+                products.to_sql("products", connection, if_exists="replace", index=False)
+                connection.execute(f"CREATE INDEX IF NOT EXISTS idx_test_analysis_userid ON test_analysis ({COLUMN_USER_ID})")
+                connection.commit()
+            finally:
+                connection.close()
+            MonthPartitionedStore(path).write_invoices(invoices[invoice_shards == index])
+        self.logger.info(f"Wrote {len(invoices)} invoices into {self.shard_count} userid shards in '{self.shard_dir}'.")
+        return self.shard_paths()
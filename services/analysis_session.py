@@ -0,0 +1,244 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Mapping
+from services.eda_service import EDAService
+from services.test_analysis_service import TestAnalysisService
+from services.t_test import TTestService
+from services.cube_service import CubeService
+from services.shard_query_service import ShardedCubeService
+from services.sample_service import SampleService
+from services.outlier_service import OutlierService
+from services.rollup_service import DailyRollupService
+from services.cohort_service import CohortService
+from models.join_index import AssignmentIndex
+from models.fingerprints import frame_fingerprint, load_table_fingerprints
+from config.settings import (USE_CUBE_ENGINE, SHARD_COUNT, JOIN_INDEX_PATH, APPROXIMATE_MODE, DB_PATH, Z_SCORE_MMAP_PATH,
+                             SHARD_DIR)
+
+# Stored tables each analysis depends on, so its inputs can be fingerprinted without running it;
+# analyses not listed depend on every table
+ANALYSIS_TABLES = ("invoices", "products", "test_analysis")
+ANALYSIS_SOURCES = {
+    "product_sales_summary": ("invoices", "products"),
+    "event_sales_summary": ("invoices", "products"),
+    "product_sales_statistics": ("invoices", "products"),
+    "z_scores": ("invoices", "products"),
+    "monthly_sales": ("invoices", "products"),
+    "amount_sketch": ("invoices", "products"),
+    "z_score_sketch": ("invoices", "products"),
+}
+
+
+class LazyResults(Mapping):
+    """Read-only mapping whose values are only computed when they are looked up"""
+
+    def __init__(self, loaders):
+        self.loaders = loaders
+
+    def __getitem__(self, key):
+        return self.loaders[key]()
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
+
+
+class AnalysisSession:
+    """Run-scoped cache of analysis results shared by the report, plot and PDF controllers.
+
+    Each analysis is registered under a name and executed at most once per session; later
+    requests for the same name return the memoized result. Executions, cache hits and
+    run times are counted per name so a run can prove nothing was computed twice.
+    """
+
+    def __init__(self, eda_service=None, test_analysis_service=None, t_test_service=None, frame_engine=None,
+                 approximate=APPROXIMATE_MODE, db_path=DB_PATH, join_index_path=JOIN_INDEX_PATH,
+                 z_score_path=Z_SCORE_MMAP_PATH, shard_dir=SHARD_DIR):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        # Database the services read; a run passes the paths of its own experiment
+        self.db_path = db_path
+        # A FrameQueryEngine answers every query from in-memory frames, so nothing reads SQLite
+        self.frame_engine = frame_engine
+        # The assignment join index built at ingest replaces the SQL join with test_analysis
+        self.join_index = AssignmentIndex.load(join_index_path) if frame_engine is None else None
+        # One cube scan answers the summary queries of the EDA, the test analysis and the t-tests;
+        # with shards the cube is built by map-reduce over the shard databases
+        if frame_engine is not None:
+            self.cube = frame_engine
+        elif SHARD_COUNT > 0:
+            self.cube = ShardedCubeService(shard_dir=shard_dir)
+        else:
+            self.cube = CubeService(db_path, join_index=self.join_index) if USE_CUBE_ENGINE else None
+        # Approximate mode estimates the summaries from the stratified sample drawn at ingest
+        self.sample = SampleService(db_path).load_sample() if approximate else None
+        self.eda_service = eda_service or EDAService(cube=self.cube, join_index=self.join_index, sample=self.sample,
+                                                     db_path=db_path, z_score_path=z_score_path)
+        self.test_analysis_service = test_analysis_service or TestAnalysisService(cube=self.cube, sample=self.sample,
+                                                                                  db_path=db_path)
+        self.t_test_service = t_test_service or TTestService(cube=self.cube, join_index=self.join_index, db_path=db_path)
+        self.outlier_service = OutlierService(db_path, join_index=self.join_index, engine=frame_engine)
+        self.rollup_service = DailyRollupService(db_path)
+        self.cohort_service = CohortService(db_path, join_index=self.join_index, engine=frame_engine)
+
+        self.results = {}
+        self._table_fingerprints = None
+        self.executions = Counter()
+        self.hits = Counter()
+        self.durations = {}
+        self._lock = threading.Lock()
+        self._name_locks = {}
+
+        self.analyses = {
+            "product_sales_summary": self.eda_service.product_sales_summary,
+            "event_sales_summary": self.eda_service.event_sales_summary,
+            "group_sales_summary": self.eda_service.product_sales_by_group,
+            "product_sales_statistics": self._product_sales_statistics,
+            "z_scores": self._z_scores,
+            "percentage_changes": lambda: self.eda_service.calculate_percentage_changes(self.get("group_sales_summary")),
+            "eda_report": self._eda_report,
+            "ui_desc_changes": self.test_analysis_service.analyze_ui_and_desc_changes,
+            "product_ui_desc_changes": self.test_analysis_service.analyze_product_ui_desc_changes,
+            "test_analysis_report": self._test_analysis_report,
+            "t_tests": self.t_test_service.perform_t_tests_for_all_groups,
+            "final_data": lambda: self.eda_service.execute_query('final_data_query'),
+            "monthly_sales": lambda: self.eda_service.execute_query('monthly_sales_query'),
+            "daily_rollup": self._daily_rollup,
+            "cohort_analysis": self.cohort_service.analyze,
+            "outlier_summary": self.outlier_service.summary,
+        }
+
+    def register(self, name, func):
+        """Register an additional analysis under a name"""
+        self.analyses[name] = func
+
+    def get(self, name):
+        """Return the result of an analysis, executing it only on first use"""
+        if name not in self.analyses:
+            error_message = f"Analysis '{name}' is not registered in the session."
+            self.logger.error(error_message)
+            raise KeyError(error_message)
+
+        with self._lock:
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+
+        # One lock per analysis: concurrent callers wait for the first execution instead of repeating it
+        with name_lock:
+            if name in self.results:
+                self.hits[name] += 1
+                return self.results[name]
+
+            start = time.perf_counter()
+            result = self.analyses[name]()
+            self.durations[name] = time.perf_counter() - start
+            self.executions[name] += 1
+            self.results[name] = result
+            self.logger.info(f"Analysis '{name}' computed in {self.durations[name]:.3f}s.")
+            return result
+
+    def invalidate(self, name=None):
+        """Drop one memoized result, or all of them when no name is given"""
+        with self._lock:
+            if name is None:
+                self.results.clear()
+                self._table_fingerprints = None
+            else:
+                self.results.pop(name, None)
+
+    def table_fingerprints(self):
+        """Fingerprint of every stored table: hashed from the in-memory frames, or recorded at ingest"""
+        with self._lock:
+            if self._table_fingerprints is None:
+                if self.frame_engine is not None:
+                    self._table_fingerprints = {name: frame_fingerprint(frame) for name, frame in self.frame_engine.tables.items()}
+                else:
+                    self._table_fingerprints = load_table_fingerprints(self.db_path) or {}
+            return self._table_fingerprints
+
+    def input_fingerprint(self, names):
+        """Fingerprint of the tables behind the given analyses, or None when one of them is unknown"""
+        tables = sorted({table for name in names for table in ANALYSIS_SOURCES.get(name, ANALYSIS_TABLES)})
+        fingerprints = self.table_fingerprints()
+        if any(table not in fingerprints for table in tables):
+            return None
+        return hashlib.sha256("|".join(f"{table}={fingerprints[table]}" for table in tables).encode()).hexdigest()
+
+    def stats(self):
+        """Executions, cache hits and run time per analysis"""
+        return {
+            name: {
+                "executions": self.executions[name],
+                "hits": self.hits[name],
+                "seconds": self.durations.get(name, 0.0)
+            }
+            for name in self.analyses if self.executions[name] or self.hits[name]
+        }
+
+    def log_summary(self):
+        """Log the per-analysis instrumentation and warn about anything executed more than once"""
+        for name, entry in self.stats().items():
+            self.logger.info(f"Analysis '{name}': executions={entry['executions']}, "
+                             f"cache hits={entry['hits']}, time={entry['seconds']:.3f}s")
+        repeated = [name for name, count in self.executions.items() if count > 1]
+        if repeated:
+            self.logger.warning(f"Analyses executed more than once in this run: {repeated}")
+
+    def lazy_summary(self):
+        """The generate_summary structure, with every entry evaluated on first access"""
+        z_score = lambda key: lambda: (self.get("z_scores") or {}).get(key)
+        return {
+            "eda_results": LazyResults({
+                "product_sales_summary": lambda: self.get("product_sales_summary"),
+                "event_sales_summary": lambda: self.get("event_sales_summary"),
+                "product_sales_statistics": lambda: self.get("product_sales_statistics"),
+                "z_scores": lambda: self.get("z_scores"),
+                "z_score_mean": z_score("mean"),
+                "z_score_std_dev": z_score("std_dev"),
+                "z_score_max": z_score("max"),
+                "z_score_min": z_score("min"),
+                "percentage_changes": lambda: self.get("percentage_changes"),
+                "group_sales_summary": lambda: self.get("group_sales_summary"),
+            }),
+            "test_analysis_results": LazyResults({
+                "ui_desc_changes": lambda: self.get("ui_desc_changes"),
+                "product_ui_desc_changes": lambda: self.get("product_ui_desc_changes"),
+            }),
+        }
+
+    def _product_sales_statistics(self):
+        product_sales = self.get("product_sales_summary")
+        return self.eda_service.calculate_statistics(product_sales) if product_sales else {}
+
+    def _z_scores(self):
+        return self.eda_service.calculate_z_score() if self.get("product_sales_summary") else {}
+
+    def _daily_rollup(self):
+        """Daily rollup stored at ingest, or aggregated from the in-memory frames"""
+        if self.frame_engine is not None:
+            return DailyRollupService.build_rollup(self.frame_engine.invoices, self.frame_engine.test_analysis)
+        return self.rollup_service.load_rollup()
+
+    def _eda_report(self):
+        try:
+            report = self.eda_service.assemble_report(
+                self.get("product_sales_summary"),
+                self.get("event_sales_summary"),
+                self.get("group_sales_summary"),
+                self.get("product_sales_statistics"),
+                self.get("z_scores")
+            )
+            self.logger.info("Full report generated successfully.")
+            return report
+        except Exception as e:
+            self.logger.error(f"Unexpected error while generating report: {e}")
+            return {}
+
+    def _test_analysis_report(self):
+        return {
+            "ui_desc_changes": self.get("ui_desc_changes"),
+            "product_ui_desc_changes": self.get("product_ui_desc_changes")
+        }
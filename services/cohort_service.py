@@ -0,0 +1,116 @@
+import logging
+import sqlite3
+import numpy as np
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from config.settings import DB_PATH, COLUMN_USER_ID, COLUMN_DATE_PAID, COHORT_PERIOD
+from models.join_index import assign_group
+from models.partitions import apply_analysis_window
+
+
+class CohortService:
+    """First-purchase cohorts and repeat-purchase curves per experiment group.
+
+    The invoices are sorted once by userid and purchase period. User boundaries in the
+    sorted arrays give every invoice its cohort (period of the user's first purchase),
+    its age in periods and its purchase number (a cumcount) without a per-user loop;
+    active users per group, cohort and age, and second purchases per group and age,
+    are then counted with one bincount each.
+    """
+
+    def __init__(self, db_path=DB_PATH, join_index=None, engine=None, period=COHORT_PERIOD):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        self.queries = load_sql_queries()
+        # Optional AssignmentIndex attaching the experiment group without a SQL join
+        self.join_index = join_index
+        # Optional FrameQueryEngine answering the scan from in-memory frames
+        self.engine = engine
+        self.period = period
+
+    def load_invoices(self):
+        """userid, datepaid and experiment group ('Unassigned' without an assignment) of every invoice"""
+        query_name = 'cohort_invoices_query' if self.join_index is not None else 'cohort_scan_query'
+        if self.engine is not None:
+            frame = self.engine.frame(query_name)
+        else:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                apply_analysis_window(connection)
+                frame = pd.read_sql_query(self.queries[query_name], connection)
+            finally:
+                connection.close()
+        if self.join_index is not None:
+            frame = self.join_index.attach(frame)
+        groups = assign_group(frame['ui_change'], frame['desc_change'])
+        return pd.DataFrame({
+            COLUMN_USER_ID: frame[COLUMN_USER_ID].to_numpy(),
+            COLUMN_DATE_PAID: frame[COLUMN_DATE_PAID].to_numpy(),
+            'group_name': np.where(frame['assigned'].astype(bool), groups, 'Unassigned'),
+        })
+
+    def build(self, frame):
+        """Cohort x age matrices of active users and repeat-purchase curves from an invoice frame"""
+        dates = pd.to_datetime(frame[COLUMN_DATE_PAID], format='%m/%d/%Y', errors='coerce')
+        valid = (dates.notna() & frame[COLUMN_USER_ID].notna()).to_numpy()
+        if not valid.any():
+            return None
+        periods = pd.PeriodIndex(dates[valid], freq=self.period).asi8
+        users = pd.factorize(frame[COLUMN_USER_ID].to_numpy()[valid])[0]
+        group_codes, group_labels = pd.factorize(frame['group_name'].to_numpy()[valid], sort=True)
+
+        # One sort by user and period; every later step is a segment operation on the sorted arrays
+        order = np.lexsort((periods, users))
+        users, periods, group_codes = users[order], periods[order], group_codes[order]
+        positions = np.arange(len(users))
+        first = np.r_[True, np.diff(users) != 0]
+        first_position = np.maximum.accumulate(np.where(first, positions, 0))
+        cohort = periods[first_position]
+        age = periods - cohort
+        purchase_number = positions - first_position
+        # First invoice of a user in a period, so active users are counted once per period
+        active = first | np.r_[True, np.diff(periods) != 0]
+
+        first_period, last_period = cohort.min(), periods.max()
+        n_cohorts, n_ages, n_groups = cohort.max() - first_period + 1, age.max() + 1, len(group_labels)
+        cells = (group_codes * n_cohorts + (cohort - first_period)) * n_ages + age
+        active_users = np.bincount(cells[active], minlength=n_groups * n_cohorts * n_ages).reshape(n_groups * n_cohorts, n_ages)
+        second = purchase_number == 1
+        repeats = np.bincount(group_codes[second] * n_ages + age[second], minlength=n_groups * n_ages).reshape(n_groups, n_ages)
+        group_users = np.bincount(group_codes[first], minlength=n_groups)
+
+        cohort_labels = pd.PeriodIndex.from_ordinals(np.arange(first_period, first_period + n_cohorts), freq=self.period).astype(str)
+        index = pd.MultiIndex.from_product([group_labels, cohort_labels], names=['group_name', 'cohort'])
+        group_active = pd.DataFrame(active_users, index=index, columns=pd.RangeIndex(n_ages, name='age'))
+        group_active = group_active[group_active[0] > 0]  # Periods in which no user made a first purchase
+
+        # Ages past the last observed period are unknown, not zero
+        cohort_start = np.arange(first_period, first_period + n_cohorts)
+        observed = pd.DataFrame(cohort_start[:, None] + np.arange(n_ages)[None, :] <= last_period,
+                                index=cohort_labels, columns=group_active.columns)
+        overall = group_active.groupby(level='cohort').sum()
+        overall = overall.where(observed.loc[overall.index])
+        group_users = pd.Series(group_users, index=group_labels, name='users')
+
+        return {
+            'group_active_users': group_active.where(observed.reindex(group_active.index.get_level_values('cohort')).to_numpy()),
+            'active_users': overall,
+            'cohort_sizes': overall[0].astype(int),
+            'retention': overall.div(overall[0], axis=0),
+            'group_users': group_users,
+            # Share of a group's users whose second purchase came within each age of their first
+            'repeat_curve': pd.DataFrame(np.cumsum(repeats, axis=1) / group_users.to_numpy()[:, None],
+                                         index=group_labels, columns=group_active.columns),
+        }
+
+    def analyze(self):
+        """Cohort matrices and repeat-purchase curves of the stored invoices"""
+        try:
+            result = self.build(self.load_invoices())
+            if result is not None:
+                self.logger.info(f"Built {len(result['active_users'])} cohorts over "
+                                 f"{int(result['group_users'].sum())} users.")
+            return result
+        except Exception as e:
+            self.logger.error(f"Error building cohorts: {e}")
+            return None
@@ -0,0 +1,148 @@
+import logging
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from config.settings import DB_PATH, COLUMN_AMOUNT, COLUMN_DATE_PAID
+from models.partitions import apply_analysis_window
+from models.join_index import assign_group
+
+# Dimensions the cube is aggregated over
+CUBE_DIMENSIONS = ['product_name', 'event_id', 'ui_change', 'desc_change', 'group_name', 'month']
+# Join flags kept next to the dimensions so inner-join slices can be answered from the left-join scan
+CUBE_FLAGS = ['assigned', 'known_event']
+# Registered summary queries answerable from grouped aggregates: (dimensions, measure, join filter)
+QUERY_SLICES = {
+    'product_sales_summary': (['product_name'], 'sum', None),
+    'event_sales_summary': (['event_id'], 'sum', None),
+    'avg_purchase_by_ui_and_desc': (['ui_change', 'desc_change'], 'mean', ['assigned']),
+    'avg_purchase_by_product_ui_desc': (['product_name', 'ui_change', 'desc_change'], 'mean', ['assigned', 'known_event']),
+    'ui_description_sales_summary': (['ui_change', 'desc_change'], 'sum', ['assigned']),
+    'product_sales_by_group': (['group_name'], 'sum', ['assigned']),
+}
+
+
+class CubeService:
+    """Grouped-aggregation cube over invoices joined with their experiment assignment.
+
+    One scan of the joined invoices is aggregated to count, sum, sum of squares, min and
+    max for every combination of CUBE_DIMENSIONS. Any rollup slice (by product, by event,
+    by UI/description change, by group, by month, ...) is then answered by re-aggregating
+    that small base cube instead of scanning and joining the invoices again.
+    """
+
+    def __init__(self, db_path=DB_PATH, join_index=None):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        # Optional AssignmentIndex replacing the SQL join with test_analysis by a gather
+        self.join_index = join_index
+        self.queries = load_sql_queries()
+        self.base = None
+        self._lock = threading.Lock()
+        self.query_slices = dict(QUERY_SLICES)
+
+    def build(self):
+        """Scan the joined invoices once and aggregate them into the base cube"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection)
+            if self.join_index is not None:
+                invoices = pd.read_sql_query(self.queries['cube_invoices_query'], connection)
+                frame = self.join_index.attach(invoices)
+            else:
+                frame = pd.read_sql_query(self.queries['cube_base_query'], connection)
+        finally:
+            connection.close()
+        return self.build_from_frame(frame)
+
+    def build_from_frame(self, frame):
+        """Aggregate an already joined invoice frame into the base cube"""
+        amount = pd.to_numeric(frame[COLUMN_AMOUNT], errors='coerce')
+        dates = pd.to_datetime(frame[COLUMN_DATE_PAID], format='%m/%d/%Y', errors='coerce')
+        rows = pd.DataFrame({
+            'product_name': frame['product_name'],
+            'event_id': frame['event_id'],
+            'ui_change': frame['ui_change'],
+            'desc_change': frame['desc_change'],
+            'group_name': frame['group_name'] if 'group_name' in frame else assign_group(frame['ui_change'], frame['desc_change']),
+            'month': dates.dt.strftime('%Y-%m'),
+            'assigned': frame['assigned'].astype(bool),
+            'known_event': frame['known_event'].astype(bool),
+            'amount': amount,
+            'amount_sq': amount * amount,
+        })
+        grouped = rows.groupby(CUBE_DIMENSIONS + CUBE_FLAGS, dropna=False, sort=False)
+        self.base = pd.DataFrame({
+            'count': grouped['amount'].count(),
+            'sum': grouped['amount'].sum(),
+            'sum_sq': grouped['amount_sq'].sum(),
+            'min': grouped['amount'].min(),
+            'max': grouped['amount'].max(),
+        }).reset_index()
+        self.logger.info(f"Cube built from {len(rows)} invoice rows into {len(self.base)} cells.")
+        return self.base
+
+    @staticmethod
+    def merge_bases(bases):
+        """Merge base cubes built on disjoint parts of the invoices (chunks or shards)"""
+        grouped = pd.concat(bases, ignore_index=True).groupby(CUBE_DIMENSIONS + CUBE_FLAGS, dropna=False, sort=False)
+        return grouped.agg({'count': 'sum', 'sum': 'sum', 'sum_sq': 'sum', 'min': 'min', 'max': 'max'}).reset_index()
+
+    def group_moments(self, conditions):
+        """Count, mean and sample std of the joined amounts matching (ui_change, desc_change) conditions.
+
+        Each condition is a function of the ui_change and desc_change columns returning a
+        boolean mask, which mirrors the WHERE clauses of the group_*_sales queries.
+        """
+        cells = self.rollup(['ui_change', 'desc_change'], ['assigned'])
+        moments = {}
+        for name, condition in conditions.items():
+            selected = cells[condition(cells['ui_change'], cells['desc_change'])]
+            count = float(selected['count'].sum())
+            total = float(selected['sum'].sum())
+            total_sq = float(selected['sum_sq'].sum())
+            mean = total / count if count else np.nan
+            variance = (total_sq - total * mean) / (count - 1) if count > 1 else np.nan
+            moments[name] = (count, mean, np.sqrt(max(variance, 0.0)) if count > 1 else np.nan)
+        return moments
+
+    def ensure_built(self):
+        """Build the base cube on first use; concurrent callers share one scan"""
+        with self._lock:
+            if self.base is None:
+                self.build()
+        return self.base
+
+    def rollup(self, dimensions, filters=None):
+        """Aggregate the base cube to the given dimensions.
+
+        filters lists join flags ('assigned', 'known_event') that must hold, which gives
+        the same rows as the inner joins in the SQL queries.
+        """
+        base = self.ensure_built()
+        for flag in filters or []:
+            base = base[base[flag]]
+        grouped = base.groupby(dimensions, dropna=False, sort=True)
+        result = pd.DataFrame({
+            'count': grouped['count'].sum(),
+            'sum': grouped['sum'].sum(),
+            'sum_sq': grouped['sum_sq'].sum(),
+            'min': grouped['min'].min(),
+            'max': grouped['max'].max(),
+        }).reset_index()
+        count = result['count'].astype(float)
+        result['mean'] = result['sum'] / count.where(count > 0)
+        result['variance'] = (result['sum_sq'] - result['sum'] * result['mean']) / (count - 1).where(count > 1)
+        return result
+
+    def can_answer(self, query_name):
+        return query_name in self.query_slices
+
+    def answer(self, query_name):
+        """Answer a registered summary query from the cube, shaped like the SQL result rows"""
+        dimensions, measure, filters = self.query_slices[query_name]
+        result = self.rollup(dimensions, filters)
+        columns = result[dimensions + [measure]].astype(object)
+        columns = columns.where(columns.notna(), None)  # NULL keys come back as None, as from SQLite
+        return [tuple(row) for row in columns.itertuples(index=False, name=None)]
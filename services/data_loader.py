@@ -3,11 +3,11 @@ from config.settings import INVOICES_FILE, PRODUCTS_FILE, TEST_FILE
 import logging
 
 class DataLoader:
-    def __init__(self):
+    def __init__(self, invoices_file=INVOICES_FILE, products_file=PRODUCTS_FILE, test_file=TEST_FILE):
         self.logger = logging.getLogger(__name__)  # Initialize logger
-        self.invoices_file = INVOICES_FILE
-        self.products_file = PRODUCTS_FILE
-        self.test_file = TEST_FILE
+        self.invoices_file = invoices_file
+        self.products_file = products_file
+        self.test_file = test_file
 
     def load_data(self):
         """Load data from CSV files and check for file contents"""
@@ -0,0 +1,175 @@
+import logging
+import numpy as np
+import pandas as pd
+from config.settings import (COLUMN_USER_ID, COLUMN_DATE_PAID, COLUMN_EVENT_ID, COLUMN_AMOUNT, COLUMN_PRODUCT_NAME,
+                             COLUMN_UI_CHANGE, COLUMN_DESC_CHANGE, VALIDATION_DATE_FORMAT, VALIDATION_MIN_AMOUNT,
+                             VALIDATION_CHANGE_VALUES)
+
+# Reason codes of rejected rows; a row breaking several rules carries the OR of their codes
+REASON_CODES = {
+    'missing_column': 1,
+    'missing_value': 2,
+    'bad_type': 4,
+    'out_of_range': 8,
+    'duplicate_key': 16,
+    'unknown_event': 32,
+    'unknown_user': 64,
+}
+
+# Expected columns and kinds, primary key and foreign keys of every loaded table, in validation order
+# (referenced tables first). Keys are the data dictionary keys of DataLoader.load_data.
+TABLE_SCHEMAS = {
+    'products': {
+        'table': 'products',
+        'columns': {COLUMN_EVENT_ID: 'integer', 'event_name': 'text'},
+        'key': [COLUMN_EVENT_ID],
+        'references': {},
+    },
+    'test': {
+        'table': 'test_analysis',
+        'columns': {COLUMN_USER_ID: 'integer', COLUMN_UI_CHANGE: 'flag', COLUMN_DESC_CHANGE: 'flag'},
+        'key': [COLUMN_USER_ID],
+        'references': {},
+    },
+    'invoices': {
+        'table': 'invoices',
+        'columns': {COLUMN_USER_ID: 'integer', COLUMN_DATE_PAID: 'date', COLUMN_EVENT_ID: 'integer',
+                    COLUMN_AMOUNT: 'number', COLUMN_PRODUCT_NAME: 'text'},
+        'key': None,  # An invoice has no key; repeated payments are legitimate
+        'references': {
+            COLUMN_EVENT_ID: ('products', COLUMN_EVENT_ID, 'unknown_event'),
+            COLUMN_USER_ID: ('test', COLUMN_USER_ID, 'unknown_user'),
+        },
+    },
+}
+
+
+def describe_reasons(codes):
+    """Reason names of an array of reason codes, as 'name|name' strings"""
+    codes = pd.Series(codes)
+    names = {code: '|'.join(name for name, bit in REASON_CODES.items() if code & bit) for code in codes.unique()}
+    return codes.map(names)
+
+
+class DataValidator:
+    """Vectorized validation of the loaded tables before they are cleaned and stored.
+
+    Every rule is evaluated on whole columns (numeric and date coercion, range masks,
+    duplicated() and hash-set isin for keys), so validating a table costs about one more
+    parse of its columns. Rows breaking any rule are removed from the data and returned
+    as quarantine rows with the OR of their reason codes; accepted rows get typed columns.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+
+    @staticmethod
+    def check_column(values, kind):
+        """(reason codes, typed values) for one column of the given kind"""
+        codes = np.where(values.isna().to_numpy(), REASON_CODES['missing_value'], 0)
+        present = values.notna().to_numpy()
+
+        if kind in ('integer', 'number'):
+            typed = values if pd.api.types.is_numeric_dtype(values) else pd.to_numeric(values, errors='coerce')
+            numbers = typed.to_numpy(dtype=float)
+            bad_type = present & np.isnan(numbers)
+            if kind == 'integer':
+                with np.errstate(invalid='ignore'):
+                    bad_type |= present & ~np.isnan(numbers) & (numbers % 1 != 0)
+            codes |= np.where(bad_type, REASON_CODES['bad_type'], 0)
+        elif kind == 'date':
+            dates = pd.to_datetime(values, format=VALIDATION_DATE_FORMAT, errors='coerce')
+            codes |= np.where(present & dates.isna().to_numpy(), REASON_CODES['bad_type'], 0)
+            typed = values  # Queries parse the original date strings
+        elif kind == 'flag':
+            codes |= np.where(present & ~values.isin(VALIDATION_CHANGE_VALUES).to_numpy(), REASON_CODES['out_of_range'], 0)
+            typed = values
+        else:
+            typed = values
+        return codes, typed
+
+    def check_table(self, name, accepted):
+        """Reason code of every row of a table and its columns with validated types.
+
+        accepted holds the already validated referenced tables.
+        """
+        schema = TABLE_SCHEMAS[name]
+        frame = self.data[name]
+        codes = np.zeros(len(frame), dtype=np.int64)
+        typed = {}
+
+        missing = [column for column in schema['columns'] if column not in frame.columns]
+        if missing:
+            self.logger.error(f"Table '{schema['table']}' is missing columns {missing}; rejecting all of its rows.")
+            codes |= REASON_CODES['missing_column']
+
+        for column, kind in schema['columns'].items():
+            if column in missing:
+                continue
+            column_codes, typed[column] = self.check_column(frame[column], kind)
+            codes |= column_codes
+
+        if COLUMN_AMOUNT in typed:
+            with np.errstate(invalid='ignore'):
+                amounts = typed[COLUMN_AMOUNT].to_numpy(dtype=float)
+                out_of_range = ~np.isnan(amounts) & ~((amounts >= VALIDATION_MIN_AMOUNT) & np.isfinite(amounts))
+            codes |= np.where(out_of_range, REASON_CODES['out_of_range'], 0)
+
+        key = schema['key']
+        if key and not missing:
+            keys = pd.DataFrame({column: typed[column] for column in key})
+            codes |= np.where(keys.duplicated(keep=False).to_numpy() & keys.notna().all(axis=1).to_numpy(),
+                              REASON_CODES['duplicate_key'], 0)
+
+        for column, (parent, parent_column, reason) in schema['references'].items():
+            if column in missing:
+                continue
+            known = typed[column].isin(accepted[parent][parent_column]).to_numpy()
+            codes |= np.where(~known & typed[column].notna().to_numpy(), REASON_CODES[reason], 0)
+
+        return codes, typed
+
+    def validate_table(self, name, accepted):
+        """(accepted rows, quarantine rows) of one table"""
+        schema = TABLE_SCHEMAS[name]
+        frame = self.data[name]
+        codes, typed = self.check_table(name, accepted)
+        rejected = codes != 0
+
+        integers = {column: np.int64 for column, kind in schema['columns'].items() if kind == 'integer' and column in typed}
+        valid = frame.assign(**typed)[~rejected].astype(integers)
+
+        quarantine = frame[rejected].astype(object)
+        quarantine = quarantine.where(quarantine.notna(), None)
+        quarantine.insert(0, 'source_table', schema['table'])
+        quarantine.insert(1, 'source_row', np.flatnonzero(rejected))
+        quarantine.insert(2, 'reason_code', codes[rejected])
+        quarantine.insert(3, 'reasons', describe_reasons(codes[rejected]).to_numpy())
+        if rejected.any():
+            self.logger.warning(f"Quarantined {int(rejected.sum())} of {len(frame)} rows of '{schema['table']}'.")
+        return valid, quarantine.reset_index(drop=True)
+
+    def validate_all(self):
+        """Validated tables under their data keys and the quarantine rows of all tables"""
+        try:
+            self.logger.info("Validating loaded data.")
+            accepted, quarantined = {}, []
+            for name in TABLE_SCHEMAS:
+                accepted[name], quarantine = self.validate_table(name, accepted)
+                quarantined.append(quarantine)
+            quarantine = pd.concat(quarantined, ignore_index=True)
+            self.logger.info(f"Data validated; {len(quarantine)} rows quarantined.")
+            return accepted, quarantine
+        except Exception as e:
+            error_message = f"An error occurred while validating data: {e}"
+            self.logger.error(error_message)
+            raise Exception(error_message)
+
+    @staticmethod
+    def summary(quarantine):
+        """Quarantined row counts per table and reason"""
+        if len(quarantine) == 0:
+            return []
+        counts = quarantine.groupby(['source_table', 'reasons']).size()
+        return [{"Table": table, "Reasons": reasons, "Rows": int(count)} for (table, reasons), count in counts.items()]
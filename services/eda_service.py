@@ -1,17 +1,26 @@
 import sqlite3
 from controllers.sql_loader import load_sql_queries
-from config.settings import DB_PATH
+from config.settings import DB_PATH, Z_SCORE_MMAP_PATH, Z_SCORE_CHUNK_SIZE
+from services.z_score_store import write_z_scores
+from services.sample_service import with_interval
+from models.partitions import apply_analysis_window
 import logging
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 class EDAService:
-    def __init__(self):
+    def __init__(self, cube=None, join_index=None, sample=None, db_path=DB_PATH, z_score_path=Z_SCORE_MMAP_PATH):
         self.logger = logging.getLogger(__name__)  # Initialize logger
-        self.db_path = DB_PATH
+        self.db_path = db_path
+        # Memory-mapped file the z-scores are written to
+        self.z_score_path = z_score_path
         self.queries = load_sql_queries()
+        # Optional CubeService answering the summary queries from one shared scan
+        self.cube = cube
+        # Optional AssignmentIndex attaching the experiment assignment without a SQL join
+        self.join_index = join_index
+        # Optional StratifiedSample: approximate summaries with confidence intervals
+        self.sample = sample
         self.logger.info("EDAService initialized with database path and loaded queries.")
 
     def execute_query(self, query_name):
@@ -23,10 +32,19 @@ class EDAService:
                 self.logger.error(error_message)
                 raise ValueError(error_message)
             
+            if self.sample is not None and self.sample.can_answer(query_name):
+                self.logger.info(f"Estimating query from the stratified sample: {query_name}")
+                return self.sample.answer(query_name)
+
+            if self.cube is not None and self.cube.can_answer(query_name):
+                self.logger.info(f"Answering query from cube: {query_name}")
+                return self.cube.answer(query_name)
+
             self.logger.info(f"Executing query: {query_name}")
 
             # Connect to the database
             connection = sqlite3.connect(self.db_path)
+            apply_analysis_window(connection)
             cursor = connection.cursor()
             
             # Execute the query
@@ -52,12 +70,32 @@ class EDAService:
             self.logger.error(error_message)
             return None
 
+    def iter_final_data(self, chunk_size=Z_SCORE_CHUNK_SIZE):
+        """Invoices with event name and experiment assignment, as DataFrame chunks of the final_data_query rows.
+
+        With the assignment join index the invoices are streamed and the assignment attached
+        chunk by chunk instead of joining test_analysis in SQL.
+        """
+        columns = ['event_name', 'amount', 'ui_change', 'desc_change']
+        if self.join_index is None:
+            for rows in self.iter_query('final_data_query', chunk_size):
+                yield pd.DataFrame(rows, columns=columns)
+            return
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection)
+            for invoices in pd.read_sql_query(self.queries['final_invoices_query'], connection, chunksize=chunk_size):
+                joined = self.join_index.attach(invoices)
+                yield joined.loc[joined['assigned'], columns]
+        finally:
+            connection.close()
+
     def product_sales_summary(self):
         """Summarize product sales and return as structured data"""
         try:
             result = self.execute_query('product_sales_summary')
             if result:
-                summary = [{"Product": row[0], "Total Sales": row[1]} for row in result]
+                summary = [with_interval({"Product": row[0], "Total Sales": row[1]}, row, 2) for row in result]
                 self.logger.info("Product sales summary generated successfully.")
                 return summary
             else:
@@ -76,7 +114,7 @@ class EDAService:
             
             if result:
                 # Parse the results and return them in the expected format
-                summary = [{"Group": row[0], "Total Sales": row[1]} for row in result if row[0] != 'Unknown']
+                summary = [with_interval({"Group": row[0], "Total Sales": row[1]}, row, 2) for row in result if row[0] != 'Unknown']
                 self.logger.info("Product sales summary generated successfully for groups A, B, C, D.")
                 return summary
             else:
@@ -94,7 +132,7 @@ class EDAService:
         try:
             result = self.execute_query('event_sales_summary')
             if result:
-                summary = [{"Event ID": row[0], "Total Sales": row[1]} for row in result]
+                summary = [with_interval({"Event ID": row[0], "Total Sales": row[1]}, row, 2) for row in result]
                 self.logger.info("Event sales summary generated successfully.")
                 return summary
             else:
@@ -132,36 +170,70 @@ class EDAService:
             self.logger.error(f"Error calculating statistics: {e}")
             return {}
 
+    def iter_query(self, query_name, chunk_size=Z_SCORE_CHUNK_SIZE):
+        """Execute a query and yield its rows in chunks instead of fetching them all at once"""
+        if query_name not in self.queries:
+            error_message = f"Query '{query_name}' not found in loaded queries."
+            self.logger.error(error_message)
+            raise ValueError(error_message)
+
+        if self.cube is not None and self.cube.can_answer(query_name):
+            rows = self.cube.answer(query_name)
+            for start in range(0, len(rows), chunk_size):
+                yield rows[start:start + chunk_size]
+            return
+
+        self.logger.info(f"Streaming query: {query_name}")
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection)
+            cursor = connection.cursor()
+            cursor.execute(self.queries[query_name])
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+            cursor.close()
+        finally:
+            connection.close()
+
     def calculate_z_score(self):
-        """Calculate Z-Score for the sales data from the invoices table"""
+        """Calculate Z-Score for the sales data from the invoices table.
+
+        Per-invoice scores are written to a memory-mapped float32 file; the result carries
+        a ZScoreHandle to that file plus summary statistics instead of a Python list.
+        """
+        empty_result = {'z_scores': None, 'mean': None, 'std_dev': None, 'min': None, 'max': None}
         try:
-            # 1. Fetch sales data (amount) from the 'invoices' table
-            sales_data = self.execute_query('z_score')
+            # 1. Mean and standard deviation come from an aggregate query, not from the rows
+            moments = self.execute_query('amount_moments')
 
-            if not sales_data:
+            if not moments or not moments[0][0]:
                 self.logger.error("No sales data found in the 'invoices' table.")
-                return {'z_scores': []}
-
-            # 2. Convert the result into a pandas DataFrame for easier manipulation
-            sales_df = pd.DataFrame(sales_data, columns=['amount'])
+                return empty_result
 
-            # 3. Calculate Z-Score for the 'amount' column
-            mean = sales_df['amount'].mean()
-            std = sales_df['amount'].std()
+            count, total, total_sq = moments[0][0], moments[0][1], moments[0][2]
+            mean = total / count
+            variance = (total_sq - total * total / count) / (count - 1) if count > 1 else 0.0
+            std = np.sqrt(max(variance, 0.0))
 
-            # 4. Handle case where std is 0 (division by zero)
+            # 2. Handle case where std is 0 (division by zero)
             if std == 0:
                 self.logger.warning("Standard deviation is 0. Cannot calculate Z-Score.")
-                sales_df['z_score'] = None
-            else:
-                sales_df['z_score'] = (sales_df['amount'] - mean) / std
-            z_scores_list = sales_df['z_score'].tolist()
-            # 5. Return the results (z_scores) as a dictionary or list
-            return {'z_scores': z_scores_list, 'mean':np.mean(z_scores_list), 'std_dev': np.std(z_scores_list), 'min': np.min(z_scores_list), 'max': np.max(z_scores_list) }
+                return empty_result
+
+            # 3. Stream the amounts into the memory-mapped z-score file
+            chunks = (np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+                      for rows in self.iter_query('z_score'))
+            handle, stats = write_z_scores(self.z_score_path, count, chunks, mean, std)
+
+            # 4. Return the handle and summary statistics
+            return {'z_scores': handle, **stats}
 
         except Exception as e:
             self.logger.error(f"Error calculating Z-Score: {e}")
-            return {'z_scores': []}
+            return empty_result
 
 
     def calculate_percentage_change(self, old_value, new_value):
@@ -180,6 +252,33 @@ class EDAService:
             self.logger.error(f"Unexpected error while calculating percentage change: {e}")
             return None
         
+    def calculate_percentage_changes(self, group_sales):
+        """Calculate percentage changes of group sales against group A"""
+        percentage_changes = {}
+        if len(group_sales) >= 2:
+            percentage_changes['B_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[0]['Total Sales'])
+        if len(group_sales) >= 3:
+            percentage_changes['C_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[2]['Total Sales'])
+        if len(group_sales) >= 4:
+            percentage_changes['D_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[3]['Total Sales'])
+        return percentage_changes
+
+    def assemble_report(self, product_sales, event_sales, group_sales, product_statistics, z_scores):
+        """Assemble the report dictionary from already computed analysis results"""
+        return {
+            "product_sales_summary": product_sales,
+            "event_sales_summary": event_sales,
+            "product_sales_statistics": product_statistics,
+            "z_scores": z_scores,
+            "z_score_mean": z_scores['mean'],
+            "z_score_std_dev" : z_scores['std_dev'],
+            "z_score_max" :z_scores['max'] ,
+            "z_score_min" : z_scores['min'],
+            "percentage_changes": self.calculate_percentage_changes(group_sales),
+            "group_sales_summary":group_sales
+
+        }
+
     def generate_report(self):
         """Generate full report as structured data"""
         try:
@@ -199,29 +298,8 @@ class EDAService:
             else:
                 z_scores = {}
 
-            # Calculate percentage changes between product sales
-            percentage_changes = {}
-            if len(group_sales) >= 2:
-                percentage_changes['B_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[0]['Total Sales'])
-            if len(group_sales) >= 3:
-                percentage_changes['C_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[2]['Total Sales'])
-            if len(group_sales) >= 4:
-                percentage_changes['D_A'] = self.calculate_percentage_change(group_sales[0]['Total Sales'], group_sales[3]['Total Sales'])
-
             # Generating report
-            report = {
-                "product_sales_summary": product_sales,
-                "event_sales_summary": event_sales,
-                "product_sales_statistics": product_statistics,
-                "z_scores": z_scores,
-                "z_score_mean": z_scores['mean'],
-                "z_score_std_dev" : z_scores['std_dev'],
-                "z_score_max" :z_scores['max'] ,
-                "z_score_min" : z_scores['min'],
-                "percentage_changes": percentage_changes,
-                "group_sales_summary":group_sales
-
-            }
+            report = self.assemble_report(product_sales, event_sales, group_sales, product_statistics, z_scores)
 
             self.logger.info("Full report generated successfully.")
             return report
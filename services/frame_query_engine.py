@@ -0,0 +1,168 @@
+import logging
+import numpy as np
+import pandas as pd
+from config.settings import (COLUMN_USER_ID, COLUMN_EVENT_ID, COLUMN_AMOUNT, COLUMN_DATE_PAID,
+                             APPLY_ANALYSIS_WINDOW, ANALYSIS_START_DATE, ANALYSIS_END_DATE)
+from models.join_index import assign_group
+from models.partitions import window_frame
+from services.cube_service import CubeService
+from services.t_test import GROUP_CONDITIONS
+
+
+class FrameQueryEngine(CubeService):
+    """Every registered query answered with pandas on in-memory DataFrames.
+
+    The tables are the cleaned frames that would otherwise be written to SQLite and read
+    back. Summary queries are rolled up from the cube, which is built from the joined
+    frames instead of a SQL scan; every other query has a vectorized equivalent returning
+    the same rows as the SQL, so services can use the engine wherever they accept a cube.
+    """
+
+    def __init__(self, tables, apply_window=APPLY_ANALYSIS_WINDOW,
+                 start=ANALYSIS_START_DATE, end=ANALYSIS_END_DATE):
+        super().__init__()
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.tables = dict(tables)
+        # Same rows as the analysis-window view over the month partitions
+        self.tables['invoices'] = window_frame(self.tables['invoices'], start, end, enabled=apply_window)
+
+        self.handlers = {
+            'product_sales_summary': lambda: self._sum_by(self.invoices, ['product_name'], 'total_sales'),
+            'event_sales_summary': lambda: self._sum_by(self.invoices, [COLUMN_EVENT_ID], 'total_sales'),
+            'avg_purchase_by_ui_and_desc': lambda: self._mean_by(self._assigned(), ['ui_change', 'desc_change'], 'avg_purchase'),
+            'avg_purchase_by_product_ui_desc': lambda: self._mean_by(
+                self._assigned().merge(self.products[[COLUMN_EVENT_ID]], on=COLUMN_EVENT_ID),
+                ['product_name', 'ui_change', 'desc_change'], 'avg_purchase'),
+            'product_sales_statistics': self._product_sales_statistics,
+            'ui_description_sales_summary': lambda: self._sum_by(self._assigned(), ['ui_change', 'desc_change'], 'total_sales'),
+            'final_data_query': self._final_data,
+            'product_sales_by_group': self._product_sales_by_group,
+            'monthly_sales_query': lambda: self.invoices[[COLUMN_AMOUNT, COLUMN_DATE_PAID]],
+            'z_score': lambda: self.invoices.loc[self.invoices[COLUMN_AMOUNT].notna(), [COLUMN_AMOUNT]],
+            'amount_moments': self._amount_moments,
+            'group_a_sales': lambda: self._group_sales('A'),
+            'group_b_sales': lambda: self._group_sales('B'),
+            'group_c_sales': lambda: self._group_sales('C'),
+            'group_d_sales': lambda: self._group_sales('D'),
+            'cube_base_query': self._cube_base,
+            'cube_invoices_query': lambda: self._with_known_event(self.invoices)[
+                [COLUMN_USER_ID, 'product_name', COLUMN_EVENT_ID, COLUMN_DATE_PAID, COLUMN_AMOUNT, 'known_event']],
+            'final_invoices_query': lambda: self.invoices.merge(
+                self.products[[COLUMN_EVENT_ID, 'event_name']], on=COLUMN_EVENT_ID)[[COLUMN_USER_ID, 'event_name', COLUMN_AMOUNT]],
+            'invoice_amounts_query': lambda: self.invoices[[COLUMN_USER_ID, COLUMN_AMOUNT]],
+            'outlier_scan_query': lambda: self._left_assigned()[
+                [COLUMN_USER_ID, 'product_name', COLUMN_DATE_PAID, COLUMN_AMOUNT, 'ui_change', 'desc_change', 'assigned']],
+            'outlier_invoices_query': lambda: self.invoices[[COLUMN_USER_ID, 'product_name', COLUMN_DATE_PAID, COLUMN_AMOUNT]],
+            'cohort_scan_query': lambda: self._left_assigned()[
+                [COLUMN_USER_ID, COLUMN_DATE_PAID, 'ui_change', 'desc_change', 'assigned']],
+            'cohort_invoices_query': lambda: self.invoices[[COLUMN_USER_ID, COLUMN_DATE_PAID]],
+        }
+
+    @classmethod
+    def from_cleaned(cls, cleaned_data):
+        """Engine over the frames of DataCleaner.clean_all, under their database table names"""
+        return cls({
+            'invoices': cleaned_data['invoices'],
+            'products': cleaned_data['products'],
+            'test_analysis': cleaned_data['test'],
+        })
+
+    @property
+    def invoices(self):
+        return self.tables['invoices']
+
+    @property
+    def products(self):
+        return self.tables['products']
+
+    @property
+    def test_analysis(self):
+        return self.tables['test_analysis']
+
+    def build(self):
+        """Build the base cube from the joined frames instead of a SQL scan"""
+        return self.build_from_frame(self._cube_base())
+
+    def can_answer(self, query_name):
+        return query_name in self.handlers
+
+    def frame(self, query_name):
+        """Result of a registered query as a DataFrame with the SQL column order"""
+        return self.handlers[query_name]()
+
+    def answer(self, query_name):
+        """Rows of a registered query, shaped like the fetchall result of the SQL"""
+        if query_name in self.query_slices:
+            return super().answer(query_name)
+        return self._rows(self.frame(query_name))
+
+    @staticmethod
+    def _rows(frame):
+        """DataFrame rows as tuples of Python values with NULLs as None"""
+        values = frame.astype(object).where(frame.notna(), None)
+        return list(values.itertuples(index=False, name=None))
+
+    @staticmethod
+    def _sorted_groups(result, keys):
+        # SQLite returns GROUP BY rows in key order with NULL keys first
+        return result.sort_values(keys, na_position='first', kind='stable').reset_index(drop=True)
+
+    def _sum_by(self, frame, keys, name):
+        grouped = frame.groupby(keys, dropna=False, sort=False)[COLUMN_AMOUNT]
+        result = grouped.sum(min_count=1).rename(name).reset_index()  # SUM of only NULLs is NULL
+        return self._sorted_groups(result, keys)
+
+    def _mean_by(self, frame, keys, name):
+        result = frame.groupby(keys, dropna=False, sort=False)[COLUMN_AMOUNT].mean().rename(name).reset_index()
+        return self._sorted_groups(result, keys)
+
+    def _assigned(self):
+        """Invoices inner-joined with their experiment assignment"""
+        return self.test_analysis.merge(self.invoices, on=COLUMN_USER_ID)
+
+    def _left_assigned(self):
+        """Invoices left-joined with their experiment assignment, with an assigned flag"""
+        joined = self.invoices.merge(self.test_analysis, on=COLUMN_USER_ID, how='left', indicator=True)
+        return joined.assign(assigned=(joined.pop('_merge') == 'both'))
+
+    def _product_sales_statistics(self):
+        grouped = self.invoices.groupby('product_name', dropna=False, sort=False)[COLUMN_AMOUNT]
+        result = pd.DataFrame({
+            'avg_sales': grouped.mean(),
+            'std_sales': grouped.std(ddof=0),  # The SQL divides by COUNT(amount)
+            'min_sales': grouped.min(),
+            'max_sales': grouped.max(),
+        }).reset_index()
+        return self._sorted_groups(result, ['product_name'])
+
+    def _final_data(self):
+        joined = self.invoices.merge(self.products, on=COLUMN_EVENT_ID).merge(self.test_analysis, on=COLUMN_USER_ID)
+        return joined[['event_name', COLUMN_AMOUNT, 'ui_change', 'desc_change']]
+
+    def _product_sales_by_group(self):
+        joined = self._assigned()
+        joined = joined.assign(group_name=assign_group(joined['ui_change'], joined['desc_change']))
+        return self._sum_by(joined, ['group_name'], 'total_sales')
+
+    def _amount_moments(self):
+        amounts = self.invoices[COLUMN_AMOUNT].dropna().to_numpy(dtype=np.float64)
+        if len(amounts) == 0:
+            return pd.DataFrame([[0, None, None, None, None]])
+        return pd.DataFrame([[len(amounts), amounts.sum(), np.square(amounts).sum(), amounts.min(), amounts.max()]])
+
+    def _group_sales(self, group_name):
+        joined = self._assigned()
+        condition = GROUP_CONDITIONS[group_name]
+        return joined.loc[condition(joined['ui_change'], joined['desc_change']), [COLUMN_AMOUNT]]
+
+    def _with_known_event(self, frame):
+        """frame LEFT JOIN products: a known_event flag, and one row per matching product row"""
+        product_events = self.products[COLUMN_EVENT_ID].dropna()
+        repeats = frame[COLUMN_EVENT_ID].map(product_events.value_counts()).fillna(1).astype(int)
+        flagged = frame.assign(known_event=frame[COLUMN_EVENT_ID].isin(product_events))
+        return flagged.loc[flagged.index.repeat(repeats)].reset_index(drop=True)
+
+    def _cube_base(self):
+        joined = self._with_known_event(self._left_assigned())
+        return joined[['product_name', COLUMN_EVENT_ID, 'ui_change', 'desc_change', COLUMN_DATE_PAID,
+                       COLUMN_AMOUNT, 'assigned', 'known_event']]
@@ -0,0 +1,215 @@
+import logging
+import sqlite3
+import numpy as np
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from config.settings import (DB_PATH, COLUMN_AMOUNT, OUTLIER_TABLE, OUTLIER_CHUNK_SIZE, OUTLIER_Z_THRESHOLD,
+                             OUTLIER_IQR_FACTOR, OUTLIER_MAD_THRESHOLD)
+from models.join_index import assign_group
+from models.partitions import apply_analysis_window
+from services.sketch_service import AmountSketch, QuantileSketch, SketchService
+
+# Segments outliers are detected in: segment prefix and the column holding its value
+SEGMENT_COLUMNS = {'group': 'group_name', 'product': 'product_name'}
+# Scale making the MAD a consistent estimator of the standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+class OutlierService:
+    """Bounded-memory outlier detection per experiment group and per product.
+
+    The invoices are streamed chunk by chunk three times: to summarize every segment
+    (moments and quantile sketch), to sketch the absolute deviations from the segment
+    median (MAD), and to flag invoices by z-score, IQR fences and MAD. Product sketches
+    stored at ingest are reused, so the first pass only builds the group sketches.
+    Flagged invoices are written to OUTLIER_TABLE, one row per invoice and segment.
+
+    With a FrameQueryEngine the invoices are streamed from the in-memory frames and the
+    summary is computed from them, so it never reads a table still being persisted.
+    """
+
+    def __init__(self, db_path=DB_PATH, join_index=None, chunk_size=OUTLIER_CHUNK_SIZE, engine=None):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.queries = load_sql_queries()
+        # Optional AssignmentIndex attaching the experiment group without a SQL join
+        self.join_index = join_index
+        # Optional FrameQueryEngine answering the scan from in-memory frames
+        self.engine = engine
+        self.sketch_service = SketchService(db_path)
+
+    def iter_chunks(self, connection=None):
+        """Stream the invoices with their experiment group (None when unassigned).
+
+        With a connection the chunks are read through it, so the caller can write to the same
+        database while the scan is open; otherwise a connection is opened for the scan.
+        """
+        query_name = 'outlier_invoices_query' if self.join_index is not None else 'outlier_scan_query'
+        owned = connection is None and self.engine is None
+        if owned:
+            connection = sqlite3.connect(self.db_path)
+        try:
+            if self.engine is not None:
+                frame = self.engine.frame(query_name)
+                chunks = (frame.iloc[start:start + self.chunk_size].copy() for start in range(0, len(frame), self.chunk_size))
+            else:
+                apply_analysis_window(connection)
+                chunks = pd.read_sql_query(self.queries[query_name], connection, chunksize=self.chunk_size)
+            for chunk in chunks:
+                if self.join_index is not None:
+                    chunk = self.join_index.attach(chunk)
+                groups = assign_group(chunk['ui_change'], chunk['desc_change'])
+                chunk['group_name'] = np.where(chunk['assigned'].astype(bool), groups, None)
+                chunk[COLUMN_AMOUNT] = pd.to_numeric(chunk[COLUMN_AMOUNT], errors='coerce')
+                yield chunk
+        finally:
+            if owned:
+                connection.close()
+
+    @staticmethod
+    def iter_segments(chunk):
+        """(segment name, amounts) for every group and product present in a chunk"""
+        for prefix, column in SEGMENT_COLUMNS.items():
+            for value, amounts in chunk.groupby(column)[COLUMN_AMOUNT]:
+                yield f"{prefix}:{value}", amounts.to_numpy(dtype=float)
+
+    def segment_sketches(self):
+        """First pass: moments and quantiles of every segment, reusing the product sketches stored at ingest.
+
+        Those are built from the invoices in the analysis window, the same rows this scan reads.
+        """
+        # In-memory frames may not be persisted yet, so their sketches are all built here
+        sketches = self.sketch_service.load_sketches('product:') if self.engine is None else {}
+
+        stored = set(sketches)
+        for chunk in self.iter_chunks():
+            for segment, amounts in self.iter_segments(chunk):
+                if segment in stored:
+                    continue
+                if segment not in sketches:
+                    sketches[segment] = AmountSketch()
+                sketches[segment].update(amounts)
+
+        built = {name: sketch for name, sketch in sketches.items() if name not in stored}
+        if built and self.engine is None:
+            self.sketch_service.save_sketches(built)
+        return sketches
+
+    def segment_thresholds(self, sketches):
+        """Second pass: sketch the absolute deviations from each segment median to get the MAD"""
+        medians = {segment: sketch.median() for segment, sketch in sketches.items() if sketch.count}
+        deviations = {segment: QuantileSketch() for segment in medians}
+        for chunk in self.iter_chunks():
+            for segment, amounts in self.iter_segments(chunk):
+                if segment in deviations:
+                    deviations[segment].update(np.abs(amounts - medians[segment]))
+
+        thresholds = {}
+        for segment, median in medians.items():
+            sketch = sketches[segment]
+            q1, q3 = sketch.quantiles.quantile([0.25, 0.75])
+            thresholds[segment] = {
+                'mean': sketch.mean(),
+                'std': sketch.std(),
+                'median': median,
+                'q1': q1,
+                'q3': q3,
+                'mad': deviations[segment].quantile(0.5),
+            }
+        return pd.DataFrame.from_dict(thresholds, orient='index')
+
+    @staticmethod
+    def flag_chunk(chunk, thresholds):
+        """Flag the invoices of a chunk in every segment they belong to"""
+        flagged = []
+        for prefix, column in SEGMENT_COLUMNS.items():
+            rows = chunk[chunk[column].notna() & chunk[COLUMN_AMOUNT].notna()]
+            segment = prefix + ':' + rows[column].astype(str)
+            limits = thresholds.reindex(segment.to_numpy())
+            amount = rows[COLUMN_AMOUNT].to_numpy(dtype=float)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_score = (amount - limits['mean'].to_numpy()) / limits['std'].to_numpy()
+                robust_z = (amount - limits['median'].to_numpy()) / (MAD_SCALE * limits['mad'].to_numpy())
+            iqr = (limits['q3'] - limits['q1']).to_numpy()
+            is_z = np.abs(z_score) > OUTLIER_Z_THRESHOLD
+            is_iqr = (amount < limits['q1'].to_numpy() - OUTLIER_IQR_FACTOR * iqr) | \
+                     (amount > limits['q3'].to_numpy() + OUTLIER_IQR_FACTOR * iqr)
+            is_mad = np.abs(robust_z) > OUTLIER_MAD_THRESHOLD
+
+            keep = is_z | is_iqr | is_mad
+            flagged.append(pd.DataFrame({
+                'segment': segment.to_numpy()[keep],
+                'userid': rows['userid'].to_numpy()[keep],
+                'product_name': rows['product_name'].to_numpy()[keep],
+                'group_name': rows['group_name'].to_numpy()[keep],
+                'datepaid': rows['datepaid'].to_numpy()[keep],
+                'amount': amount[keep],
+                'z_score': z_score[keep],
+                'robust_z': robust_z[keep],
+                'is_z': is_z[keep].astype(int),
+                'is_iqr': is_iqr[keep].astype(int),
+                'is_mad': is_mad[keep].astype(int),
+            }))
+        return pd.concat(flagged, ignore_index=True)
+
+    def build_and_store(self):
+        """Detect the outliers of every segment and write them to the outlier table"""
+        try:
+            thresholds = self.segment_thresholds(self.segment_sketches())
+            connection = sqlite3.connect(self.db_path)
+            try:
+                connection.execute(f"DROP TABLE IF EXISTS {OUTLIER_TABLE}")
+                flagged_count = 0
+                # Third pass: flag chunk by chunk and append, so no pass holds more than a chunk
+                for chunk in self.iter_chunks(connection):
+                    flagged = self.flag_chunk(chunk, thresholds)
+                    flagged.to_sql(OUTLIER_TABLE, connection, if_exists='append', index=False)
+                    flagged_count += len(flagged)
+                connection.commit()
+            finally:
+                connection.close()
+            self.logger.info(f"Flagged {flagged_count} outliers in {len(thresholds)} segments.")
+            return flagged_count
+        except Exception as e:
+            self.logger.error(f"Error detecting outliers: {e}")
+            return None
+
+    def summary(self):
+        """Outlier counts per segment and method: read from the outlier table, or detected in the in-memory frames.
+
+        Returns None when the outlier table does not exist, so no report section is cached from it.
+        """
+        if self.engine is not None:
+            return self.frame_summary()
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                result = connection.execute(
+                    f"SELECT segment, COUNT(*), SUM(is_z), SUM(is_iqr), SUM(is_mad) FROM {OUTLIER_TABLE} "
+                    "GROUP BY segment ORDER BY segment").fetchall()
+            finally:
+                connection.close()
+            return [{"Segment": row[0], "Outliers": row[1], "Z-Score": row[2], "IQR": row[3], "MAD": row[4]}
+                    for row in result]
+        except sqlite3.Error as e:
+            self.logger.warning(f"Outlier table is not available: {e}")
+            return None
+
+    def frame_summary(self):
+        """Outlier counts per segment and method, detected chunk by chunk in the engine's frames"""
+        try:
+            thresholds = self.segment_thresholds(self.segment_sketches())
+            counts = {}
+            for chunk in self.iter_chunks():
+                flagged = self.flag_chunk(chunk, thresholds)
+                for segment, rows in flagged.groupby('segment'):
+                    total = counts.setdefault(segment, [0, 0, 0, 0])
+                    for index, count in enumerate((len(rows), rows['is_z'].sum(), rows['is_iqr'].sum(), rows['is_mad'].sum())):
+                        total[index] += int(count)
+            return [{"Segment": segment, "Outliers": row[0], "Z-Score": row[1], "IQR": row[2], "MAD": row[3]}
+                    for segment, row in sorted(counts.items())]
+        except Exception as e:
+            self.logger.error(f"Error detecting outliers in memory: {e}")
+            return None
@@ -0,0 +1,98 @@
+import logging
+import sqlite3
+import numpy as np
+import pandas as pd
+from config.settings import (DB_PATH, COLUMN_USER_ID, COLUMN_DATE_PAID, COLUMN_AMOUNT, COLUMN_PRODUCT_NAME,
+                             COLUMN_UI_CHANGE, COLUMN_DESC_CHANGE, ROLLUP_TABLE, APPLY_ANALYSIS_WINDOW,
+                             ANALYSIS_START_DATE, ANALYSIS_END_DATE)
+from models.join_index import assign_group
+
+# Dimensions of the rollup; invoices of users without an assignment are in group 'Unassigned'
+ROLLUP_DIMENSIONS = ['day', 'group_name', 'product_name']
+# Additive measures, so any coarser period or slice is a sum of rollup rows
+ROLLUP_MEASURES = ['purchases', 'amount_count', 'amount_sum', 'amount_sum_sq']
+
+
+class DailyRollupService:
+    """Daily purchase counts and amount sums per experiment group and product.
+
+    The rollup is aggregated once per ingest from the in-memory invoices and stored in
+    ROLLUP_TABLE, so trend plots and time series read a few thousand rows instead of
+    every invoice. Weekly, monthly or per-group series are re-aggregations of it.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+
+    @staticmethod
+    def build_rollup(invoices, assignments):
+        """Aggregate the invoices by ISO day, experiment group and product"""
+        dates = pd.to_datetime(invoices[COLUMN_DATE_PAID], format='%m/%d/%Y', errors='coerce')
+        assignments = assignments.drop_duplicates(COLUMN_USER_ID)
+        groups = pd.Series(assign_group(assignments[COLUMN_UI_CHANGE], assignments[COLUMN_DESC_CHANGE]),
+                           index=assignments[COLUMN_USER_ID].to_numpy())
+        amount = pd.to_numeric(invoices[COLUMN_AMOUNT], errors='coerce')
+        rows = pd.DataFrame({
+            'day': dates.dt.strftime('%Y-%m-%d'),
+            'group_name': invoices[COLUMN_USER_ID].map(groups).fillna('Unassigned').to_numpy(),
+            'product_name': invoices[COLUMN_PRODUCT_NAME].to_numpy(),
+            'amount': amount.to_numpy(),
+            'amount_sq': (amount * amount).to_numpy(),
+        })
+        grouped = rows.groupby(ROLLUP_DIMENSIONS, sort=True)  # Undated invoices have no day and are left out
+        return pd.DataFrame({
+            'purchases': grouped.size(),
+            'amount_count': grouped['amount'].count(),
+            'amount_sum': grouped['amount'].sum(),
+            'amount_sum_sq': grouped['amount_sq'].sum(),
+        }).reset_index()
+
+    def save_rollup(self, rollup):
+        """Replace the stored rollup"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            rollup.to_sql(ROLLUP_TABLE, connection, if_exists='replace', index=False)
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_day ON {ROLLUP_TABLE} (day)")
+            connection.commit()
+            self.logger.info(f"Saved a daily rollup of {len(rollup)} rows to table '{ROLLUP_TABLE}'.")
+        finally:
+            connection.close()
+
+    def load_rollup(self, start=ANALYSIS_START_DATE, end=ANALYSIS_END_DATE, apply_window=APPLY_ANALYSIS_WINDOW):
+        """Stored rollup, limited to the analysis window when it is applied; None if none was built"""
+        query = f"SELECT * FROM {ROLLUP_TABLE}"
+        params = []
+        if apply_window:
+            query += " WHERE day >= ? AND day < ?"
+            params = [start, end]
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                return pd.read_sql_query(query + " ORDER BY day", connection, params=params)
+            finally:
+                connection.close()
+        except Exception as e:
+            self.logger.warning(f"Daily rollup is not available: {e}")
+            return None
+
+    def build_and_store(self, invoices, assignments):
+        """Build the daily rollup during ingest and persist it"""
+        try:
+            rollup = self.build_rollup(invoices, assignments)
+            self.save_rollup(rollup)
+            return rollup
+        except Exception as e:
+            self.logger.error(f"Error building the daily rollup: {e}")
+            return None
+
+    @staticmethod
+    def trend(rollup, freq='M', by=None):
+        """Purchases, total, mean and standard deviation of the amount per period (and per column in by)"""
+        periods = pd.to_datetime(rollup['day']).dt.to_period(freq).rename('period')
+        keys = [periods] + [rollup[column] for column in by or []]
+        totals = rollup.groupby(keys, sort=True)[ROLLUP_MEASURES].sum()
+        count = totals['amount_count'].where(totals['amount_count'] > 0)
+        mean = totals['amount_sum'] / count
+        variance = (totals['amount_sum_sq'] / count - mean ** 2).clip(lower=0)
+        return totals.assign(amount_mean=mean, amount_std=np.sqrt(variance))
@@ -0,0 +1,187 @@
+import logging
+import sqlite3
+import numpy as np
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from config.settings import (DB_PATH, COLUMN_AMOUNT, SAMPLE_TABLE, SAMPLE_STRATA_TABLE, SAMPLE_FRACTION,
+                             SAMPLE_MIN_PER_STRATUM, SAMPLE_SEED, SAMPLE_CONFIDENCE)
+from models.join_index import assign_group
+from models.partitions import apply_analysis_window
+from services.cube_service import QUERY_SLICES
+
+# Strata of the sample: experiment group (or 'Unassigned') by product
+STRATUM_COLUMNS = ['stratum_group', 'stratum_product']
+# Columns kept for every sampled invoice
+SAMPLE_COLUMNS = ['product_name', 'event_id', 'ui_change', 'desc_change', 'group_name', 'amount',
+                  'assigned', 'known_event']
+
+
+def with_interval(entry, row, width):
+    """Add the confidence interval of an estimated row (bounds after its first width values) to an entry"""
+    if len(row) > width:
+        entry["CI Low"], entry["CI High"] = row[width], row[width + 1]
+    return entry
+
+
+class StratifiedSample:
+    """Stratified invoice sample answering the summary queries with confidence intervals.
+
+    Totals use the stratified expansion estimator and averages the combined ratio
+    estimator, both with the finite-population-corrected stratified variance. Rows of
+    an answer are the rows of the SQL query followed by the lower and upper bound.
+    """
+
+    def __init__(self, rows, strata, confidence=SAMPLE_CONFIDENCE):
+        self.rows = rows
+        self.strata = strata
+        self.confidence = confidence
+        self.query_slices = dict(QUERY_SLICES)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def can_answer(self, query_name):
+        return query_name in self.query_slices
+
+    def answer(self, query_name):
+        """Estimated rows of a summary query as (keys..., estimate, ci_low, ci_high)"""
+        dimensions, measure, filters = self.query_slices[query_name]
+        result = self.estimate(dimensions, measure, filters)
+        columns = result[dimensions + ['estimate', 'ci_low', 'ci_high']].astype(object)
+        columns = columns.where(columns.notna(), None)
+        return [tuple(row) for row in columns.itertuples(index=False, name=None)]
+
+    def estimate(self, dimensions, measure, filters=None):
+        """Estimate the sum or mean of the amount per group of dimensions, with a confidence interval"""
+        rows = self.rows
+        for flag in filters or []:
+            rows = rows[rows[flag]]
+        amount = rows[COLUMN_AMOUNT]
+        rows = rows.assign(y=amount.fillna(0.0), y_sq=amount.fillna(0.0) ** 2, c=amount.notna().astype(float))
+
+        # Per domain and stratum sums; sampled rows outside the domain count as zeros
+        cells = rows.groupby(dimensions + STRATUM_COLUMNS, dropna=False, sort=False)[['y', 'y_sq', 'c']].sum().reset_index()
+        cells = cells.merge(self.strata, on=STRATUM_COLUMNS, how='left')
+        n = cells['sample_size'].astype(float)
+        weight = cells['population'] / n
+        # Stratified variance factor N_h^2 (1 - n_h / N_h) / n_h, zero for fully sampled strata
+        variance_factor = cells['population'] ** 2 * (1 - n / cells['population']) / n
+        cells = cells.assign(weight_y=weight * cells['y'], weight_c=weight * cells['c'])
+
+        grouped = cells.groupby(dimensions, dropna=False, sort=False)
+        totals = grouped[['weight_y', 'weight_c']].sum()
+        ratio = totals['weight_y'] / totals['weight_c'].where(totals['weight_c'] > 0)
+
+        if measure == 'sum':
+            deviation_sq = cells['y_sq'] - cells['y'] ** 2 / n
+            estimate = totals['weight_y']
+            scale = 1.0
+        else:
+            # Linearized residuals e = c (y - R) of the ratio estimator
+            cell_ratio = cells[dimensions].merge(ratio.rename('ratio').reset_index(), on=dimensions, how='left')['ratio'].to_numpy()
+            residual = cells['y'] - cell_ratio * cells['c']
+            residual_sq = cells['y_sq'] - 2 * cell_ratio * cells['y'] + cell_ratio ** 2 * cells['c']
+            deviation_sq = residual_sq - residual ** 2 / n
+            estimate = ratio
+            scale = totals['weight_c'] ** 2
+        cells = cells.assign(variance=variance_factor * deviation_sq.clip(lower=0) / (n - 1).clip(lower=1))
+        variance = cells.groupby(dimensions, dropna=False, sort=False)['variance'].sum() / scale
+
+        from scipy.stats import norm  # Imported on use: SciPy is slow to load
+        half_width = norm.ppf(0.5 + self.confidence / 2) * np.sqrt(variance)
+        result = pd.DataFrame({
+            'estimate': estimate,
+            'ci_low': estimate - half_width,
+            'ci_high': estimate + half_width,
+            'std_error': np.sqrt(variance),
+        }).reset_index()
+        # Same row order as the SQL GROUP BY
+        return result.sort_values(dimensions, na_position='first', kind='stable').reset_index(drop=True)
+
+
+class SampleService:
+    def __init__(self, db_path=DB_PATH):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        self.queries = load_sql_queries()
+
+    @staticmethod
+    def draw_sample(frame, fraction=SAMPLE_FRACTION, min_per_stratum=SAMPLE_MIN_PER_STRATUM, seed=SAMPLE_SEED):
+        """Draw a stratified random sample of joined invoices.
+
+        Each stratum keeps a fraction of its rows, but at least min_per_stratum rows (or
+        all of them) so that small strata still get a variance estimate.
+        """
+        assigned = frame['assigned'].astype(bool)
+        rows = pd.DataFrame({
+            'product_name': frame['product_name'],
+            'event_id': frame['event_id'],
+            'ui_change': frame['ui_change'],
+            'desc_change': frame['desc_change'],
+            'group_name': assign_group(frame['ui_change'], frame['desc_change']),
+            'amount': pd.to_numeric(frame[COLUMN_AMOUNT], errors='coerce'),
+            'assigned': assigned,
+            'known_event': frame['known_event'].astype(bool),
+        })
+        rows['stratum_group'] = np.where(assigned, rows['group_name'], 'Unassigned')
+        rows['stratum_product'] = rows['product_name'].fillna('').astype(str)
+
+        strata = rows.groupby(STRATUM_COLUMNS, sort=True).size().rename('population').reset_index()
+        strata['sample_size'] = np.minimum(
+            strata['population'],
+            np.maximum(min_per_stratum, np.round(fraction * strata['population']))).astype(int)
+
+        # Random rank within the stratum, keeping the first sample_size rows of each
+        rng = np.random.default_rng(seed)
+        shuffled = rows.iloc[rng.permutation(len(rows))]
+        rank = shuffled.groupby(STRATUM_COLUMNS, sort=False).cumcount()
+        sizes = shuffled[STRATUM_COLUMNS].merge(strata, on=STRATUM_COLUMNS, how='left')['sample_size'].to_numpy()
+        sample = shuffled[rank.to_numpy() < sizes].sort_index()
+        return sample[SAMPLE_COLUMNS + STRATUM_COLUMNS].reset_index(drop=True), strata
+
+    def build_sample(self):
+        """Scan the joined invoices and draw the stratified sample"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection)
+            frame = pd.read_sql_query(self.queries['cube_base_query'], connection)
+        finally:
+            connection.close()
+        return self.draw_sample(frame)
+
+    def save_sample(self, sample, strata):
+        """Store the sample rows and the stratum sizes next to the tables they summarize"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            sample.to_sql(SAMPLE_TABLE, connection, if_exists='replace', index=False)
+            strata.to_sql(SAMPLE_STRATA_TABLE, connection, if_exists='replace', index=False)
+            connection.commit()
+            self.logger.info(f"Saved a stratified sample of {len(sample)} invoices in {len(strata)} strata.")
+        finally:
+            connection.close()
+
+    def load_sample(self):
+        """Load the stored sample, or None if no sample was built"""
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                sample = pd.read_sql_query(f"SELECT * FROM {SAMPLE_TABLE}", connection)
+                strata = pd.read_sql_query(f"SELECT * FROM {SAMPLE_STRATA_TABLE}", connection)
+            finally:
+                connection.close()
+        except Exception as e:
+            self.logger.warning(f"Stratified sample is not available: {e}")
+            return None
+        sample['assigned'] = sample['assigned'].astype(bool)
+        sample['known_event'] = sample['known_event'].astype(bool)
+        return StratifiedSample(sample, strata)
+
+    def build_and_store(self):
+        """Draw the sample during ingest and persist it"""
+        try:
+            sample, strata = self.build_sample()
+            self.save_sample(sample, strata)
+            return sample, strata
+        except Exception as e:
+            self.logger.error(f"Error building the stratified sample: {e}")
+            return None, None
@@ -0,0 +1,36 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from config.settings import SHARD_COUNT, SHARD_DIR, SHARD_WORKERS
+from models.shards import ShardedStore
+from services.cube_service import CubeService
+
+
+def build_shard_cube(db_path):
+    """Map step: aggregate one shard into a partial base cube, limited to the analysis window (runs in a worker process)"""
+    return CubeService(db_path).build()
+
+
+class ShardedCubeService(CubeService):
+    """Cube whose base is built by map-reduce over userid shards.
+
+    Each shard is scanned and aggregated in its own process; the partial cubes hold only
+    counts, sums, sums of squares, minima and maxima, so the reduce step is a merge. The
+    summary, group and t-test statistics are then answered exactly as for a single database.
+    """
+
+    def __init__(self, shard_count=SHARD_COUNT, shard_dir=SHARD_DIR, max_workers=SHARD_WORKERS):
+        super().__init__()
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.store = ShardedStore(shard_count, shard_dir)
+        self.max_workers = max_workers
+
+    def build(self):
+        """Scan the shards in parallel processes and merge their partial cubes"""
+        shard_paths = self.store.shard_paths()
+        # Spawned, not forked: the cube is built from scheduler threads, and forking a threaded process can deadlock
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            partials = list(executor.map(build_shard_cube, shard_paths))
+        self.base = self.merge_bases(partials)
+        self.logger.info(f"Merged {len(partials)} shard cubes into {len(self.base)} cells.")
+        return self.base
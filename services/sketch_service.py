@@ -0,0 +1,331 @@
+import json
+import logging
+import sqlite3
+import numpy as np
+from config.settings import (DB_PATH, SKETCH_TABLE, SKETCH_K, SKETCH_HISTOGRAM_BINS_PER_DECADE, SKETCH_HISTOGRAM_MIN,
+                             SKETCH_HISTOGRAM_MAX, SKETCH_CHUNK_SIZE, COLUMN_AMOUNT, COLUMN_PRODUCT_NAME)
+
+
+def histogram_edges(low=SKETCH_HISTOGRAM_MIN, high=SKETCH_HISTOGRAM_MAX, bins_per_decade=SKETCH_HISTOGRAM_BINS_PER_DECADE):
+    """Signed log-scale bin edges that do not depend on the data, so every sketch gets the same ones"""
+    decades = np.log10(high) - np.log10(low)
+    magnitudes = np.logspace(np.log10(low), np.log10(high), int(round(decades * bins_per_decade)) + 1)
+    return np.concatenate([-magnitudes[::-1], magnitudes])
+
+
+class FixedBinHistogram:
+    """Histogram with fixed bin edges, so histograms built on different chunks can be merged"""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, values):
+        """Add a chunk of values to the histogram"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.underflow += int(np.count_nonzero(values < self.edges[0]))
+        self.overflow += int(np.count_nonzero(values > self.edges[-1]))
+        counts, _ = np.histogram(values, bins=self.edges)
+        self.counts += counts
+
+    def merge(self, other):
+        """Merge another histogram with identical bin edges into this one"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bin edges.")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def populated(self):
+        """Counts and edges of the bins from the first to the last non-empty one"""
+        filled = np.flatnonzero(self.counts)
+        if len(filled) == 0:
+            return self.counts[:0], self.edges[:1]
+        first, last = filled[0], filled[-1] + 1
+        return self.counts[first:last], self.edges[first:last + 1]
+
+    def to_dict(self):
+        return {
+            "edges": self.edges.tolist(),
+            "counts": self.counts.tolist(),
+            "underflow": self.underflow,
+            "overflow": self.overflow
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        histogram = cls(payload["edges"])
+        histogram.counts = np.asarray(payload["counts"], dtype=np.int64)
+        histogram.underflow = payload["underflow"]
+        histogram.overflow = payload["overflow"]
+        return histogram
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch made of compactors (KLL style).
+
+    Level h holds items that each stand for 2**h original values. When a level holds
+    more than k items it is sorted and every other item is promoted to the next level,
+    so memory stays at O(k * log(n / k)) whatever the number of values added.
+    """
+
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.levels = [np.empty(0, dtype=float)]
+        self.count = 0
+        self._offsets = []
+
+    def update(self, values):
+        """Add a chunk of values to the sketch"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Merge another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=float))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        """Compact every level holding more than k items"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.k:
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=float))
+                while len(self._offsets) <= level:
+                    self._offsets.append(0)
+                items = np.sort(items)
+                # Keep an odd item back so the promoted half is an exact pairwise compaction
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                # Alternate the offset so the rounding error does not accumulate in one direction
+                offset = self._offsets[level]
+                self._offsets[level] = 1 - offset
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[offset::2]])
+                self.levels[level] = keep
+            level += 1
+
+    def _weighted_items(self):
+        """Return all retained items sorted, with their weights"""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(values), 2 ** level, dtype=np.int64)
+                                  for level, values in enumerate(self.levels)])
+        order = np.argsort(items, kind='mergesort')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """Return the approximate value at quantile q (a float or a list of floats in [0, 1])"""
+        items, weights = self._weighted_items()
+        if len(items) == 0:
+            return None if np.isscalar(q) else [None for _ in q]
+        cumulative = np.cumsum(weights)
+        targets = np.asarray(q, dtype=float) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, targets, side='left'), len(items) - 1)
+        result = items[positions]
+        return float(result) if np.isscalar(q) else result.tolist()
+
+    def items(self):
+        """Return the retained items sorted in increasing order"""
+        return self._weighted_items()[0]
+
+    def to_dict(self):
+        return {"k": self.k, "count": self.count, "offsets": self._offsets,
+                "levels": [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, payload):
+        sketch = cls(payload["k"])
+        sketch.count = payload["count"]
+        sketch._offsets = list(payload["offsets"])
+        sketch.levels = [np.asarray(level, dtype=float) for level in payload["levels"]]
+        return sketch
+
+
+class AmountSketch:
+    """Bounded-memory summary of a distribution: moments, fixed-bin histogram and quantile sketch"""
+
+    def __init__(self, edges=None, k=SKETCH_K):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = FixedBinHistogram(histogram_edges() if edges is None else edges)
+        self.quantiles = QuantileSketch(k)
+
+    def update(self, values):
+        """Add a chunk of values to the sketch"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        chunk_min, chunk_max = float(values.min()), float(values.max())
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+        self.histogram.update(values)
+        self.quantiles.update(values)
+
+    def merge(self, other):
+        """Merge a sketch built on another chunk or shard into this one"""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.histogram.merge(other.histogram)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def std(self, ddof=1):
+        """Standard deviation from the stored moments"""
+        if self.count <= ddof:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - ddof)
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def median(self):
+        return self.quantiles.quantile(0.5)
+
+    def iqr(self):
+        q1, q3 = self.quantiles.quantile([0.25, 0.75])
+        return q3 - q1
+
+    def boxplot_stats(self, whisker=1.5):
+        """Return box-plot statistics in the format expected by matplotlib's Axes.bxp"""
+        if self.count == 0:
+            return None
+        q1, median, q3 = self.quantiles.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        items = self.quantiles.items()
+        # Whiskers reach the most extreme retained value inside the Tukey fences
+        inside = items[(items >= q1 - whisker * iqr) & (items <= q3 + whisker * iqr)]
+        return {
+            "med": median,
+            "q1": q1,
+            "q3": q3,
+            "whislo": float(inside.min()) if len(inside) else q1,
+            "whishi": float(inside.max()) if len(inside) else q3,
+            "fliers": []
+        }
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "total_sq": self.total_sq,
+            "min": self.min,
+            "max": self.max,
+            "histogram": self.histogram.to_dict(),
+            "quantiles": self.quantiles.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        sketch = cls(payload["histogram"]["edges"], payload["quantiles"]["k"])
+        sketch.count = payload["count"]
+        sketch.total = payload["total"]
+        sketch.total_sq = payload["total_sq"]
+        sketch.min = payload["min"]
+        sketch.max = payload["max"]
+        sketch.histogram = FixedBinHistogram.from_dict(payload["histogram"])
+        sketch.quantiles = QuantileSketch.from_dict(payload["quantiles"])
+        return sketch
+
+
+class SketchService:
+    def __init__(self, db_path=DB_PATH):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.db_path = db_path
+        self.table = SKETCH_TABLE
+
+    def build_sketches(self, invoices, chunk_size=SKETCH_CHUNK_SIZE):
+        """Build the global and per-product amount sketches from the invoices chunk by chunk"""
+        try:
+            sketches = {"amount": AmountSketch()}
+            for start in range(0, len(invoices), chunk_size):
+                chunk = invoices.iloc[start:start + chunk_size]
+                sketches["amount"].update(chunk[COLUMN_AMOUNT].to_numpy())
+                if COLUMN_PRODUCT_NAME in chunk.columns:
+                    for product, amounts in chunk.groupby(COLUMN_PRODUCT_NAME)[COLUMN_AMOUNT]:
+                        name = f"product:{product}"
+                        if name not in sketches:
+                            sketches[name] = AmountSketch()
+                        sketches[name].update(amounts.to_numpy())
+            self.logger.info(f"Built {len(sketches)} amount sketches from {len(invoices)} invoices.")
+            return sketches
+        except Exception as e:
+            self.logger.error(f"Error building amount sketches: {e}")
+            return {}
+
+    def save_sketches(self, sketches, replace=False):
+        """Store the sketches in the database next to the tables they summarize.
+
+        With replace, every sketch stored before is dropped first, so none outlives the data it summarized.
+        """
+        connection = sqlite3.connect(self.db_path)
+        try:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (name TEXT PRIMARY KEY, payload TEXT)")
+            if replace:
+                connection.execute(f"DELETE FROM {self.table}")
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (name, payload) VALUES (?, ?)",
+                [(name, json.dumps(sketch.to_dict())) for name, sketch in sketches.items()]
+            )
+            connection.commit()
+            self.logger.info(f"Saved {len(sketches)} amount sketches to table '{self.table}'.")
+        finally:
+            connection.close()
+
+    def load_sketch(self, name):
+        """Load a single stored sketch, or None if it does not exist"""
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                row = connection.execute(f"SELECT payload FROM {self.table} WHERE name = ?", (name,)).fetchone()
+            finally:
+                connection.close()
+            return AmountSketch.from_dict(json.loads(row[0])) if row else None
+        except sqlite3.Error as e:
+            self.logger.warning(f"Amount sketch '{name}' is not available: {e}")
+            return None
+
+    def load_sketches(self, prefix=''):
+        """Load every stored sketch whose name starts with prefix, keyed by name"""
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                rows = connection.execute(f"SELECT name, payload FROM {self.table} WHERE name LIKE ?", (prefix + '%',)).fetchall()
+            finally:
+                connection.close()
+            return {name: AmountSketch.from_dict(json.loads(payload)) for name, payload in rows}
+        except sqlite3.Error as e:
+            self.logger.warning(f"Amount sketches '{prefix}*' are not available: {e}")
+            return {}
+
+    def build_and_store(self, invoices):
+        """Build the amount sketches during ingest and persist them in place of the previous ingest's"""
+        sketches = self.build_sketches(invoices)
+        if sketches:
+            self.save_sketches(sketches, replace=True)
+        return sketches
@@ -2,15 +2,27 @@
 import sqlite3
 from controllers.sql_loader import load_sql_queries
 from config.settings import DB_PATH
+from models.partitions import apply_analysis_window
 import logging
 import pandas as pd
-from scipy.stats import ttest_ind
+
+# Group membership on (ui_change, desc_change), with the NULL handling of the group_*_sales queries
+GROUP_CONDITIONS = {
+    "A": lambda ui, desc: (ui.fillna('no') == 'no') & (desc.fillna('no') == 'no'),
+    "B": lambda ui, desc: (ui.fillna('yes') == 'yes') & (desc.fillna('no') == 'no'),
+    "C": lambda ui, desc: (ui.fillna('no') == 'no') & (desc.fillna('yes') == 'yes'),
+    "D": lambda ui, desc: (ui.fillna('yes') == 'yes') & (desc.fillna('yes') == 'yes'),
+}
 
 class TTestService:
-    def __init__(self):
+    def __init__(self, cube=None, join_index=None, db_path=DB_PATH):
         self.logger = logging.getLogger(__name__)
-        self.db_path = DB_PATH
+        self.db_path = db_path
         self.queries = load_sql_queries()
+        # Optional CubeService: group moments from the cube replace the per-group row queries
+        self.cube = cube
+        # Optional AssignmentIndex: one invoice scan split into groups by a gather instead of four joins
+        self.join_index = join_index
         self.logger.info("TTestService initialized with database path and loaded queries.")
 
     def execute_query(self, query_name):
@@ -23,6 +35,7 @@ class TTestService:
 
             self.logger.info(f"Executing query: {query_name}")
             connection = sqlite3.connect(self.db_path)
+            apply_analysis_window(connection)
             cursor = connection.cursor()
 
             cursor.execute(self.queries[query_name])
@@ -49,6 +62,7 @@ class TTestService:
         """Perform t-test between two groups."""
         try:
             # Perform t-test
+            from scipy.stats import ttest_ind  # Imported on use: SciPy is slow to load
             t_stat, p_value = ttest_ind(group_a_data, group_b_data, equal_var=False)
             return t_stat, p_value
 
@@ -56,8 +70,51 @@ class TTestService:
             self.logger.error(f"Error performing t-test: {e}")
             return None, None
 
+    def perform_t_tests_from_moments(self):
+        """Perform Welch t-tests for all group pairs from the count, mean and std of each group."""
+        try:
+            moments = self.cube.group_moments(GROUP_CONDITIONS)
+            for group_name, (count, _, _) in moments.items():
+                if count == 0:
+                    self.logger.error(f"No data found for group {group_name}.")
+                    return None
+
+            from scipy.stats import ttest_ind_from_stats  # Imported on use: SciPy is slow to load
+            t_test_results = {}
+            for group1, (count1, mean1, std1) in moments.items():
+                for group2, (count2, mean2, std2) in moments.items():
+                    if group1 < group2:  # Avoid duplicate and self-comparisons (e.g., A-B, B-A)
+                        t_stat, p_value = ttest_ind_from_stats(mean1, std1, count1, mean2, std2, count2, equal_var=False)
+                        t_test_results[f"{group1}-{group2}"] = {
+                            "t_statistic": t_stat,
+                            "p_value": p_value
+                        }
+
+            self.logger.info("T-tests for all group combinations completed successfully.")
+            return t_test_results
+
+        except Exception as e:
+            self.logger.error(f"Error performing t-tests from group moments: {e}")
+            return None
+
+    def load_group_amounts_from_index(self):
+        """Amounts of each group (A, B, C, D) from one invoice scan and the assignment join index."""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection)
+            invoices = pd.read_sql_query(self.queries['invoice_amounts_query'], connection)
+        finally:
+            connection.close()
+
+        joined = self.join_index.attach(invoices)
+        joined = joined[joined['assigned']]
+        return {group_name: joined.loc[condition(joined['ui_change'], joined['desc_change']), 'amount']
+                for group_name, condition in GROUP_CONDITIONS.items()}
+
     def perform_t_tests_for_all_groups(self):
         """Perform t-tests for all combinations of groups (A, B, C, D)."""
+        if self.cube is not None:
+            return self.perform_t_tests_from_moments()
         try:
             # Define group query names
             groups = {
@@ -69,13 +126,20 @@ class TTestService:
 
             # Load data for each group
             group_data = {}
-            for group_name, query_name in groups.items():
-                data = self.execute_query(query_name)
-                if data:
-                    group_data[group_name] = pd.DataFrame(data, columns=['amount'])['amount']
-                else:
-                    self.logger.error(f"No data found for group {group_name}.")
-                    return None
+            if self.join_index is not None:
+                group_data = self.load_group_amounts_from_index()
+                for group_name, data in group_data.items():
+                    if data.empty:
+                        self.logger.error(f"No data found for group {group_name}.")
+                        return None
+            else:
+                for group_name, query_name in groups.items():
+                    data = self.execute_query(query_name)
+                    if data:
+                        group_data[group_name] = pd.DataFrame(data, columns=['amount'])['amount']
+                    else:
+                        self.logger.error(f"No data found for group {group_name}.")
+                        return None
 
             # Perform t-tests for each combination of groups
             t_test_results = {}
@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config.settings import PIPELINE_MAX_WORKERS
+
+
+class Task:
+    """A unit of work in the pipeline DAG.
+
+    A task reads the outputs named in `inputs` (produced by other tasks) and produces the
+    outputs named in `outputs`. Tasks sharing a `resource` never run at the same time,
+    which is how non thread-safe work such as pyplot rendering is serialized.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=None, resource=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) if outputs is not None else [name]
+        self.resource = resource
+
+
+class TaskScheduler:
+    def __init__(self, max_workers=PIPELINE_MAX_WORKERS):
+        self.logger = logging.getLogger(__name__)  # Initialize logger
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.producers = {}
+        self.results = {}
+        self.timings = {}
+        self.errors = {}
+        self.skipped = []
+        self._resource_locks = {}
+        self._run_start = None
+        self._run_end = None
+
+    def add(self, name, func, inputs=(), outputs=None, resource=None):
+        """Declare a task; its dependencies are the tasks producing its inputs"""
+        task = Task(name, func, inputs, outputs, resource)
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already declared.")
+        for output in task.outputs:
+            if output in self.producers:
+                raise ValueError(f"Output '{output}' is already produced by task '{self.producers[output]}'.")
+            self.producers[output] = name
+        self.tasks[name] = task
+        if resource is not None:
+            self._resource_locks.setdefault(resource, threading.Lock())
+        return task
+
+    def dependencies(self, name):
+        """Names of the tasks producing the inputs of a task"""
+        task = self.tasks[name]
+        missing = [value for value in task.inputs if value not in self.producers]
+        if missing:
+            raise ValueError(f"Task '{name}' needs inputs no task produces: {missing}")
+        return {self.producers[value] for value in task.inputs}
+
+    def _required_tasks(self, targets):
+        """All tasks needed to produce the targets (task or output names), in dependency order"""
+        if targets is None:
+            pending = list(self.tasks)
+        else:
+            pending = [self.producers.get(target, target) for target in targets]
+            unknown = [target for target in pending if target not in self.tasks]
+            if unknown:
+                raise ValueError(f"Unknown pipeline targets: {unknown}")
+
+        ordered, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle detected at task '{name}'.")
+            visiting.add(name)
+            for dependency in sorted(self.dependencies(name)):
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            ordered.append(name)
+
+        for name in pending:
+            visit(name)
+        return ordered
+
+    def _run_task(self, task):
+        inputs = [self.results[value] for value in task.inputs]
+        lock = self._resource_locks.get(task.resource)
+        if lock is not None:
+            lock.acquire()
+        start = time.perf_counter()
+        try:
+            result = task.func(*inputs)
+        finally:
+            end = time.perf_counter()
+            if lock is not None:
+                lock.release()
+            self.timings[task.name] = (start - self._run_start, end - self._run_start)
+        return result
+
+    def run(self, targets=None):
+        """Run the tasks needed for the targets (all tasks by default) on a worker pool.
+
+        A task is submitted as soon as every task it depends on has finished. A failed task
+        is logged and its dependents are skipped; the other branches keep running.
+        """
+        order = self._required_tasks(targets)
+        remaining = {name: set(self.dependencies(name)) for name in order}
+        dependents = {name: [] for name in order}
+        for name, dependencies in remaining.items():
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+
+        self._run_start = time.perf_counter()
+        self.logger.info(f"Running {len(order)} pipeline tasks on {self.max_workers} workers.")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            ready = [name for name in order if not remaining[name]]
+            while ready or running:
+                for name in ready:
+                    running[executor.submit(self._run_task, self.tasks[name])] = name
+                ready = []
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    task = self.tasks[name]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+                        self.logger.error(f"Pipeline task '{name}' failed: {e}")
+                        self._skip_dependents(name, dependents, remaining)
+                        continue
+
+                    if len(task.outputs) == 1:
+                        self.results[task.outputs[0]] = result
+                    else:
+                        for output in task.outputs:
+                            self.results[output] = result[output]
+
+                    for dependent in dependents[name]:
+                        if dependent in remaining:
+                            remaining[dependent].discard(name)
+                            if not remaining[dependent]:
+                                ready.append(dependent)
+                    remaining.pop(name, None)
+
+        self._run_end = time.perf_counter()
+        self.logger.info(self.timing_report())
+        return self.results
+
+    def _skip_dependents(self, name, dependents, remaining):
+        remaining.pop(name, None)
+        for dependent in dependents[name]:
+            if dependent in remaining:
+                self.skipped.append(dependent)
+                self.logger.warning(f"Skipping pipeline task '{dependent}' because '{name}' did not complete.")
+                self._skip_dependents(dependent, dependents, remaining)
+
+    def critical_path(self):
+        """Longest chain of dependent tasks by run time, with its total duration"""
+        finish, previous = {}, {}
+        for name in sorted(self.timings, key=lambda task_name: self.timings[task_name][1]):
+            duration = self.timings[name][1] - self.timings[name][0]
+            best, best_dependency = 0.0, None
+            for dependency in self.dependencies(name):
+                if finish.get(dependency, 0.0) > best:
+                    best, best_dependency = finish[dependency], dependency
+            finish[name] = best + duration
+            previous[name] = best_dependency
+
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return list(reversed(path)), total
+
+    def timing_report(self):
+        """Human readable timing report: wall time, task time, critical path and per-task timings"""
+        wall_time = (self._run_end or time.perf_counter()) - self._run_start if self._run_start else 0.0
+        task_time = sum(end - start for start, end in self.timings.values())
+        path, path_time = self.critical_path()
+        lines = [
+            "Pipeline timing report",
+            f"- Wall time: {wall_time:.3f}s",
+            f"- Sum of task times: {task_time:.3f}s (parallelism {task_time / wall_time if wall_time else 0:.2f}x)",
+            f"- Critical path ({path_time:.3f}s): {' -> '.join(path)}",
+        ]
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            marker = "*" if name in path else " "
+            lines.append(f"  {marker} {name}: start {start:.3f}s, duration {end - start:.3f}s")
+        for name, error in self.errors.items():
+            lines.append(f"  ! {name}: failed ({error})")
+        for name in self.skipped:
+            lines.append(f"  - {name}: skipped")
+        return "\n".join(lines)
@@ -2,16 +2,27 @@ import sqlite3
 from controllers.sql_loader import load_sql_queries
 import logging
 from config.settings import DB_PATH
+from models.partitions import apply_analysis_window
+from services.sample_service import with_interval
 
 class TestAnalysisService:
-    def __init__(self):
+    def __init__(self, cube=None, sample=None, db_path=DB_PATH):
         self.logger = logging.getLogger(__name__)  # Initialize logger
-        self.db_path = DB_PATH
+        self.db_path = db_path
         self.queries = load_sql_queries()
+        # Optional CubeService answering the summary queries from one shared scan
+        self.cube = cube
+        # Optional StratifiedSample: approximate group comparisons with confidence intervals
+        self.sample = sample
 
     def execute_query(self, query_name):
         """Execute and retrieve results for the specified query"""
+        if self.sample is not None and self.sample.can_answer(query_name):
+            return self.sample.answer(query_name)
+        if self.cube is not None and self.cube.can_answer(query_name):
+            return self.cube.answer(query_name)
         connection = sqlite3.connect(self.db_path)
+        apply_analysis_window(connection)
         cursor = connection.cursor()
         cursor.execute(self.queries[query_name])
         result = cursor.fetchall()
@@ -24,7 +35,8 @@ class TestAnalysisService:
         try:
             result = self.execute_query('avg_purchase_by_ui_and_desc')
             if result:
-                analysis = [{"UI Change": row[0], "Description Change": row[1], "Average Purchase": row[2]} for row in result]
+                analysis = [with_interval({"UI Change": row[0], "Description Change": row[1], "Average Purchase": row[2]}, row, 3)
+                            for row in result]
                 self.logger.info("UI and Description changes analysis generated successfully.")
                 return analysis
             else:
@@ -40,7 +52,8 @@ class TestAnalysisService:
         try:
             result = self.execute_query('avg_purchase_by_product_ui_desc')
             if result:
-                analysis = [{"Product": row[0], "UI Change": row[1], "Description Change": row[2], "Average Purchase": row[3]} for row in result]
+                analysis = [with_interval({"Product": row[0], "UI Change": row[1], "Description Change": row[2], "Average Purchase": row[3]}, row, 4)
+                            for row in result]
                 self.logger.info("Product, UI, and Description changes analysis generated successfully.")
                 return analysis
             else:
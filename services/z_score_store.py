@@ -0,0 +1,75 @@
+import os
+import numpy as np
+from config.settings import Z_SCORE_CHUNK_SIZE
+from services.sketch_service import AmountSketch
+
+
+class ZScoreHandle:
+    """Handle to per-invoice z-scores kept in a memory-mapped float32 file.
+
+    Only the path and the row count travel with the report, so the handle is cheap
+    to pass around and pickle; the scores are read back chunk by chunk on demand.
+    """
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def array(self):
+        """Open the z-scores read-only as a memory-mapped array"""
+        if self.count == 0:
+            return np.empty(0, dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode='r', shape=(self.count,))
+
+    def iter_chunks(self, chunk_size=Z_SCORE_CHUNK_SIZE):
+        """Yield the z-scores in chunks without loading the whole file"""
+        scores = self.array()
+        for start in range(0, self.count, chunk_size):
+            yield np.asarray(scores[start:start + chunk_size])
+
+    def sketch(self):
+        """Summarize the z-scores in an AmountSketch (histogram and quantiles) for plotting"""
+        sketch = AmountSketch()
+        for chunk in self.iter_chunks():
+            sketch.update(chunk)
+        return sketch
+
+
+def write_z_scores(path, count, chunks, mean, std):
+    """Write z-scores for streamed amount chunks into a float32 memory map.
+
+    Returns the handle and summary statistics (mean, population std, min, max) of the
+    written scores, accumulated chunk by chunk.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    if count == 0:
+        return ZScoreHandle(path, 0), {"mean": None, "std_dev": None, "min": None, "max": None}
+
+    scores = np.memmap(path, dtype=np.float32, mode='w+', shape=(count,))
+    written, total, total_sq = 0, 0.0, 0.0
+    low, high = np.inf, -np.inf
+    for amounts in chunks:
+        amounts = np.asarray(amounts, dtype=np.float64)
+        chunk_scores = (amounts - mean) / std
+        scores[written:written + len(chunk_scores)] = chunk_scores
+        written += len(chunk_scores)
+        total += float(chunk_scores.sum())
+        total_sq += float(np.square(chunk_scores).sum())
+        low, high = min(low, float(chunk_scores.min())), max(high, float(chunk_scores.max()))
+    scores.flush()
+    del scores
+
+    mean_z = total / written
+    stats = {
+        "mean": mean_z,
+        "std_dev": float(np.sqrt(max(total_sq / written - mean_z * mean_z, 0.0))),
+        "min": low,
+        "max": high
+    }
+    return ZScoreHandle(path, written), stats
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+PRODUCT_NAMES = ['cloud-s', 'cloud-m', 'cloud-l']
+EVENT_NAMES = ['buy', 'renew', 'upgrade', 'downgrade']
+
+
+def ab_test_frames(seed, n_invoices=2000, n_users=120, n_assigned=100, start='2020-05-01', days=120):
+    """Random invoices, test_analysis and products tables of a small A/B test.
+
+    Users n_assigned..n_users-1 have no assignment and event_id 5 has no product, so every
+    join has unmatched rows. Tests plant their own rows on top of these frames.
+    """
+    rng = np.random.default_rng(seed)
+    invoices = pd.DataFrame({
+        'userid': rng.integers(0, n_users, n_invoices),
+        'datepaid': (pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n_invoices), unit='D')).strftime('%m/%d/%Y'),
+        'event_id': rng.integers(1, len(EVENT_NAMES) + 2, n_invoices),
+        'amount': rng.integers(100, 10000, n_invoices).astype(float),
+        'product_name': rng.choice(PRODUCT_NAMES, n_invoices),
+    })
+    test = pd.DataFrame({
+        'userid': np.arange(n_assigned),
+        'ui_change': rng.choice(['yes', 'no'], n_assigned),
+        'desc_change': rng.choice(['yes', 'no'], n_assigned),
+    })
+    products = pd.DataFrame({'event_id': np.arange(1, len(EVENT_NAMES) + 1), 'event_name': EVENT_NAMES})
+    return invoices, test, products
+
+
+def write_tables(db_path, invoices=None, test=None, products=None):
+    """Store the frames given as the invoices, test_analysis and products tables"""
+    with sqlite3.connect(db_path) as connection:
+        for table, frame in (('invoices', invoices), ('test_analysis', test), ('products', products)):
+            if frame is not None:
+                frame.to_sql(table, connection, index=False)
+    return db_path
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Test case with the A/B test frames of ab_test_frames and a temporary directory for its databases"""
+
+    seed = 0
+    frame_options = {}
+
+    def setUp(self):
+        self.invoices, self.test, self.products = ab_test_frames(self.seed, **self.frame_options)
+        self.rng = np.random.default_rng(self.seed + 1)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_database(self, name='test.db'):
+        """Store the test's frames (with its planted rows) in a database in the temporary directory"""
+        return write_tables(os.path.join(self.tmp_dir.name, name), self.invoices, self.test, self.products)
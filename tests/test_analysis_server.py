@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+import numpy as np
+import pandas as pd
+from controllers.analysis_server import AnalysisServer, jsonable, notify_ingest
+from services.z_score_store import ZScoreHandle
+
+class FakeSession:
+    """Session computing each analysis once, counting the computations"""
+
+    def __init__(self, computed):
+        self.results = {}
+        self.computed = computed
+
+    def get(self, name):
+        if name == 't_tests':
+            raise ValueError("no groups")
+        if name not in self.results:
+            self.computed.append(name)
+            self.results[name] = [{'Product': 'cloud-s', 'Total Sales': np.float64(1.5)}]
+        return self.results[name]
+
+    def stats(self):
+        return {}
+
+    def table_fingerprints(self):
+        return {'invoices': 'i1'}
+
+
+class TestAnalysisServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'database.db')
+        self.write_db(b'v1')
+        self.computed = []
+        self.server = AnalysisServer(port=0, db_path=self.db_path, session_factory=lambda: FakeSession(self.computed), warm=False)
+
+    def tearDown(self):
+        self.server.httpd.server_close()
+        self.tmp_dir.cleanup()
+
+    def write_db(self, content):
+        with open(self.db_path, 'wb') as f:
+            f.write(content)
+
+    def test_results_are_served_warm(self):
+        status, first = self.server.respond('GET', '/api/eda/product_sales_summary')
+        self.assertEqual(status, 200)
+        self.assertFalse(first['cached'])
+        self.assertEqual(first['result'], [{'Product': 'cloud-s', 'Total Sales': 1.5}])
+
+        status, second = self.server.respond('GET', '/api/eda/product_sales_summary')
+        self.assertTrue(second['cached'])
+        self.assertEqual(self.computed, ['product_sales_summary'])
+
+    def test_unknown_paths_and_failures(self):
+        self.assertEqual(self.server.respond('GET', '/api/eda/t_tests')[0], 404)
+        self.assertEqual(self.server.respond('GET', '/other')[0], 404)
+        status, payload = self.server.respond('GET', '/api/t_test/t_tests')
+        self.assertEqual(status, 500)
+        self.assertIn('no groups', payload['error'])
+        status, payload = self.server.respond('GET', '/api')
+        self.assertIn('ui_desc_changes', payload['services']['test_analysis'])
+
+    def test_requests_are_counted_per_route(self):
+        paths = ['/api/eda/product_sales_summary', '/api/eda/missing', '/other/x'] + [f'/scan/{i}' for i in range(50)]
+        threads = [threading.Thread(target=lambda: [self.server.respond('GET', path) for path in paths]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        status, payload = self.server.respond('GET', '/api/status')
+        self.assertEqual(payload['requests'], 4 * len(paths) + 1)
+        self.assertEqual(payload['routes'], {'GET /api/eda/product_sales_summary': 4, 'unknown': 4 * (len(paths) - 1),
+                                             'GET /api/status': 1})
+
+    def test_database_write_replaces_the_session(self):
+        self.server.respond('GET', '/api/eda/product_sales_summary')
+        self.write_db(b'version 2')
+        self.server.respond('GET', '/api/eda/product_sales_summary')
+        self.assertEqual(self.computed, ['product_sales_summary'] * 2)
+        self.assertEqual(self.server.sessions_created, 2)
+
+    def test_ingest_notification_over_http(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with urllib.request.urlopen(f"{self.server.url}/api/eda/event_sales_summary") as response:
+                self.assertEqual(json.load(response)['analysis'], 'event_sales_summary')
+            self.assertTrue(notify_ingest(self.server.url))
+            self.assertEqual(self.server.sessions_created, 2)
+        finally:
+            self.server.shutdown()
+            thread.join()
+
+    def test_jsonable(self):
+        frame = pd.DataFrame({'a': [1, 2], 'b': [np.nan, 0.5]})
+        self.assertEqual(jsonable({'frame': frame, 'scores': ZScoreHandle('z.f32', 3), 'array': np.array([1.0, 2.0])}),
+                         {'frame': [{'a': 1, 'b': None}, {'a': 2, 'b': 0.5}], 'scores': {'count': 3}, 'array': [1.0, 2.0]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from services.analysis_session import AnalysisSession
+
+class TestAnalysisSession(unittest.TestCase):
+
+    def setUp(self):
+        # Mock services so every analysis is counted without touching a database
+        self.eda_service = MagicMock()
+        self.eda_service.product_sales_summary.return_value = [{'Product': 'A', 'Total Sales': 100}]
+        self.eda_service.event_sales_summary.return_value = [{'Event ID': 1, 'Total Sales': 100}]
+        self.eda_service.product_sales_by_group.return_value = [{'Group': 'A', 'Total Sales': 100}]
+        self.eda_service.calculate_statistics.return_value = {'mean': 100}
+        self.eda_service.calculate_z_score.return_value = {'z_scores': None, 'mean': 0, 'std_dev': 1, 'min': -1, 'max': 1}
+        self.eda_service.assemble_report.return_value = {'product_sales_summary': []}
+        self.test_analysis_service = MagicMock()
+        self.t_test_service = MagicMock()
+        self.t_test_service.perform_t_tests_for_all_groups.return_value = {'A-B': {'t_statistic': 1.0, 'p_value': 0.3}}
+        self.session = AnalysisSession(self.eda_service, self.test_analysis_service, self.t_test_service)
+
+    def test_each_analysis_runs_once(self):
+        # Report, plots and PDF all ask for the same results
+        for _ in range(3):
+            self.session.get('eda_report')
+            self.session.get('test_analysis_report')
+            self.session.get('t_tests')
+
+        self.eda_service.product_sales_summary.assert_called_once()
+        self.eda_service.calculate_z_score.assert_called_once()
+        self.t_test_service.perform_t_tests_for_all_groups.assert_called_once()
+        self.test_analysis_service.analyze_ui_and_desc_changes.assert_called_once()
+        self.assertTrue(all(count == 1 for count in self.session.executions.values()))
+        self.assertEqual(self.session.stats()['eda_report']['hits'], 2)
+
+    def test_concurrent_requests_share_one_execution(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self.session.get('t_tests'), range(16)))
+
+        self.t_test_service.perform_t_tests_for_all_groups.assert_called_once()
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_invalidate_recomputes(self):
+        self.session.get('t_tests')
+        self.session.invalidate('t_tests')
+        self.session.get('t_tests')
+
+        self.assertEqual(self.session.executions['t_tests'], 2)
+
+    def test_unknown_analysis(self):
+        with self.assertRaises(KeyError):
+            self.session.get('unknown')
+
+if __name__ == '__main__':
+    unittest.main()
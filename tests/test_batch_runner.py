@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from config.run_config import RunConfig
+from controllers.batch_runner import BatchRunner, run_experiment
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.summary_path = os.path.join(self.tmp_dir.name, 'summary.json')
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_missing_directory_is_reported_not_raised(self):
+        result = run_experiment(RunConfig(directory=os.path.join(self.tmp_dir.name, 'missing')))
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual(result['experiment'], 'missing')
+        self.assertIn('FileNotFoundError', result['error'])
+        self.assertEqual(os.getcwd(), self.cwd)
+
+    def test_summary_aggregates_status_and_stage_times(self):
+        runner = BatchRunner(max_workers=2, summary_path=self.summary_path)
+        runner.results = [
+            {'experiment': 'a', 'directory': 'a', 'status': 'ok', 'error': None, 'seconds': 3.0,
+             'stages': {'ingest': {'status': 'ran', 'seconds': 1.0}, 'plot': {'status': 'ran', 'seconds': 2.0}}},
+            {'experiment': 'b', 'directory': 'b', 'status': 'failed', 'error': 'Stages failed: [plot]', 'seconds': 1.5,
+             'stages': {'ingest': {'status': 'fresh', 'seconds': 0.0}, 'plot': {'status': 'failed', 'seconds': 1.5}}},
+        ]
+        summary = runner.summary(2.0)
+        self.assertEqual((summary['experiments'], summary['succeeded'], summary['failed']), (2, 1, 1))
+        self.assertEqual(summary['experiment_seconds'], 4.5)
+        self.assertEqual(summary['stage_seconds'], {'ingest': 1.0, 'plot': 3.5})
+
+        runner.save(summary)
+        with open(self.summary_path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['results'][1]['error'], 'Stages failed: [plot]')
+
+    def test_experiments_run_in_their_own_directories(self):
+        empty = os.path.join(self.tmp_dir.name, 'empty')
+        os.makedirs(empty)
+        summary = BatchRunner(max_workers=2, summary_path=self.summary_path).run(
+            [RunConfig(directory=empty), RunConfig(directory=os.path.join(self.tmp_dir.name, 'missing'))])
+        self.assertEqual((summary['experiments'], summary['failed']), (2, 2))
+        # The experiment without data failed loading it, and logged that inside its own directory
+        self.assertIn('tbl_invoices.csv', summary['results'][0]['error'])
+        with open(os.path.join(empty, 'app.log'), encoding='utf-8') as log:
+            self.assertIn('tbl_invoices.csv', log.read())
+        self.assertEqual(os.getcwd(), self.cwd)
+        self.assertTrue(os.path.exists(self.summary_path))
+
+    def test_cpus_are_shared_between_running_experiments(self):
+        with patch('os.cpu_count', return_value=8):
+            self.assertEqual(BatchRunner(max_workers=2).plot_workers(10), 4)
+            self.assertEqual(BatchRunner(max_workers=8).plot_workers(10), 0)
+            self.assertEqual(BatchRunner(max_workers=8).plot_workers(1), 8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+import pandas as pd
+from models.join_index import AssignmentIndex
+from services.cohort_service import CohortService
+from tests.fixtures import DatabaseTestCase
+
+class TestCohortService(DatabaseTestCase):
+
+    seed = 29
+    # Users 250..299 have no assignment
+    frame_options = {'n_invoices': 4000, 'n_users': 300, 'n_assigned': 250, 'start': '2020-01-10', 'days': 240}
+
+    def setUp(self):
+        super().setUp()
+        self.db_path = self.write_database('cohorts.db')
+
+    def naive_active_users(self):
+        """Active users per cohort and age, computed user by user"""
+        periods = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y').dt.to_period('M')
+        counts = {}
+        for user, user_periods in periods.groupby(self.invoices['userid']):
+            cohort = user_periods.min()
+            for period in set(user_periods):
+                key = (str(cohort), (period - cohort).n)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def test_active_users_match_per_user_loop(self):
+        result = CohortService(self.db_path).analyze()
+        expected = self.naive_active_users()
+        active = result['active_users']
+        for (cohort, age), count in expected.items():
+            self.assertEqual(active.loc[cohort, age], count)
+        self.assertEqual(int(active.fillna(0).to_numpy().sum()), sum(expected.values()))
+        self.assertEqual(result['cohort_sizes'].sum(), self.invoices['userid'].nunique())
+        np.testing.assert_allclose(result['retention'][0], 1.0)
+
+    def test_unobserved_ages_are_missing(self):
+        active = CohortService(self.db_path).analyze()['active_users']
+        last_period = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y').max().to_period('M')
+        for cohort, row in active.iterrows():
+            observed_ages = (last_period - pd.Period(cohort, 'M')).n
+            self.assertFalse(row[:observed_ages + 1].isna().any())
+            self.assertTrue(row[observed_ages + 1:].isna().all())
+
+    def test_repeat_curve(self):
+        result = CohortService(self.db_path).analyze()
+        self.assertEqual(result['group_users']['Unassigned'], self.invoices.loc[self.invoices['userid'] >= 250, 'userid'].nunique())
+        self.assertTrue((np.diff(result['repeat_curve'].to_numpy(), axis=1) >= 0).all())
+
+        # Share of users with at least two invoices
+        purchases = self.invoices.groupby('userid').size()
+        overall = (result['repeat_curve'].iloc[:, -1] * result['group_users']).sum()
+        self.assertAlmostEqual(overall, (purchases >= 2).sum())
+
+    def test_join_index_matches_sql_join(self):
+        index = AssignmentIndex.build(self.test['userid'], self.test['ui_change'], self.test['desc_change'])
+        with_index = CohortService(self.db_path, join_index=index).analyze()
+        with_sql = CohortService(self.db_path).analyze()
+        pd.testing.assert_frame_equal(with_index['group_active_users'], with_sql['group_active_users'])
+        pd.testing.assert_frame_equal(with_index['repeat_curve'], with_sql['repeat_curve'])
+
+    def test_empty_invoices(self):
+        frame = pd.DataFrame({'userid': [], 'datepaid': [], 'group_name': []})
+        self.assertIsNone(CohortService(self.db_path).build(frame))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sqlite3
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from services.cube_service import CubeService, assign_group
+from tests.fixtures import DatabaseTestCase
+
+class TestCubeService(DatabaseTestCase):
+
+    seed = 3
+
+    def setUp(self):
+        # Some invoices have no assignment and one event is unknown
+        super().setUp()
+        self.db_path = self.write_database('cube.db')
+
+    def test_cube_answers_match_sql(self):
+        cube = CubeService(self.db_path)
+        queries = load_sql_queries()
+        connection = sqlite3.connect(self.db_path)
+        try:
+            for query_name in cube.query_slices:
+                expected = sorted(connection.execute(queries[query_name]).fetchall(), key=str)
+                actual = sorted(cube.answer(query_name), key=str)
+
+                self.assertEqual(len(actual), len(expected), query_name)
+                for actual_row, expected_row in zip(actual, expected):
+                    self.assertEqual(actual_row[:-1], expected_row[:-1], query_name)
+                    self.assertAlmostEqual(actual_row[-1], expected_row[-1], places=6, msg=query_name)
+        finally:
+            connection.close()
+
+    def test_rollup_variance_and_single_scan(self):
+        cube = CubeService(self.db_path)
+        cube.build = MagicMock(side_effect=cube.build)
+
+        by_month = cube.rollup(['month'])
+        by_group = cube.rollup(['group_name'], ['assigned'])
+
+        cube.build.assert_called_once()
+        self.assertEqual(by_month['count'].sum(), 2000)
+        self.assertTrue(set(by_group['group_name']) <= {'A', 'B', 'C', 'D'})
+        with sqlite3.connect(self.db_path) as connection:
+            amounts = pd.read_sql_query("SELECT amount FROM invoices", connection)['amount']
+        overall = cube.rollup(['assigned'])
+        total_variance = (overall['sum_sq'].sum() - overall['sum'].sum() ** 2 / 2000) / 1999
+        self.assertAlmostEqual(total_variance, amounts.var(), delta=1e-6 * amounts.var())
+
+    def test_assign_group(self):
+        groups = assign_group(['no', 'yes', 'no', 'yes', None, 'maybe'], ['no', 'no', 'yes', 'yes', None, 'no'])
+        self.assertEqual(list(groups), ['A', 'B', 'C', 'D', 'A', 'Unknown'])
+
+if __name__ == '__main__':
+    unittest.main()
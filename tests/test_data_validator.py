@@ -0,0 +1,100 @@
+import sqlite3
+import tempfile
+import os
+import unittest
+import pandas as pd
+from services.data_validator import DataValidator, REASON_CODES, describe_reasons
+
+class TestDataValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {
+            "products": pd.DataFrame({'event_id': [1, 2, 3, 3], 'event_name': ['buy', 'renew', 'upgrade', 'again']}),
+            "test": pd.DataFrame({
+                'userid': [10, 11, 12, 13, 13],
+                'ui_change': ['yes', 'no', 'maybe', 'no', 'yes'],
+                'desc_change': ['no', 'no', 'yes', None, 'no'],
+            }),
+            "invoices": pd.DataFrame({
+                'userid': ['10', '11', '10', 'x', '12', '99', '11', '11', '11'],
+                'datepaid': ['06/01/2020', '06/02/2020', '13/40/2020', '06/03/2020', '06/04/2020',
+                             '06/05/2020', '06/06/2020', '06/07/2020', '06/08/2020'],
+                'event_id': [1, 2, 1, 1, 1, 1, 3, 2, 2],
+                'amount': ['100', '250.5', '10', '10', '10', '10', '10', '-5', 'abc'],
+                'product_name': ['cloud-s', 'cloud-m', 'cloud-s', 'cloud-s', 'cloud-s', 'cloud-s', 'cloud-s',
+                                 'cloud-s', None],
+            }),
+        }
+
+    def reasons(self, quarantine, table):
+        rows = quarantine[quarantine['source_table'] == table]
+        return dict(zip(rows['source_row'], rows['reasons']))
+
+    def test_validate_all_quarantines_bad_rows_with_reasons(self):
+        validated, quarantine = DataValidator(self.data).validate_all()
+
+        self.assertEqual(self.reasons(quarantine, 'products'), {2: 'duplicate_key', 3: 'duplicate_key'})
+        self.assertEqual(self.reasons(quarantine, 'test_analysis'), {
+            2: 'out_of_range', 3: 'missing_value|duplicate_key', 4: 'duplicate_key'})
+        self.assertEqual(self.reasons(quarantine, 'invoices'), {
+            2: 'bad_type',
+            3: 'bad_type',
+            4: 'unknown_user',  # User 12 was itself quarantined
+            5: 'unknown_user',
+            6: 'unknown_event',
+            7: 'out_of_range',
+            8: 'missing_value|bad_type',
+        })
+
+        self.assertEqual(list(validated['products']['event_id']), [1, 2])
+        self.assertEqual(list(validated['test']['userid']), [10, 11])
+        self.assertEqual(list(validated['invoices']['userid']), [10, 11])
+        self.assertEqual(validated['invoices']['userid'].dtype, 'int64')
+        self.assertEqual(list(validated['invoices']['amount']), [100.0, 250.5])
+        self.assertEqual(list(validated['invoices']['datepaid']), ['06/01/2020', '06/02/2020'])
+
+    def test_clean_data_passes_unchanged(self):
+        data = {
+            "products": self.data["products"].iloc[:2],
+            "test": self.data["test"].iloc[:2],
+            "invoices": self.data["invoices"].iloc[:2].astype({'userid': int, 'amount': float}),
+        }
+        validated, quarantine = DataValidator(data).validate_all()
+
+        self.assertEqual(len(quarantine), 0)
+        for name, frame in data.items():
+            pd.testing.assert_frame_equal(validated[name], frame)
+
+    def test_missing_column_rejects_table(self):
+        self.data["products"] = self.data["products"].drop(columns=['event_name'])
+        validated, quarantine = DataValidator(self.data).validate_all()
+
+        self.assertEqual(len(validated['products']), 0)
+        self.assertTrue((quarantine.loc[quarantine['source_table'] == 'products', 'reason_code']
+                         & REASON_CODES['missing_column']).all())
+        # Without products every invoice references an unknown event
+        self.assertEqual(len(validated['invoices']), 0)
+
+    def test_quarantine_is_storable(self):
+        _, quarantine = DataValidator(self.data).validate_all()
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(os.path.join(directory, 'test.db'))
+            try:
+                quarantine.to_sql('quarantine', connection, index=False)
+                count = connection.execute("SELECT COUNT(*) FROM quarantine").fetchone()[0]
+            finally:
+                connection.close()
+        self.assertEqual(count, len(quarantine))
+
+    def test_describe_reasons(self):
+        codes = [REASON_CODES['bad_type'] | REASON_CODES['unknown_user'], REASON_CODES['duplicate_key']]
+        self.assertEqual(list(describe_reasons(codes)), ['bad_type|unknown_user', 'duplicate_key'])
+
+    def test_summary_counts_by_table_and_reason(self):
+        _, quarantine = DataValidator(self.data).validate_all()
+        summary = DataValidator.summary(quarantine)
+        self.assertIn({"Table": "products", "Reasons": "duplicate_key", "Rows": 2}, summary)
+        self.assertEqual(sum(entry["Rows"] for entry in summary), len(quarantine))
+
+if __name__ == '__main__':
+    unittest.main()
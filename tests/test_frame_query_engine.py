@@ -0,0 +1,62 @@
+import sqlite3
+import unittest
+import numpy as np
+import pandas as pd
+from controllers.sql_loader import load_sql_queries
+from services.frame_query_engine import FrameQueryEngine
+from tests.fixtures import DatabaseTestCase
+
+class TestFrameQueryEngine(DatabaseTestCase):
+
+    seed = 17
+    frame_options = {'n_invoices': 1500, 'n_users': 100, 'n_assigned': 80, 'start': '2020-04-01', 'days': 200}
+
+    def setUp(self):
+        # NULL amounts, products and changes on top of unknown events and unassigned users
+        super().setUp()
+        self.invoices.loc[self.rng.choice(len(self.invoices), 20, replace=False), 'amount'] = np.nan
+        self.invoices.loc[self.invoices['product_name'] == 'cloud-l', 'product_name'] = None
+        self.test.loc[self.rng.choice(len(self.test), 25, replace=False), 'ui_change'] = None
+        self.db_path = self.write_database('frames.db')
+
+    def assertRowsEqual(self, actual, expected, query_name):
+        self.assertEqual(len(actual), len(expected), query_name)
+        for actual_row, expected_row in zip(sorted(actual, key=str), sorted(expected, key=str)):
+            self.assertEqual(len(actual_row), len(expected_row), query_name)
+            for actual_value, expected_value in zip(actual_row, expected_row):
+                if isinstance(expected_value, float):
+                    self.assertAlmostEqual(actual_value, expected_value, delta=1e-9 * max(1.0, abs(expected_value)), msg=query_name)
+                else:
+                    # SQLite returns flags as 0/1
+                    self.assertEqual(actual_value, expected_value, query_name)
+
+    def test_every_registered_query_matches_sql(self):
+        engine = FrameQueryEngine({'invoices': self.invoices, 'products': self.products, 'test_analysis': self.test},
+                                  apply_window=False)
+        queries = load_sql_queries()
+        connection = sqlite3.connect(self.db_path)
+        try:
+            for query_name, query in queries.items():
+                self.assertTrue(engine.can_answer(query_name), query_name)
+                self.assertRowsEqual(engine.answer(query_name), connection.execute(query).fetchall(), query_name)
+        finally:
+            connection.close()
+
+    def test_summary_rows_come_in_sql_order(self):
+        engine = FrameQueryEngine({'invoices': self.invoices, 'products': self.products, 'test_analysis': self.test},
+                                  apply_window=False)
+        with sqlite3.connect(self.db_path) as connection:
+            expected = connection.execute(load_sql_queries()['product_sales_statistics']).fetchall()
+        self.assertEqual([row[0] for row in engine.answer('product_sales_statistics')], [row[0] for row in expected])
+
+    def test_analysis_window_filters_invoices(self):
+        engine = FrameQueryEngine({'invoices': self.invoices, 'products': self.products, 'test_analysis': self.test},
+                                  apply_window=True, start='2020-05-01', end='2020-09-01')
+        dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        expected = self.invoices.loc[(dates >= '2020-05-01') & (dates < '2020-09-01'), 'amount']
+        count, total = engine.answer('amount_moments')[0][:2]
+        self.assertEqual(count, expected.count())
+        self.assertAlmostEqual(total, expected.sum())
+
+if __name__ == '__main__':
+    unittest.main()
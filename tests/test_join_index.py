@@ -0,0 +1,68 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from models.join_index import AssignmentIndex, assign_group
+from services.cube_service import CubeService
+from services.eda_service import EDAService
+from tests.fixtures import DatabaseTestCase
+
+class TestAssignmentIndex(DatabaseTestCase):
+
+    seed = 13
+    frame_options = {'n_users': 150, 'n_assigned': 120}
+
+    def setUp(self):
+        super().setUp()
+        # Shuffled userids with a few NULL changes
+        self.test = self.test.sample(frac=1, random_state=13).reset_index(drop=True)
+        self.test.loc[self.rng.choice(len(self.test), 15, replace=False), 'ui_change'] = None
+        self.test.loc[self.rng.choice(len(self.test), 15, replace=False), 'desc_change'] = None
+        self.index = AssignmentIndex.build(self.test['userid'], self.test['ui_change'], self.test['desc_change'])
+
+    def test_attach_matches_left_join(self):
+        attached = self.index.attach(self.invoices)
+        expected = self.invoices.merge(self.test, on='userid', how='left')
+
+        np.testing.assert_array_equal(attached['assigned'], expected['userid'].isin(self.test['userid']))
+        self.assertEqual(list(attached['ui_change'].fillna('NULL')), list(expected['ui_change'].fillna('NULL')))
+        self.assertEqual(list(attached['desc_change'].fillna('NULL')), list(expected['desc_change'].fillna('NULL')))
+        self.assertEqual(list(attached['group_name']), list(assign_group(expected['ui_change'], expected['desc_change'])))
+
+    def test_lookup_accepts_float_userids(self):
+        positions = self.index.lookup(self.invoices['userid'].astype(float))
+        np.testing.assert_array_equal(positions, self.index.lookup(self.invoices['userid']))
+        self.assertTrue((self.index.lookup([1000, None, 'x']) == -1).all())
+
+    def test_repeated_userids_are_rejected(self):
+        with self.assertRaises(ValueError):
+            AssignmentIndex.build([1, 2, 2], ['yes', 'no', 'no'], ['no', 'no', 'no'])
+
+    def test_save_load_and_cube_from_index(self):
+        path = os.path.join(self.tmp_dir.name, 'index.npz')
+        self.index.save(path)
+        loaded = AssignmentIndex.load(path)
+        self.assertIsNone(AssignmentIndex.load(os.path.join(self.tmp_dir.name, 'missing.npz')))
+
+        db_path = self.write_database('join.db')
+        with_index = CubeService(db_path, join_index=loaded)
+        with_sql = CubeService(db_path)
+        for query_name in with_sql.query_slices:
+            expected = sorted(with_sql.answer(query_name), key=str)
+            actual = sorted(with_index.answer(query_name), key=str)
+            self.assertEqual(len(actual), len(expected), query_name)
+            for actual_row, expected_row in zip(actual, expected):
+                self.assertEqual(actual_row[:-1], expected_row[:-1], query_name)
+                self.assertAlmostEqual(actual_row[-1], expected_row[-1], places=6, msg=query_name)
+
+    def test_final_data_chunks_from_index(self):
+        db_path = self.write_database('final.db')
+        with_index = pd.concat(EDAService(join_index=self.index, db_path=db_path).iter_final_data(chunk_size=97))
+        with_sql = pd.concat(EDAService(db_path=db_path).iter_final_data(chunk_size=97))
+        self.assertEqual(list(with_index.columns), ['event_name', 'amount', 'ui_change', 'desc_change'])
+        columns = list(with_sql.columns)
+        normalized = [frame.fillna('NULL').astype(str).sort_values(columns).reset_index(drop=True) for frame in (with_index, with_sql)]
+        pd.testing.assert_frame_equal(*normalized)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import functools
+import sqlite3
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from models.join_index import AssignmentIndex
+from models.partitions import MonthPartitionedStore, apply_analysis_window, window_frame
+from services.outlier_service import OutlierService
+from services.frame_query_engine import FrameQueryEngine
+from services.sketch_service import SketchService
+from tests.fixtures import DatabaseTestCase
+
+class TestOutlierService(DatabaseTestCase):
+
+    seed = 29
+    frame_options = {'n_invoices': 5000, 'n_users': 300, 'n_assigned': 250, 'days': 1}
+
+    def setUp(self):
+        super().setUp()
+        self.invoices['amount'] = self.rng.normal(1000, 100, len(self.invoices)).round()
+        # Planted outliers far outside every segment
+        self.invoices.loc[:9, 'amount'] = 50000.0
+        self.db_path = self.write_database('outliers.db')
+
+    def read_outliers(self):
+        with sqlite3.connect(self.db_path) as connection:
+            return pd.read_sql_query("SELECT * FROM invoice_outliers", connection)
+
+    def test_flags_match_exact_statistics(self):
+        service = OutlierService(self.db_path)
+        service.build_and_store()
+        outliers = self.read_outliers()
+
+        for product, amounts in self.invoices.groupby('product_name')['amount']:
+            flagged = outliers[outliers['segment'] == f"product:{product}"]
+            z_scores = (amounts - amounts.mean()) / amounts.std()
+            self.assertEqual(flagged['is_z'].sum(), (z_scores.abs() > 3).sum())
+            # Quartiles and MAD come from the quantile sketch
+            q1, q3 = amounts.quantile([0.25, 0.75])
+            expected_iqr = ((amounts < q1 - 1.5 * (q3 - q1)) | (amounts > q3 + 1.5 * (q3 - q1))).sum()
+            self.assertLessEqual(abs(flagged['is_iqr'].sum() - expected_iqr), max(3, 0.1 * expected_iqr))
+
+        # Every planted outlier is flagged by all methods in its product segment
+        planted = outliers[(outliers['amount'] == 50000.0) & outliers['segment'].str.startswith('product:')]
+        self.assertEqual(len(planted), 10)
+        self.assertTrue((planted[['is_z', 'is_iqr', 'is_mad']] == 1).all().all())
+
+        summary = {row['Segment']: row for row in service.summary()}
+        self.assertTrue({'group:A', 'group:B', 'group:C', 'group:D', 'product:cloud-s', 'product:cloud-m'} <= set(summary))
+
+    def test_in_memory_summary_matches_the_stored_outliers(self):
+        service = OutlierService(self.db_path)
+        self.assertIsNone(service.summary())  # No outlier table yet
+        service.build_and_store()
+        engine = FrameQueryEngine({'invoices': self.invoices, 'products': self.products, 'test_analysis': self.test},
+                                  apply_window=False)
+        self.assertEqual(OutlierService(self.db_path, engine=engine).summary(), service.summary())
+
+    def test_small_chunks_write_while_scanning(self):
+        flagged_count = OutlierService(self.db_path, chunk_size=400).build_and_store()
+        outliers = self.read_outliers()
+
+        self.assertEqual(flagged_count, len(outliers))
+        # Planted rows are flagged in their product segment, and in their group segment when assigned
+        planted_assigned = self.invoices.loc[:9, 'userid'].isin(self.test['userid']).sum()
+        self.assertEqual((outliers['amount'] == 50000.0).sum(), 10 + planted_assigned)
+
+    def test_join_index_gives_the_same_flags(self):
+        OutlierService(self.db_path).build_and_store()
+        with_sql = self.read_outliers()
+        index = AssignmentIndex.build(self.test['userid'], self.test['ui_change'], self.test['desc_change'])
+        OutlierService(self.db_path, join_index=index).build_and_store()
+        with_index = self.read_outliers()
+
+        columns = ['segment', 'userid', 'amount', 'is_z', 'is_iqr', 'is_mad']
+        pd.testing.assert_frame_equal(with_sql[columns].sort_values(columns).reset_index(drop=True),
+                                      with_index[columns].sort_values(columns).reset_index(drop=True))
+
+    def test_stored_product_sketches_cover_the_window(self):
+        # Invoices over eight months, of which the window keeps June and July
+        self.invoices['datepaid'] = (pd.Timestamp('2020-03-01') + pd.to_timedelta(
+            self.rng.integers(0, 240, len(self.invoices)), unit='D')).strftime('%m/%d/%Y')
+        db_path = self.write_database('windowed.db')
+        MonthPartitionedStore(db_path).write_invoices(self.invoices)
+        windowed = window_frame(self.invoices, '2020-06-01', '2020-08-01', enabled=True)
+        SketchService(db_path).build_and_store(windowed)
+
+        window = functools.partial(apply_analysis_window, start='2020-06-01', end='2020-08-01', enabled=True)
+        with patch('services.outlier_service.apply_analysis_window', window):
+            sketches = OutlierService(db_path).segment_sketches()
+        # The product sketches stored at ingest count the same rows the scan reads
+        for product, amounts in windowed.groupby('product_name')['amount']:
+            self.assertEqual(sketches[f"product:{product}"].count, len(amounts))
+        self.assertEqual(sum(sketches[f"group:{group}"].count for group in 'ABCD'),
+                         windowed['userid'].isin(self.test['userid']).sum())
+
+if __name__ == '__main__':
+    unittest.main()
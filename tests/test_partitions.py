@@ -0,0 +1,74 @@
+import sqlite3
+import unittest
+import pandas as pd
+from models.partitions import MonthPartitionedStore, apply_analysis_window, window_frame
+from tests.fixtures import DatabaseTestCase
+
+class TestMonthPartitionedStore(DatabaseTestCase):
+
+    seed = 11
+    frame_options = {'n_invoices': 3000, 'start': '2020-03-15', 'days': 240}
+
+    def setUp(self):
+        super().setUp()
+        self.dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        self.db_path = self.write_database('partitions.db')
+        self.store = MonthPartitionedStore(self.db_path)
+        self.store.write_invoices(self.invoices)
+
+    def test_only_overlapping_partitions_are_read(self):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            partitions = MonthPartitionedStore.partitions_for(connection, '2020-05-01', '2020-09-01')
+            window_sql = MonthPartitionedStore.window_sql(connection, '2020-05-01', '2020-09-01')
+        finally:
+            connection.close()
+
+        self.assertEqual([row[0] for row in partitions],
+                         ['invoices_2020_05', 'invoices_2020_06', 'invoices_2020_07', 'invoices_2020_08'])
+        # Whole months inside the window need no row filter
+        self.assertNotIn('WHERE', window_sql)
+
+    def test_window_view_matches_pandas_filter(self):
+        in_window = (self.dates >= '2020-05-10') & (self.dates < '2020-08-20')
+        expected = self.invoices[in_window]
+
+        connection = sqlite3.connect(self.db_path)
+        try:
+            applied = apply_analysis_window(connection, '2020-05-10', '2020-08-20', enabled=True)
+            count, total = connection.execute("SELECT COUNT(*), SUM(amount) FROM invoices").fetchone()
+        finally:
+            connection.close()
+
+        self.assertTrue(applied)
+        self.assertEqual(count, len(expected))
+        self.assertAlmostEqual(total, expected['amount'].sum())
+
+        # Other connections still see the full table
+        with sqlite3.connect(self.db_path) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM invoices").fetchone()[0], 3000)
+
+    def test_window_frame_keeps_the_rows_of_the_view(self):
+        # Sketches and shards are built from these rows at ingest
+        windowed = window_frame(self.invoices, '2020-05-10', '2020-08-20', enabled=True)
+        connection = sqlite3.connect(self.db_path)
+        try:
+            apply_analysis_window(connection, '2020-05-10', '2020-08-20', enabled=True)
+            count, total = connection.execute("SELECT COUNT(*), SUM(amount) FROM invoices").fetchone()
+        finally:
+            connection.close()
+
+        self.assertEqual(len(windowed), count)
+        self.assertAlmostEqual(windowed['amount'].sum(), total)
+        self.assertIs(window_frame(self.invoices, enabled=False), self.invoices)
+
+    def test_disabled_window_is_a_no_op(self):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            self.assertFalse(apply_analysis_window(connection, enabled=False))
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM invoices").fetchone()[0], 3000)
+        finally:
+            connection.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+from PIL import Image
+from controllers.pdf_generator import PDFGenerator
+from controllers.plot_generator import PlotGenerator
+
+class TestPDFGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(3)
+        self.data = pd.DataFrame({'amount': rng.normal(100, 10, 500), 'ui_change': rng.choice(['yes', 'no'], 500)})
+        self.plot_generator = PlotGenerator(MagicMock())
+        self.plot_generator.output_dir = self.tmp_dir.name
+        self.plot_generator.max_workers = 0
+        self.plot_generator.cache_enabled = False
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def pdf_generator(self, plot_generator=None):
+        generator = PDFGenerator(plot_generator=plot_generator)
+        generator.figures = [(os.path.join(self.tmp_dir.name, name), caption)
+                             for name, caption in (('amounts.png', 'Amounts'), ('scatter.png', 'Scatter'), ('absent.png', 'Absent'))]
+        generator.pdf_output_path = os.path.join(self.tmp_dir.name, 'report.pdf')
+        generator.markdown_output_path = os.path.join(self.tmp_dir.name, 'report.md')
+        return generator
+
+    def render_plots(self):
+        self.plot_generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png')
+        self.plot_generator.plot_scatter(self.data, 'ui_change', 'amount', 'Scatter', 'scatter.png')
+
+    def assert_pdf_written(self, generator):
+        with open(generator.pdf_output_path, 'rb') as f:
+            self.assertEqual(f.read(5), b'%PDF-')
+        with open(generator.markdown_output_path, encoding='utf-8') as f:
+            markdown = f.read()
+        self.assertIn('Amounts', markdown)
+        self.assertNotIn('Absent', markdown)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['amounts.png', 'report.md', 'report.pdf', 'scatter.png'])
+
+    def test_rendered_plots_are_handed_over_in_memory(self):
+        generator = self.pdf_generator(self.plot_generator)
+        self.render_plots()
+
+        self.assertEqual(set(self.plot_generator.artifacts), {'amounts', 'scatter'})
+        with Image.open(self.plot_generator.artifacts['amounts']) as thumbnail:
+            self.assertEqual(max(thumbnail.size), generator.thumbnail_size[0])
+        with patch('controllers.pdf_generator.thumbnail_file') as thumbnail_file:
+            generator.generate_reports()
+            thumbnail_file.assert_not_called()
+        self.assert_pdf_written(generator)
+
+    def test_plots_on_disk_are_thumbnailed_once(self):
+        self.render_plots()
+        generator = self.pdf_generator()
+        self.assertEqual(self.plot_generator.artifacts, {})
+
+        buffers = generator.image_buffers()
+        self.assertEqual(set(buffers), {path for path, _ in generator.figures[:2]})
+        generator.generate_reports()
+        self.assert_pdf_written(generator)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+import pandas as pd
+from controllers.plot_aggregates import (histogram_bins, boxplot_stats, grouped_boxplot_stats, group_means,
+                                         density_grid, chunked_aggregates)
+
+class TestPlotAggregates(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.data = pd.DataFrame({
+            'amount': rng.normal(500, 100, 5000),
+            'ui_change': rng.choice(['yes', 'no'], 5000),
+            'desc_change': rng.choice(['yes', 'no'], 5000),
+            'event_name': rng.choice(['a', 'b', 'c'], 5000),
+        })
+
+    def test_histogram_bins_match_numpy(self):
+        bins = histogram_bins(self.data['amount'], bins=20)
+        counts, edges = np.histogram(self.data['amount'], bins=20)
+        np.testing.assert_array_equal(bins['counts'], counts)
+        np.testing.assert_allclose(bins['edges'], edges)
+        # The KDE is scaled to the bin counts, so both cover the same number of rows
+        step = bins['kde_x'][1] - bins['kde_x'][0]
+        area = bins['kde_y'].sum() * step / (edges[1] - edges[0])
+        self.assertAlmostEqual(area / len(self.data), 1, delta=0.01)
+
+    def test_histogram_bins_of_empty_or_constant_values(self):
+        self.assertIsNone(histogram_bins(pd.Series([np.nan, None])))
+        self.assertEqual(histogram_bins(pd.Series([3.0, 3.0]))['counts'].sum(), 2)
+
+    def test_boxplot_stats(self):
+        values = pd.Series([1, 2, 3, 4, 5, 6, 7, 8, 100], dtype=float)
+        stats = boxplot_stats(values, label='x')
+        self.assertEqual((stats['q1'], stats['med'], stats['q3']), (3.0, 5.0, 7.0))
+        self.assertEqual((stats['whislo'], stats['whishi']), (1.0, 8.0))
+        self.assertEqual(stats['label'], 'x')
+        self.assertIsNone(boxplot_stats(pd.Series([], dtype=float)))
+
+    def test_grouped_boxplot_stats_follow_appearance_order(self):
+        stats = grouped_boxplot_stats(self.data, 'event_name', 'amount')
+        self.assertEqual([entry['label'] for entry in stats], list(self.data['event_name'].unique()))
+
+    def test_group_means_with_confidence_intervals(self):
+        means = group_means(self.data, 'ui_change', 'desc_change', 'amount', confidence=0.95)
+        expected = self.data.groupby(['ui_change', 'desc_change'])['amount'].mean()
+        for row in means.itertuples():
+            self.assertAlmostEqual(row.mean, expected[(row.ui_change, row.desc_change)])
+            self.assertLess(row.ci_low, row.mean)
+            self.assertGreater(row.ci_high, row.mean)
+        self.assertEqual(means['count'].sum(), len(self.data))
+
+    def test_single_row_group_has_no_interval(self):
+        frame = pd.DataFrame({'x': ['a', 'a', 'b'], 'hue': ['h', 'h', 'h'], 'amount': [1.0, 3.0, 5.0]})
+        means = group_means(frame, 'x', 'hue', 'amount').set_index('x')
+        self.assertTrue(np.isnan(means.loc['b', 'ci_low']))
+        self.assertFalse(np.isnan(means.loc['a', 'ci_low']))
+
+    def test_density_grid_counts_every_row(self):
+        categorical = density_grid(self.data, 'ui_change', 'amount', bins=50)
+        self.assertEqual(categorical['counts'].shape, (2, 50))
+        self.assertEqual(categorical['counts'].sum(), len(self.data))
+        self.assertEqual(sorted(categorical['x_labels']), ['no', 'yes'])
+
+        numeric = density_grid(self.data.assign(x=self.data['amount'] * 2), 'x', 'amount', bins=30)
+        self.assertEqual(numeric['counts'].shape, (30, 30))
+        self.assertEqual(numeric['counts'].sum(), len(self.data))
+        self.assertIsNone(numeric['x_labels'])
+
+    def test_chunked_aggregates_match_the_whole_frame(self):
+        chunks = lambda: (self.data.iloc[start:start + 700] for start in range(0, len(self.data), 700))
+        aggregates = chunked_aggregates(chunks, 'ui_change', 'desc_change', 'event_name', 'amount')
+
+        expected = group_means(self.data, 'ui_change', 'desc_change', 'amount')
+        pd.testing.assert_frame_equal(aggregates['means'], expected, check_dtype=False)
+        grid = density_grid(self.data, 'ui_change', 'amount')
+        np.testing.assert_array_equal(aggregates['grid']['counts'], grid['counts'])
+        self.assertEqual(aggregates['grid']['x_labels'], grid['x_labels'])
+        # Box-plot quantiles come from a sketch per event
+        for entry, exact in zip(aggregates['stats'], grouped_boxplot_stats(self.data, 'event_name', 'amount')):
+            self.assertEqual(entry['label'], exact['label'])
+            self.assertAlmostEqual(entry['med'], exact['med'], delta=5)
+        self.assertIsNone(chunked_aggregates(lambda: iter([self.data.iloc[:0]]), 'ui_change', 'desc_change', 'event_name', 'amount'))
+
+if __name__ == '__main__':
+    unittest.main()
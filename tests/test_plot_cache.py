@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+from controllers.plot_cache import PlotCache, renderer_sources
+from controllers.plot_generator import PlotGenerator
+
+class TestPlotCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data = pd.DataFrame({'amount': np.arange(50, dtype=float), 'ui_change': ['yes', 'no'] * 25})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def generator(self):
+        generator = PlotGenerator(MagicMock())
+        generator.output_dir = self.tmp_dir.name
+        generator.max_workers = 0
+        return generator
+
+    def test_key_depends_on_data_and_parameters(self):
+        cache = PlotCache(self.tmp_dir.name, 'cache.json')
+        payload = {'values': self.data['amount'], 'column': 'amount', 'title': 'Amounts'}
+        key = cache.key('histogram', payload)
+
+        self.assertEqual(key, cache.key('histogram', {'title': 'Amounts', 'column': 'amount', 'values': self.data['amount'].copy()}))
+        self.assertNotEqual(key, cache.key('histogram', dict(payload, values=self.data['amount'] + 1)))
+        self.assertNotEqual(key, cache.key('histogram', dict(payload, title='Other')))
+        self.assertNotEqual(key, cache.key('boxplot', payload))
+
+    def test_key_depends_on_renderer_code(self):
+        cache = PlotCache(self.tmp_dir.name, 'cache.json')
+        payload = {'values': self.data['amount'], 'column': 'amount', 'title': 'Amounts'}
+        key = cache.key('histogram', payload)
+        with patch('controllers.plot_cache.renderer_sources', return_value={'histogram': 'def changed(): pass'}):
+            self.assertNotEqual(key, cache.key('histogram', payload))
+
+    def test_renderer_sources_cover_every_kind(self):
+        from controllers.plot_renderers import RENDERERS
+        sources = renderer_sources()
+        self.assertEqual(set(sources), set(RENDERERS))
+        self.assertIn('def render_boxplot', sources['boxplot'])
+        self.assertIn('def render_job', sources['boxplot'])
+
+    def test_unchanged_plot_is_reused(self):
+        generator = self.generator()
+        first = generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png')
+        generator.close()
+        self.assertFalse(first.get('cached'))
+
+        # A new run reads the manifest written by the first one
+        generator = self.generator()
+        with patch('controllers.plot_renderers.render_job') as render_job:
+            second = generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png')
+            render_job.assert_not_called()
+        self.assertTrue(second['cached'])
+        self.assertTrue(generator.timings['amounts']['cached'])
+
+    def test_changed_or_missing_plot_is_rendered(self):
+        generator = self.generator()
+        generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png')
+
+        changed = generator.plot_histogram(self.data.assign(amount=self.data['amount'] * 2), 'amount', 'Amounts', 'amounts.png')
+        self.assertFalse(changed.get('cached'))
+
+        os.remove(os.path.join(self.tmp_dir.name, 'amounts.png'))
+        self.assertFalse(generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png').get('cached'))
+
+    def test_cache_can_be_disabled(self):
+        generator = self.generator()
+        generator.cache_enabled = False
+        generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png')
+        self.assertFalse(generator.plot_histogram(self.data, 'amount', 'Amounts', 'amounts.png').get('cached'))
+        generator.close()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, 'plot_cache.json')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+import pandas as pd
+from controllers.plot_aggregates import histogram_bins
+from controllers.plot_renderers import render_job, RENDERERS
+from controllers.plot_generator import PlotGenerator
+
+class TestPlotRenderers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(5)
+        self.data = pd.DataFrame({
+            'amount': rng.integers(100, 10000, 200).astype(float),
+            'ui_change': rng.choice(['yes', 'no'], 200),
+            'desc_change': rng.choice(['yes', 'no'], 200),
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_render_job_writes_png(self):
+        payload = dict(histogram_bins(self.data['amount']), column='amount', title='Amounts')
+        result = render_job('histogram', payload, self.path('histogram.png'))
+        self.assertIsNone(result['error'])
+        self.assertGreater(result['seconds'], 0)
+        with open(result['path'], 'rb') as f:
+            self.assertEqual(f.read(8), b'\x89PNG\r\n\x1a\n')
+
+    def test_render_job_returns_errors(self):
+        result = render_job('histogram', {'column': 'amount', 'title': 'Amounts'}, self.path('broken.png'))
+        self.assertIn('KeyError', result['error'])
+        self.assertFalse(os.path.exists(self.path('broken.png')))
+        self.assertIn('KeyError', render_job('no_such_kind', {}, self.path('unknown.png'))['error'])
+
+    def test_every_kind_has_a_renderer(self):
+        for kind, (renderer, _) in RENDERERS.items():
+            self.assertTrue(callable(renderer), kind)
+
+    def test_plot_generator_renders_in_worker_processes(self):
+        generator = PlotGenerator(MagicMock())
+        generator.output_dir = self.tmp_dir.name
+        generator.max_workers = 2
+        generator.plots = {
+            'scatter': (lambda: generator.plot_scatter(self.data, 'ui_change', 'amount', 'Scatter', 'scatter.png'), []),
+            'average': (lambda: generator.plot_average_sales_by_group(self.data, 'average.png'), []),
+            'broken': (lambda: generator.plot_histogram(self.data, 'missing', 'Broken', 'broken.png'), []),
+        }
+        result = generator.generate_plots()
+
+        self.assertTrue(os.path.exists(self.path('scatter.png')))
+        self.assertTrue(os.path.exists(self.path('average.png')))
+        self.assertEqual(set(result['timings']), {'scatter', 'average'})
+        self.assertEqual(set(result['errors']), {'broken'})
+        self.assertIsNone(generator._pool)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from controllers.report_cache import ReportCache
+from controllers.report_generator import ReportGenerator
+from services.analysis_session import LazyResults
+
+class TestReportCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'report.md')
+        self.cache_path = os.path.join(self.tmp_dir.name, 'cache.pkl')
+        self.fingerprints = {'invoices': 'i1', 'test_analysis': 't1'}
+        self.reads = []
+        # Stand-in for the repository: the analysis code the cache keys hash
+        self.source_root = os.path.join(self.tmp_dir.name, 'repo')
+        os.makedirs(os.path.join(self.source_root, 'services'))
+        self.write_service('def perform_t_tests(): return 1\n')
+
+    def write_service(self, source):
+        with open(os.path.join(self.source_root, 'services', 't_test.py'), 'w', encoding='utf-8') as f:
+            f.write(source)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def generator(self):
+        """A report generator over a mocked session that counts the analyses it reads"""
+        def read(name, value):
+            return lambda: self.reads.append(name) or value
+
+        session = MagicMock()
+        session.lazy_summary.return_value = {
+            'eda_results': LazyResults({'product_sales_summary': read('product_sales_summary', [{'Product': 'cloud-s', 'Total Sales': 1.0}])}),
+            'test_analysis_results': {},
+        }
+        session.get.side_effect = lambda name: read(name, {'A-B': {'t_statistic': np.float64(1.5), 'p_value': 0.1}})()
+        # The t-tests read the assignments, the product summary only the invoices
+        session.input_fingerprint.side_effect = lambda inputs: (
+            self.fingerprints['invoices'] + (self.fingerprints['test_analysis'] if 't_tests' in inputs else ''))
+        generator = ReportGenerator(session)
+        generator.cache = ReportCache(self.cache_path, source_root=self.source_root)
+        return generator
+
+    def save(self):
+        self.reads = []
+        generator = self.generator()
+        generator.save_report(file_path=self.file_path, sections=['product_sales_summary', 't_tests'], formats=('md',), tables_dir=None)
+        with open(self.file_path, encoding='utf-8') as f:
+            return f.read(), generator
+
+    def test_unchanged_sections_are_reused(self):
+        first, _ = self.save()
+        self.assertEqual(set(self.reads), {'product_sales_summary', 't_tests'})
+
+        second, generator = self.save()
+        self.assertEqual(self.reads, [])
+        self.assertEqual(second, first)
+        self.assertEqual(generator.section_inputs(['product_sales_summary', 't_tests']), [])
+
+    def test_only_changed_sections_are_rebuilt(self):
+        first, _ = self.save()
+        self.fingerprints['test_analysis'] = 't2'
+
+        self.assertEqual(self.generator().section_inputs(['product_sales_summary', 't_tests']), ['t_tests'])
+        second, _ = self.save()
+        self.assertEqual(set(self.reads), {'t_tests'})
+        self.assertEqual(second, first)
+
+    def test_changed_analysis_code_rebuilds_the_sections(self):
+        first, _ = self.save()
+        self.write_service('def perform_t_tests(): return 2\n')
+
+        self.assertEqual(self.generator().section_inputs(['product_sales_summary', 't_tests']),
+                         ['product_sales_summary', 't_tests'])
+        second, _ = self.save()
+        self.assertEqual(set(self.reads), {'product_sales_summary', 't_tests'})
+        self.assertEqual(second, first)
+
+    def test_sections_missing_their_data_are_not_cached(self):
+        for summary, inputs in ((None, ['outlier_summary']), ([{'Segment': 'group:A', 'Outliers': 1, 'Z-Score': 1, 'IQR': 0, 'MAD': 1}], [])):
+            generator = self.generator()
+            generator.session.results = {}
+            generator.session.get.side_effect = lambda name: generator.session.results.setdefault(name, summary)
+            generator.save_report(file_path=self.file_path, sections=['outliers'], formats=('md',), tables_dir=None)
+            # Without the outlier table the section is rebuilt on the next run; with it, it is reused
+            self.assertEqual(self.generator().section_inputs(['outliers']), inputs)
+
+    def test_unknown_inputs_are_never_cached(self):
+        cache = ReportCache(self.cache_path)
+        self.assertIsNone(cache.key('t_tests', ReportGenerator._period_columns, None))
+        cache.store('t_tests', None, [])
+        cache.save()
+        self.assertFalse(os.path.exists(self.cache_path))
+
+if __name__ == '__main__':
+    unittest.main()
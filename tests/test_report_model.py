@@ -0,0 +1,111 @@
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from controllers.report_model import (Report, Part, Section, Table, Fields, Text, Figure, render_report,
+                                      MarkdownRenderer, HtmlRenderer, JsonRenderer, ColumnarExporter)
+from controllers.report_generator import ReportGenerator
+
+class TestReportModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.rows_read = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def rows(self):
+        for product, sales in (('cloud-s', np.float64(10.5)), ('cloud-<m>', np.nan)):
+            self.rows_read += 1
+            yield {'Product': product, 'Total Sales': sales}
+
+    def report(self):
+        return Report("Summary Report", [
+            Part("eda", "EDA Results", [
+                Section("products", "Product Sales", [Table("products", ["Product", "Total Sales"], self.rows(),
+                                                            "- Product: {Product}, Total Sales: {Total Sales}", export=True)]),
+                Section("stats", "Statistics", [Fields("stats", [("Mean", np.int64(3), ""), ("Change", 1.5, "%")])]),
+            ]),
+            Part("other", "Other", [Section("empty", None, [Text("No data available."), Figure("plot.png", "A plot")])]),
+        ])
+
+    def render(self, exporter=None):
+        markdown, page, document = io.StringIO(), io.StringIO(), io.StringIO()
+        renderers = [MarkdownRenderer(markdown), HtmlRenderer(page), JsonRenderer(document)]
+        render_report(self.report(), renderers + ([exporter] if exporter else []))
+        return markdown.getvalue(), page.getvalue(), document.getvalue()
+
+    def test_every_format_in_one_pass(self):
+        exporter = ColumnarExporter(self.tmp_dir.name, 'csv')
+        markdown, page, document = self.render(exporter)
+
+        # Generator rows are read once and reach every renderer
+        self.assertEqual(self.rows_read, 2)
+        self.assertEqual(markdown, "# Summary Report\n\n## EDA Results\n### Product Sales:\n"
+                                   "- Product: cloud-s, Total Sales: 10.5\n- Product: cloud-<m>, Total Sales: nan\n"
+                                   "\n### Statistics:\n- Mean: 3\n- Change: 1.5%\n"
+                                   "\n## Other\nNo data available.\n![A plot](plot.png)\nA plot\n\n")
+        self.assertIn("<td>cloud-&lt;m&gt;</td>", page)
+        self.assertTrue(page.rstrip().endswith("</html>"))
+        with open(exporter.paths['products'], encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines(), ["Product,Total Sales", "cloud-s,10.5", "cloud-<m>,"])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_parquet_schema_comes_from_the_declared_dtypes(self):
+        import pyarrow.parquet as pq
+        # The first batch has an all-None column and int sales; later batches hold text and floats
+        rows = [{'Product': None, 'Total Sales': 1}, {'Product': None, 'Total Sales': 2},
+                {'Product': 'cloud-s', 'Total Sales': 2.5}, {'Product': 'cloud-m', 'Total Sales': np.nan}]
+        table = Table("sales", ["Product", "Total Sales"], rows, "{Product}", export=True,
+                      dtypes={"Product": "string", "Total Sales": "float"})
+        exporter = ColumnarExporter(self.tmp_dir.name, 'parquet', batch_size=2)
+        exporter.begin_table(table)
+        for row in rows:
+            exporter.table_row(table, row)
+        exporter.end_table(table)
+
+        written = pq.read_table(exporter.paths['sales'])
+        self.assertEqual([str(field.type) for field in written.schema], ['string', 'double'])
+        self.assertEqual(written.column('Total Sales').to_pylist(), [1.0, 2.0, 2.5, None])
+
+        empty = Table("empty", ["Event ID"], [], "{Event ID}", export=True, dtypes={"Event ID": "int"})
+        exporter.begin_table(empty)
+        exporter.end_table(empty)
+        self.assertEqual(pq.read_table(exporter.paths['empty']).schema.names, ['Event ID'])
+
+    def test_json_is_a_valid_document(self):
+        document = json.loads(self.render()[2])
+        self.assertEqual([part['key'] for part in document['parts']], ['eda', 'other'])
+        table, = document['parts'][0]['sections'][0]['blocks']
+        self.assertEqual(table['rows'], [{'Product': 'cloud-s', 'Total Sales': 10.5}, {'Product': 'cloud-<m>', 'Total Sales': None}])
+        self.assertEqual(document['parts'][0]['sections'][1]['blocks'][0]['items'], {'Mean': 3, 'Change': 1.5})
+        self.assertEqual([block['type'] for block in document['parts'][1]['sections'][0]['blocks']], ['text', 'figure'])
+
+    def test_report_generator_writes_every_format(self):
+        session = MagicMock()
+        session.lazy_summary.return_value = {'eda_results': {'product_sales_summary': [{'Product': 'cloud-s', 'Total Sales': 1.0}]},
+                                             'test_analysis_results': {}}
+        generator = ReportGenerator(session)
+        generator.cache = None
+        file_path = os.path.join(self.tmp_dir.name, 'report.md')
+        tables_dir = os.path.join(self.tmp_dir.name, 'tables')
+        generator.save_report(file_path=file_path, sections=['product_sales_summary', 'ui_desc_changes'], tables_dir=tables_dir)
+
+        with open(file_path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), "# Summary Report\n\n## Exploratory Data Analysis (EDA) Results\n"
+                                       "### Product Sales Summary:\n- Product: cloud-s, Total Sales: 1.0\n"
+                                       "\n## Test Analysis Results\n### UI and Description Changes:\n"
+                                       "No UI and Description changes data available.\n")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'report.html')))
+        with open(os.path.join(self.tmp_dir.name, 'report.json'), encoding='utf-8') as f:
+            self.assertEqual(len(json.load(f)['parts']), 2)
+        # Parquet with pyarrow installed, CSV otherwise
+        self.assertEqual([os.path.splitext(name)[0] for name in os.listdir(tables_dir)], ['product_sales_summary'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock
+from controllers.report_pipeline import build_report_pipeline, pipeline_targets
+from services.analysis_session import AnalysisSession
+
+class TestReportPipeline(unittest.TestCase):
+
+    def setUp(self):
+        # Session over mocked services, with the analyses PlotGenerator normally registers
+        self.session = AnalysisSession(MagicMock(), MagicMock(), MagicMock())
+        for name in ('final_data_aggregates', 'amount_sketch', 'z_score_sketch', 'daily_rollup'):
+            self.session.register(name, MagicMock(return_value=None))
+
+        self.report_generator = MagicMock()
+        self.report_generator.section_inputs.side_effect = lambda sections: ['t_tests'] if sections == ['t_tests'] else ['eda_report']
+        self.monthly_plot = MagicMock()
+        self.histogram_plot = MagicMock()
+        self.plot_generator = MagicMock()
+        self.plot_generator.plots = {
+            'monthly_trend': (self.monthly_plot, ['daily_rollup']),
+            'sales_amount_histogram': (self.histogram_plot, ['amount_sketch', 'final_data_aggregates']),
+        }
+
+    def test_selective_run_only_evaluates_needed_analyses(self):
+        scheduler = build_report_pipeline(self.session, self.report_generator, self.plot_generator, sections=['t_tests'])
+        scheduler.run(pipeline_targets(sections=['t_tests'], plots=['monthly_trend']))
+
+        self.assertEqual(set(self.session.executions), {'t_tests', 'daily_rollup'})
+        self.report_generator.save_report.assert_called_once_with(sections=['t_tests'])
+        self.monthly_plot.assert_called_once()
+        self.histogram_plot.assert_not_called()
+
+    def test_full_run_produces_every_output(self):
+        scheduler = build_report_pipeline(self.session, self.report_generator, self.plot_generator)
+        scheduler.run(pipeline_targets())
+
+        self.report_generator.save_report.assert_called_once_with(sections=None)
+        self.monthly_plot.assert_called_once()
+        self.histogram_plot.assert_called_once()
+        self.assertTrue(all(count == 1 for count in self.session.executions.values()))
+
+    def test_amount_plots_from_the_sketch_skip_final_data(self):
+        from controllers.plot_generator import PlotGenerator
+        from services.sketch_service import AmountSketch
+        plot_generator = PlotGenerator(self.session)
+        sketch = AmountSketch()
+        sketch.update([100.0, 250.0, 900.0])
+        self.session.register('amount_sketch', MagicMock(return_value=sketch))
+        plot_generator.render = MagicMock()
+        scheduler = build_report_pipeline(self.session, self.report_generator, plot_generator)
+        scheduler.run(pipeline_targets(plots=['sales_amount_histogram', 'sales_amount_boxplot']))
+
+        self.assertEqual(set(self.session.executions), {'amount_sketch'})
+        self.assertEqual(plot_generator.render.call_count, 2)
+
+    def test_pipeline_targets(self):
+        self.assertIsNone(pipeline_targets())
+        self.assertEqual(pipeline_targets(plots=['monthly_trend']), ['plot:monthly_trend'])
+        self.assertEqual(pipeline_targets(sections=['t_tests']), ['summary_report'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from services.rollup_service import DailyRollupService
+from tests.fixtures import DatabaseTestCase
+
+class TestDailyRollupService(DatabaseTestCase):
+
+    seed = 21
+    frame_options = {'n_invoices': 3000, 'start': '2020-04-20', 'days': 150}
+
+    def setUp(self):
+        # Users 100..119 have no assignment
+        super().setUp()
+        self.rollup = DailyRollupService.build_rollup(self.invoices, self.test)
+        self.db_path = os.path.join(self.tmp_dir.name, 'test.db')
+
+    def test_rollup_totals_match_invoices(self):
+        self.assertEqual(self.rollup['purchases'].sum(), len(self.invoices))
+        self.assertAlmostEqual(self.rollup['amount_sum'].sum(), self.invoices['amount'].sum())
+        self.assertLess(len(self.rollup), len(self.invoices))
+        unassigned = self.rollup.loc[self.rollup['group_name'] == 'Unassigned', 'purchases'].sum()
+        self.assertEqual(unassigned, (self.invoices['userid'] >= 100).sum())
+
+    def test_monthly_trend_matches_invoice_scan(self):
+        trend = DailyRollupService.trend(self.rollup, 'M')
+        dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        expected = self.invoices.groupby(dates.dt.to_period('M'))['amount']
+
+        np.testing.assert_array_equal(trend['purchases'].to_numpy(), expected.size().to_numpy())
+        np.testing.assert_allclose(trend['amount_mean'].to_numpy(), expected.mean().to_numpy())
+        np.testing.assert_allclose(trend['amount_std'].to_numpy(), expected.std(ddof=0).to_numpy())
+
+    def test_weekly_trend_by_product(self):
+        trend = DailyRollupService.trend(self.rollup, 'W', by=['product_name'])
+        dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        expected = self.invoices.groupby([dates.dt.to_period('W'), 'product_name']).size()
+        np.testing.assert_array_equal(trend['purchases'].to_numpy(), expected.to_numpy())
+
+    def test_save_and_load_with_window(self):
+        service = DailyRollupService(self.db_path)
+        service.build_and_store(self.invoices, self.test)
+
+        loaded = service.load_rollup(apply_window=False)
+        self.assertEqual(loaded['purchases'].sum(), len(self.invoices))
+
+        windowed = service.load_rollup('2020-05-01', '2020-06-01', apply_window=True)
+        dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        self.assertEqual(windowed['purchases'].sum(), ((dates >= '2020-05-01') & (dates < '2020-06-01')).sum())
+
+    def test_load_without_rollup_returns_none(self):
+        self.assertIsNone(DailyRollupService(self.db_path).load_rollup())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sqlite3
+import unittest
+import pandas as pd
+from services.cube_service import CubeService
+from services.eda_service import EDAService
+from services.sample_service import SampleService, StratifiedSample
+from tests.fixtures import DatabaseTestCase
+
+class TestSampleService(DatabaseTestCase):
+
+    seed = 23
+    frame_options = {'n_invoices': 8000, 'n_users': 500, 'n_assigned': 450}
+
+    def setUp(self):
+        super().setUp()
+        # Normal amounts and a rare product, so the smallest strata are sampled thinly
+        self.invoices['amount'] = self.rng.normal(5000, 1500, len(self.invoices)).round()
+        self.invoices['product_name'] = self.rng.choice(['cloud-s', 'cloud-m', 'cloud-l'], len(self.invoices), p=[0.6, 0.3, 0.1])
+        self.db_path = self.write_database('sample.db')
+        self.service = SampleService(self.db_path)
+        self.cube = CubeService(self.db_path)
+
+    def test_full_sample_is_exact(self):
+        with sqlite3.connect(self.db_path) as connection:
+            frame = pd.read_sql_query(self.service.queries['cube_base_query'], connection)
+        sample, strata = self.service.draw_sample(frame, fraction=1.0)
+        self.service.save_sample(sample, strata)
+        estimator = self.service.load_sample()
+
+        for query_name in estimator.query_slices:
+            for (*keys, estimate, ci_low, ci_high), expected in zip(estimator.answer(query_name), self.cube.answer(query_name)):
+                self.assertEqual(tuple(keys), expected[:-1], query_name)
+                self.assertAlmostEqual(estimate, expected[-1], delta=1e-6 * abs(expected[-1]), msg=query_name)
+                self.assertAlmostEqual(ci_low, ci_high, delta=1e-6 * abs(expected[-1]), msg=query_name)
+
+    def test_intervals_cover_exact_answers(self):
+        with sqlite3.connect(self.db_path) as connection:
+            frame = pd.read_sql_query(self.service.queries['cube_base_query'], connection)
+        expected = {query_name: self.cube.answer(query_name) for query_name in self.cube.query_slices}
+
+        covered, total = 0, 0
+        for seed in range(20):
+            estimator = StratifiedSample(*self.service.draw_sample(frame, seed=seed))
+            self.assertLess(len(estimator), 2000)
+            for query_name, rows in expected.items():
+                for (*keys, estimate, ci_low, ci_high), expected_row in zip(estimator.answer(query_name), rows):
+                    self.assertEqual(tuple(keys), expected_row[:-1], query_name)
+                    covered += ci_low <= expected_row[-1] <= ci_high
+                    total += 1
+        # 95% intervals, with some slack for the normal approximation on small strata
+        self.assertGreater(covered / total, 0.88)
+
+    def test_eda_service_returns_intervals_in_approximate_mode(self):
+        self.service.build_and_store()
+        summary = EDAService(sample=self.service.load_sample()).product_sales_summary()
+
+        self.assertEqual([entry['Product'] for entry in summary], ['cloud-l', 'cloud-m', 'cloud-s'])
+        for entry in summary:
+            self.assertTrue(entry['CI Low'] <= entry['Total Sales'] <= entry['CI High'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import unittest
+import pandas as pd
+from scipy.stats import ttest_ind
+from models.partitions import apply_analysis_window
+from models.shards import ShardedStore, shard_of
+from services.cube_service import CubeService
+from services.shard_query_service import ShardedCubeService
+from services.t_test import TTestService, GROUP_CONDITIONS
+from tests.fixtures import DatabaseTestCase
+
+class TestShardedStore(DatabaseTestCase):
+
+    seed = 5
+    frame_options = {'n_invoices': 3000, 'n_users': 200, 'n_assigned': 180}
+
+    def setUp(self):
+        super().setUp()
+        # Float userids, as read back from CSV with missing values
+        self.invoices['userid'] = self.invoices['userid'].astype(float)
+        self.db_path = self.write_database('single.db')
+        self.shard_dir = os.path.join(self.tmp_dir.name, 'shards')
+        ShardedStore(3, self.shard_dir).write(self.invoices, self.test, self.products)
+
+    def test_shard_of_is_stable_across_dtypes(self):
+        self.assertEqual(list(shard_of([1, 2, 3], 4)), list(shard_of([1.0, 2.0, 3.0], 4)))
+
+    def test_shards_are_month_partitioned_for_the_window(self):
+        dates = pd.to_datetime(self.invoices['datepaid'], format='%m/%d/%Y')
+        expected = ((dates >= '2020-06-10') & (dates < '2020-07-20')).sum()
+        count = 0
+        for path in ShardedStore(3, self.shard_dir).shard_paths():
+            connection = sqlite3.connect(path)
+            try:
+                self.assertTrue(apply_analysis_window(connection, '2020-06-10', '2020-07-20', enabled=True))
+                count += connection.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+            finally:
+                connection.close()
+        self.assertEqual(count, expected)
+
+    def test_merged_shard_cube_matches_single_database(self):
+        single = CubeService(self.db_path)
+        sharded = ShardedCubeService(3, self.shard_dir, max_workers=2)
+        for query_name in single.query_slices:
+            expected = sorted(single.answer(query_name), key=str)
+            actual = sorted(sharded.answer(query_name), key=str)
+
+            self.assertEqual(len(actual), len(expected), query_name)
+            for actual_row, expected_row in zip(actual, expected):
+                self.assertEqual(actual_row[:-1], expected_row[:-1], query_name)
+                self.assertAlmostEqual(actual_row[-1], expected_row[-1], places=6, msg=query_name)
+
+    def test_t_tests_from_moments_match_row_level_tests(self):
+        service = TTestService(cube=ShardedCubeService(3, self.shard_dir, max_workers=2))
+        results = service.perform_t_tests_for_all_groups()
+
+        joined = self.invoices.merge(self.test, on='userid')
+        amounts = {name: joined.loc[condition(joined['ui_change'], joined['desc_change']), 'amount']
+                   for name, condition in GROUP_CONDITIONS.items()}
+        expected = ttest_ind(amounts['A'], amounts['D'], equal_var=False)
+        self.assertAlmostEqual(results['A-D']['t_statistic'], expected.statistic, places=8)
+        self.assertAlmostEqual(results['A-D']['p_value'], expected.pvalue, places=8)
+        self.assertEqual(len(results), 6)
+
+if __name__ == '__main__':
+    unittest.main()
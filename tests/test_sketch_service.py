@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from services.sketch_service import AmountSketch, FixedBinHistogram, QuantileSketch, SketchService, histogram_edges
+
+class TestSketchService(unittest.TestCase):
+
+    def setUp(self):
+        # Log-normal amounts look like invoice amounts: skewed with a long right tail
+        rng = np.random.default_rng(42)
+        self.values = rng.lognormal(10, 1, 50000)
+        self.edges = np.linspace(self.values.min(), self.values.max(), 21)
+
+    def test_histogram_matches_numpy(self):
+        histogram = FixedBinHistogram(self.edges)
+        for chunk in np.array_split(self.values, 7):
+            histogram.update(chunk)
+
+        expected, _ = np.histogram(self.values, bins=self.edges)
+        np.testing.assert_array_equal(histogram.counts, expected)
+
+    def test_histogram_merge_rejects_different_edges(self):
+        with self.assertRaises(ValueError):
+            FixedBinHistogram(self.edges).merge(FixedBinHistogram(self.edges * 2))
+
+    def test_quantile_sketch_is_accurate_and_bounded(self):
+        sketch = QuantileSketch(k=256)
+        for chunk in np.array_split(self.values, 50):
+            sketch.update(chunk)
+
+        # Rank error should stay within a couple of percent
+        for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+            estimate = sketch.quantile(q)
+            rank = np.mean(self.values <= estimate)
+            self.assertAlmostEqual(rank, q, delta=0.02)
+        self.assertLess(sum(len(level) for level in sketch.levels), 256 * len(sketch.levels))
+        self.assertEqual(sketch.count, len(self.values))
+
+    def test_merged_shards_match_single_sketch(self):
+        whole = AmountSketch(self.edges)
+        whole.update(self.values)
+
+        merged = AmountSketch(self.edges)
+        for shard in np.array_split(self.values, 4):
+            partial = AmountSketch(self.edges)
+            partial.update(shard)
+            merged.merge(partial)
+
+        self.assertEqual(merged.count, whole.count)
+        np.testing.assert_array_equal(merged.histogram.counts, whole.histogram.counts)
+        self.assertAlmostEqual(merged.mean(), np.mean(self.values), places=6)
+        self.assertAlmostEqual(merged.std(), np.std(self.values, ddof=1), delta=1e-6 * np.std(self.values))
+        self.assertAlmostEqual(np.mean(self.values <= merged.median()), 0.5, delta=0.02)
+
+    def test_independently_built_sketches_merge(self):
+        # Shards with different ranges still share the configured bin edges
+        low, high = AmountSketch(), AmountSketch()
+        low.update(self.values[self.values < np.median(self.values)])
+        high.update(self.values[self.values >= np.median(self.values)])
+
+        merged = low.merge(high)
+
+        np.testing.assert_array_equal(merged.histogram.edges, histogram_edges())
+        self.assertEqual(merged.histogram.counts.sum(), len(self.values))
+        counts, edges = merged.histogram.populated()
+        self.assertLessEqual(edges[0], self.values.min())
+        self.assertGreaterEqual(edges[-1], self.values.max())
+        self.assertEqual(counts.sum(), len(self.values))
+
+    def test_boxplot_stats(self):
+        sketch = AmountSketch(self.edges)
+        sketch.update(self.values)
+
+        stats = sketch.boxplot_stats()
+
+        self.assertLessEqual(stats['whislo'], stats['q1'])
+        self.assertLessEqual(stats['q1'], stats['med'])
+        self.assertLessEqual(stats['med'], stats['q3'])
+        self.assertLessEqual(stats['q3'], stats['whishi'])
+        self.assertLessEqual(stats['whishi'], stats['q3'] + 1.5 * (stats['q3'] - stats['q1']))
+
+    def test_build_and_store_round_trip(self):
+        invoices = pd.DataFrame({
+            'amount': self.values[:1000],
+            'product_name': np.where(np.arange(1000) % 2, 'cloud-s', 'cloud-m')
+        })
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            service = SketchService(os.path.join(tmp_dir, 'sketch.db'))
+            sketches = service.build_and_store(invoices)
+
+            loaded = service.load_sketch('amount')
+            product = service.load_sketch('product:cloud-s')
+
+            self.assertEqual(set(sketches), {'amount', 'product:cloud-s', 'product:cloud-m'})
+            self.assertEqual(loaded.count, 1000)
+            self.assertEqual(product.count, 500)
+            self.assertEqual(loaded.median(), sketches['amount'].median())
+            self.assertIsNone(service.load_sketch('missing'))
+
+            # A new ingest replaces every sketch of the previous one
+            service.build_and_store(invoices.assign(product_name='cloud-l'))
+            self.assertEqual(set(service.load_sketches()), {'amount', 'product:cloud-l'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from config.run_config import RunConfig
+from controllers.stage_manifest import StageManifest, source_digest
+import main
+
+class TestStageManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp_dir.name, 'manifest.json')
+        self.output = os.path.join(self.tmp_dir.name, 'report.md')
+        self.write(self.output, 'report')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def write(path, text):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_fresh_until_inputs_or_outputs_change(self):
+        manifest = StageManifest(self.manifest_path)
+        manifest.record('report', {'tables': 't1'}, [self.output])
+        self.assertTrue(manifest.is_fresh('report', {'tables': 't1'}))
+        self.assertFalse(manifest.is_fresh('report', {'tables': 't2'}))
+        self.assertFalse(manifest.is_fresh('plot', {'tables': 't1'}))
+
+        self.write(self.output, 'edited report')
+        self.assertFalse(manifest.is_fresh('report', {'tables': 't1'}))
+        os.remove(self.output)
+        self.assertFalse(manifest.is_fresh('report', {'tables': 't1'}))
+
+    def test_manifest_is_saved_and_reloaded(self):
+        manifest = StageManifest(self.manifest_path)
+        manifest.record('report', {'tables': 't1'}, [self.output])
+        manifest.save()
+
+        reloaded = StageManifest(self.manifest_path)
+        self.assertTrue(reloaded.is_fresh('report', {'tables': 't1'}))
+        self.assertEqual(reloaded.outputs('report'), [self.output])
+
+    def test_untouched_files_are_not_read_again(self):
+        manifest = StageManifest(self.manifest_path)
+        with patch('controllers.stage_manifest.file_digest', return_value='abc') as file_digest:
+            self.assertEqual(manifest.digest(self.output), 'abc')
+            self.assertEqual(manifest.digest(self.output), 'abc')
+        file_digest.assert_called_once_with(self.output)
+        self.assertIsNone(manifest.digest(os.path.join(self.tmp_dir.name, 'missing.csv')))
+
+    def test_source_digest_follows_contents(self):
+        self.write(os.path.join(self.tmp_dir.name, 'a.py'), 'x = 1')
+        before = source_digest(['*.py'], self.tmp_dir.name)
+        self.assertEqual(source_digest(['*.py'], self.tmp_dir.name), before)
+        self.write(os.path.join(self.tmp_dir.name, 'a.py'), 'x = 2')
+        self.assertNotEqual(source_digest(['*.py'], self.tmp_dir.name), before)
+
+
+class TestPipelineRun(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp_dir.name, 'manifest.json')
+        self.inputs = {'data': 'd1', 'tables': 't1'}
+        self.ran = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_stages(self, stages, force=False):
+        """Run stages whose work is stubbed out, returning the stages that actually ran"""
+        self.ran = []
+        run = main.PipelineRun(RunConfig(force=force, manifest_path=self.manifest_path), logging.getLogger(__name__))
+        run.stage_inputs = lambda stage: {'data': self.inputs['data']} if stage == 'ingest' else {'tables': self.inputs['tables']}
+        run.stage_outputs = lambda stage: []
+        for stage in main.STAGES:
+            setattr(run, f"run_{stage}", lambda forced, stage=stage: self.ran.append(stage) or True)
+        with patch('main.load_table_fingerprints', return_value={'invoices': 'i1'}):
+            run.run(stages)
+        return self.ran
+
+    def test_status_of_every_stage_is_reported(self):
+        self.run_stages(['analyze'])
+        run = main.PipelineRun(RunConfig(stages=('report',), manifest_path=self.manifest_path), logging.getLogger(__name__))
+        run.stage_inputs = lambda stage: {'data': 'd1'} if stage == 'ingest' else {'tables': 't1'}
+        run.stage_outputs = lambda stage: []
+        run.run_report = lambda forced: False
+        run.run()
+        self.assertEqual({stage: status['status'] for stage, status in run.status.items()},
+                         {'ingest': 'fresh', 'analyze': 'fresh', 'report': 'failed'})
+
+    def test_run_files_are_inside_its_directory(self):
+        run = main.PipelineRun(RunConfig(directory=self.tmp_dir.name), logging.getLogger(__name__))
+        self.assertEqual(run.manifest.path, os.path.join(self.tmp_dir.name, 'output', 'stage_manifest.json'))
+        open(os.path.join(self.tmp_dir.name, 'database.db'), 'w').close()
+        self.assertEqual(run.stage_outputs('ingest'), [os.path.join(self.tmp_dir.name, 'database.db')])
+        # Absolute paths are used as they are
+        self.assertEqual(RunConfig(directory=self.tmp_dir.name, db_path=self.manifest_path).path('db_path'), self.manifest_path)
+
+    def test_stale_dependencies_run_first(self):
+        self.assertEqual(self.run_stages(['report']), ['ingest', 'analyze', 'report'])
+        self.assertEqual(self.run_stages(['pdf']), ['plot', 'pdf'])
+
+    def test_fresh_stages_are_skipped(self):
+        self.run_stages(main.DEFAULT_STAGES)
+        self.assertEqual(self.run_stages(main.DEFAULT_STAGES), [])
+
+        self.inputs['tables'] = 't2'
+        self.assertEqual(self.run_stages(main.DEFAULT_STAGES), ['analyze', 'plot', 'report'])
+
+    def test_force_reruns_the_named_stages_only(self):
+        self.run_stages(main.DEFAULT_STAGES)
+        self.assertEqual(self.run_stages(['plot'], force=True), ['plot'])
+
+    def test_only_and_stages_are_parsed(self):
+        args = main.parse_args(['plot', 'report', '--force', '--only', 'monthly_trend', 't_tests'])
+        self.assertEqual(args.stages, ['plot', 'report'])
+        self.assertTrue(args.force)
+        self.assertEqual(args.only, ['monthly_trend', 't_tests'])
+        with patch('sys.stderr', MagicMock()), self.assertRaises(SystemExit):
+            main.parse_args(['deploy'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import unittest
+from config.settings import STARTUP_IMPORT_BUDGET, STARTUP_LAZY_MODULES
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules run or imported on their own: the CLI and the services and controllers used directly
+ENTRY_POINTS = [
+    'main',
+    'services.t_test',
+    'services.test_analysis_service',
+    'services.eda_service',
+    'controllers.report_generator',
+    'controllers.plot_generator',
+    'controllers.plot_cache',
+    'controllers.pdf_generator',
+]
+
+
+def import_profile(module):
+    """Cumulative import time in seconds of each module imported by `import <module>` in a fresh interpreter"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative) / 1e6
+    return profile
+
+
+class TestStartupTime(unittest.TestCase):
+
+    def test_entry_points_defer_heavy_imports(self):
+        for module in ENTRY_POINTS:
+            with self.subTest(module=module):
+                loaded = {name.split('.')[0] for name in import_profile(module)}
+                self.assertFalse(loaded & set(STARTUP_LAZY_MODULES), f"{module} imports {loaded & set(STARTUP_LAZY_MODULES)}")
+
+    def test_entry_points_within_budget(self):
+        for module in ENTRY_POINTS:
+            with self.subTest(module=module):
+                # Best of three runs, so a busy machine does not fail the budget
+                seconds = min(import_profile(module)[module] for _ in range(3))
+                self.assertLessEqual(seconds, STARTUP_IMPORT_BUDGET, f"importing {module} took {seconds:.2f}s")
+
+if __name__ == '__main__':
+    unittest.main()
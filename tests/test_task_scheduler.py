@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from services.task_scheduler import TaskScheduler
+
+class TestTaskScheduler(unittest.TestCase):
+
+    def test_runs_tasks_in_dependency_order(self):
+        scheduler = TaskScheduler(max_workers=4)
+        scheduler.add('load', lambda: [1, 2, 3])
+        scheduler.add('total', lambda values: sum(values), inputs=['load'])
+        scheduler.add('count', lambda values: len(values), inputs=['load'])
+        scheduler.add('mean', lambda total, count: total / count, inputs=['total', 'count'])
+
+        results = scheduler.run()
+
+        self.assertEqual(results['mean'], 2)
+        self.assertLessEqual(scheduler.timings['load'][1], scheduler.timings['total'][0])
+        self.assertLessEqual(scheduler.timings['count'][1], scheduler.timings['mean'][0])
+
+    def test_independent_tasks_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        scheduler = TaskScheduler(max_workers=3)
+        # Each task waits for the other two, which only works if all three run at once
+        for name in ('a', 'b', 'c'):
+            scheduler.add(name, barrier.wait)
+
+        scheduler.run()
+
+        self.assertEqual(scheduler.errors, {})
+
+    def test_shared_resource_is_serialized(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def render():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        scheduler = TaskScheduler(max_workers=4)
+        for name in ('plot_a', 'plot_b', 'plot_c'):
+            scheduler.add(name, render, resource='pyplot')
+
+        scheduler.run()
+
+        self.assertEqual(peak[0], 1)
+
+    def test_failure_skips_dependents_only(self):
+        scheduler = TaskScheduler(max_workers=2)
+        scheduler.add('broken', lambda: 1 / 0)
+        scheduler.add('after_broken', lambda value: value, inputs=['broken'])
+        scheduler.add('healthy', lambda: 'ok')
+
+        results = scheduler.run()
+
+        self.assertIn('broken', scheduler.errors)
+        self.assertEqual(scheduler.skipped, ['after_broken'])
+        self.assertEqual(results['healthy'], 'ok')
+
+    def test_critical_path_and_report(self):
+        scheduler = TaskScheduler(max_workers=4)
+        scheduler.add('fast', lambda: None)
+        scheduler.add('slow', lambda: time.sleep(0.05))
+        scheduler.add('final', lambda *_: None, inputs=['fast', 'slow'])
+
+        scheduler.run()
+        path, duration = scheduler.critical_path()
+
+        self.assertEqual(path, ['slow', 'final'])
+        self.assertGreaterEqual(duration, 0.05)
+        self.assertIn('Critical path', scheduler.timing_report())
+
+    def test_unknown_input_and_cycle_are_rejected(self):
+        scheduler = TaskScheduler()
+        scheduler.add('orphan', lambda value: value, inputs=['missing'])
+        with self.assertRaises(ValueError):
+            scheduler.run()
+
+        scheduler = TaskScheduler()
+        scheduler.add('a', lambda value: value, inputs=['b'])
+        scheduler.add('b', lambda value: value, inputs=['a'])
+        with self.assertRaises(ValueError):
+            scheduler.run()
+
+if __name__ == '__main__':
+    unittest.main()
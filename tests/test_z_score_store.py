@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from services.z_score_store import write_z_scores
+
+class TestZScoreStore(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.amounts = rng.lognormal(10, 1, 10000)
+        self.mean = self.amounts.mean()
+        self.std = self.amounts.std(ddof=1)
+
+    def test_write_z_scores_matches_in_memory_calculation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'z_scores.f32')
+            handle, stats = write_z_scores(path, len(self.amounts), np.array_split(self.amounts, 9), self.mean, self.std)
+
+            expected = (self.amounts - self.mean) / self.std
+            np.testing.assert_allclose(handle.array(), expected, rtol=1e-5, atol=1e-5)
+            self.assertEqual(len(handle), len(self.amounts))
+            self.assertAlmostEqual(stats['mean'], np.mean(expected), places=6)
+            self.assertAlmostEqual(stats['std_dev'], np.std(expected), places=6)
+            self.assertAlmostEqual(stats['max'], np.max(expected), places=6)
+            self.assertAlmostEqual(stats['min'], np.min(expected), places=6)
+
+            # Chunked sketch of the scores agrees with the raw scores
+            sketch = handle.sketch()
+            self.assertEqual(sketch.count, len(self.amounts))
+            self.assertAlmostEqual(np.mean(expected <= sketch.median()), 0.5, delta=0.02)
+            del sketch, handle
+
+    def test_write_z_scores_empty(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            handle, stats = write_z_scores(os.path.join(tmp_dir, 'z.f32'), 0, [], 0.0, 1.0)
+
+            self.assertEqual(len(handle), 0)
+            self.assertIsNone(stats['mean'])
+
+if __name__ == '__main__':
+    unittest.main()